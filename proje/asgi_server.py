@@ -0,0 +1,156 @@
+import asyncio
+import re
+
+from frame_hub import MJPEG_MIMETYPE
+
+VIDEO_ROUTES = [
+    (re.compile(r"^/video/([^/]+)$"), "annotated"),
+    (re.compile(r"^/video_raw/([^/]+)$"), "raw"),
+    # Ladder rungs, e.g. /video/cam1/240p -> "annotated@240p"
+    (re.compile(r"^/video/([^/]+)/([^/]+)$"), "annotated@{}"),
+    (re.compile(r"^/video_raw/([^/]+)/([^/]+)$"), "raw@{}"),
+]
+
+
+class AsyncFrameWaiter:
+    """
+    Bridges one FrameChannel into one asyncio loop: a single channel listener
+    wakes every coroutine waiting on the channel, however many viewers there are.
+    """
+
+    def __init__(self, channel, loop):
+        self.channel = channel
+        self.loop = loop
+        self.future = loop.create_future()
+        self.clients = 0
+        channel.subscribe(self._on_frame)
+
+    def _on_frame(self, channel, seq, timestamp):
+        # Publisher thread
+        self.loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self):
+        future, self.future = self.future, self.loop.create_future()
+        if not future.done():
+            future.set_result(None)
+
+    async def wait(self, last_seq, timeout=1.0):
+        if self.channel.seq > last_seq or self.channel.closed:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(self.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def close(self):
+        self.channel.unsubscribe(self._on_frame)
+
+
+class MJPEGApp:
+    """
+    ASGI app serving /video/<cam_id> and /video_raw/<cam_id> (and their
+    /<rung> ladder variants) from the FrameHub on the event loop; every
+    other path goes to the Flask app.
+
+    Each viewer is a coroutine: it waits for a newer frame, takes the shared
+    encode-once JPEG and awaits send(). A slow client simply has fewer frames
+    sent (whatever arrived while send() was blocked is skipped), nothing is
+    queued per client. Streams end on client disconnect or when the camera
+    is stopped.
+    """
+
+    def __init__(self, hub, wsgi_app=None):
+        self.hub = hub
+        self.waiters = {}
+        self.fallback = None
+        if wsgi_app is not None:
+            from asgiref.wsgi import WsgiToAsgi
+            self.fallback = WsgiToAsgi(wsgi_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] == "http":
+            for pattern, variant in VIDEO_ROUTES:
+                match = pattern.match(scope["path"])
+                if not match:
+                    continue
+                cam_id, rung = match.group(1), match.group(2) if pattern.groups > 1 else None
+                if rung is not None:
+                    variant = variant.format(rung)
+                    if not self.hub.has_channel(cam_id, variant):
+                        break  # unknown rung: 404 from the fallback
+                await self.stream(self.hub.channel(cam_id, variant), receive, send)
+                return
+        if self.fallback is not None:
+            await self.fallback(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": 404, "headers": [(b"content-type", b"text/plain")]})
+        await send({"type": "http.response.body", "body": b"not found"})
+
+    def _waiter(self, channel, loop):
+        waiter = self.waiters.get(channel)
+        if waiter is None:
+            waiter = self.waiters[channel] = AsyncFrameWaiter(channel, loop)
+        waiter.clients += 1
+        return waiter
+
+    def _release(self, waiter):
+        waiter.clients -= 1
+        if waiter.clients == 0:
+            waiter.close()
+            self.waiters.pop(waiter.channel, None)
+
+    async def stream(self, channel, receive, send):
+        loop = asyncio.get_running_loop()
+        disconnected = asyncio.Event()
+
+        async def watch_disconnect():
+            while True:
+                message = await receive()
+                if message["type"] == "http.disconnect":
+                    disconnected.set()
+                    return
+
+        watcher = asyncio.create_task(watch_disconnect())
+        waiter = self._waiter(channel, loop)
+        channel.add_viewer()
+        try:
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", MJPEG_MIMETYPE.encode()), (b"cache-control", b"no-cache")],
+            })
+            last_seq = 0
+            while not disconnected.is_set() and not channel.closed:
+                await waiter.wait(last_seq)
+                if channel.seq <= last_seq:
+                    continue
+                cached = channel.cached_part()
+                if cached is None:
+                    # First viewer of this frame encodes it off the loop
+                    cached = await loop.run_in_executor(None, channel.mjpeg_part)
+                seq, part = cached
+                if part is None:
+                    continue
+                last_seq = seq
+                await send({"type": "http.response.body", "body": part, "more_body": True})
+            if not disconnected.is_set():
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        except OSError:
+            pass
+        finally:
+            watcher.cancel()
+            channel.remove_viewer()
+            self._release(waiter)
+
+
+def run_asgi(hub, wsgi_app, host="0.0.0.0", port=8000):
+    import uvicorn
+    uvicorn.run(MJPEGApp(hub, wsgi_app), host=host, port=port, log_level="warning")
@@ -0,0 +1,114 @@
+# Microbenchmark: bytes copied per frame on the appsink -> appsrc path.
+#
+#   python3 bench_frame_copy.py --frames 300 --factories 2 --pulls 1
+#
+# "before" reproduces the old path: every need-data call of every factory
+# runs frame.tobytes() and fills a freshly allocated Gst.Buffer.
+# "after" copies the mapped appsink memory once into a FramePool buffer and
+# copies that once into one Gst.Buffer per frame (h264_encoder.wrap_frame)
+# that all factories push shallowly. Every copy is counted, including the
+# extra tobytes() when the bindings only map buffers read-only.
+# Without PyGObject a bytearray stands in for Gst.Buffer memory.
+
+import argparse
+import json
+import time
+
+import numpy as np
+
+from frame_pool import FramePool
+
+try:
+    import gi
+    gi.require_version('Gst', '1.0')
+    from gi.repository import Gst
+    Gst.init(None)
+except (ImportError, ValueError):
+    Gst = None
+
+
+def new_filled_buffer(data):
+    if Gst is not None:
+        buf = Gst.Buffer.new_allocate(None, len(data), None)
+        buf.fill(0, data)
+        return buf
+    return bytearray(data)
+
+
+def new_frame_buffer(frame):
+    """Same steps as h264_encoder.wrap_frame; returns (buffer, bytes copied)."""
+    if Gst is None:
+        buf = bytearray(frame.nbytes)
+        np.copyto(np.frombuffer(buf, np.uint8).reshape(frame.shape), frame)
+        return buf, frame.nbytes
+    buf = Gst.Buffer.new_allocate(None, frame.nbytes, None)
+    success, mapinfo = buf.map(Gst.MapFlags.WRITE)
+    if success:
+        try:
+            np.copyto(np.frombuffer(mapinfo.data, np.uint8).reshape(frame.shape), frame)
+            return buf, frame.nbytes
+        except (TypeError, ValueError):
+            pass
+        finally:
+            buf.unmap(mapinfo)
+    buf.fill(0, frame.tobytes())
+    return buf, 2 * frame.nbytes
+
+
+def shallow_copy(buf):
+    return buf.copy() if Gst is not None else buf
+
+
+def run_before(mapped, shape, frames, factories, pulls):
+    copied = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        # np.frombuffer view of the mapped sample (no copy, but only valid until unmap)
+        frame = np.frombuffer(mapped, dtype=np.uint8).reshape(shape)
+        for _ in range(factories * pulls):
+            data = frame.tobytes()
+            copied += len(data)
+            new_filled_buffer(data)
+            copied += len(data)
+    return copied, time.perf_counter() - start
+
+
+def run_after(mapped, shape, frames, factories, pulls):
+    pool = FramePool(shape)
+    copied = 0
+    start = time.perf_counter()
+    for _ in range(frames):
+        frame = pool.copy_in(mapped)
+        copied += frame.nbytes
+        shared, wrap_copied = new_frame_buffer(frame)
+        copied += wrap_copied
+        for _ in range(factories * pulls):
+            shallow_copy(shared)
+        del frame, shared
+    return copied, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes copied per frame, appsink -> appsrc")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--factories", type=int, default=2, help="RTSP factories per camera (raw + annotated)")
+    parser.add_argument("--pulls", type=int, default=1, help="need-data calls per published frame")
+    args = parser.parse_args()
+
+    shape = (args.height, args.width, 3)
+    mapped = np.random.randint(0, 255, size=shape, dtype=np.uint8).tobytes()
+
+    report = {"gstreamer": Gst is not None, "frame_bytes": len(mapped)}
+    for name, fn in (("before", run_before), ("after", run_after)):
+        copied, elapsed = fn(mapped, shape, args.frames, args.factories, args.pulls)
+        report[name] = {
+            "bytes_copied_per_frame": copied // args.frames,
+            "ms_per_frame": round(elapsed * 1000.0 / args.frames, 3),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+# Offline benchmark: capture -> detect -> overlay -> MJPEG fan-out.
+#
+#   python3 bench_pipeline.py --cameras 1,4 --resolutions 640x480,1280x720 \
+#       --viewers 0,8 --duration 10 --output bench.json
+#
+# Every run builds the same per-camera pipeline as the servers
+# (LatestFrameMailbox -> AnalyticsWorker -> InferenceScheduler -> overlay ->
+# FrameHub) fed by synthetic sources: generated NumPy frames with a moving
+# box (default) or GStreamer's videotestsrc (--source gst). The detector is
+# the stub backend with a fixed latency unless --backend/--weights point at
+# an exported model, so no camera, GPU or network is needed.
+#
+# Per run: fps in/out, end-to-end latency p50/p99, per-stage latency from
+# the metrics registry, CPU per stage (thread CPU clocks) and RSS. Results
+# are JSON so two runs can be diffed for regressions.
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import resource
+import subprocess
+import threading
+import time
+
+import numpy as np
+
+from camera_pipeline import AnalyticsWorker
+from frame_hub import FrameHub
+from frame_mailbox import LatestFrameMailbox
+from frame_pool import FramePool
+from inference_scheduler import InferenceScheduler
+from metrics import REGISTRY
+from yolo_detector import YOLODetector
+
+STAGES = ("capture", "queue_wait", "inference", "analyze", "scene", "overlay", "publish", "jpeg_encode")
+
+
+def synthetic_frames(width, height, count=60, seed=0):
+    """A short loop of noisy frames with a box moving across them."""
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 255, (height, width, 3), np.uint8)
+    frames = []
+    box_w, box_h = width // 8, height // 4
+    for i in range(count):
+        frame = background.copy()
+        x = (i * (width - box_w)) // max(count - 1, 1)
+        frame[height // 3:height // 3 + box_h, x:x + box_w] = 255
+        frames.append(frame)
+    return frames
+
+
+def thread_cpu_s(thread):
+    """CPU seconds used so far by a live thread (Linux thread CPU clock)."""
+    try:
+        return time.clock_gettime(time.pthread_getcpuclockid(thread.ident))
+    except (OSError, TypeError, AttributeError):
+        return 0.0
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+class SyntheticCamera(threading.Thread):
+    """Capture stand-in: copies generated frames into pooled buffers at a fixed fps."""
+
+    def __init__(self, cam_id, frames, fps, on_frame):
+        super().__init__(daemon=True)
+        self.cam_id = cam_id
+        self.frames = frames
+        self.interval = 1.0 / fps
+        self.on_frame = on_frame
+        self.pool = FramePool(frames[0].shape)
+        self.capture_ms = REGISTRY.histogram("stage_ms", camera=cam_id, stage="capture")
+        self.running = True
+
+    def run(self):
+        next_at = time.perf_counter()
+        for source in itertools.cycle(self.frames):
+            if not self.running:
+                return
+            started = time.perf_counter()
+            frame = self.pool.copy_in(source.data)
+            self.capture_ms.observe((time.perf_counter() - started) * 1000.0)
+            self.on_frame(frame, time.time())
+            next_at += self.interval
+            time.sleep(max(next_at - time.perf_counter(), 0))
+
+    def stop(self):
+        self.running = False
+
+
+class GstTestCamera(threading.Thread):
+    """Capture from videotestsrc through the same SourcePipeline as the servers."""
+
+    def __init__(self, cam_id, width, height, fps, on_frame):
+        super().__init__(daemon=True)
+        from source_pipeline import SourcePipeline
+        self.pipeline = SourcePipeline(cam_id, "videotestsrc", on_frame,
+                                       {"width": width, "height": height, "fps": fps})
+        self.running = True
+
+    def run(self):
+        self.pipeline.run(lambda: self.running)
+
+    def stop(self):
+        self.running = False
+
+
+class BenchCamera:
+    """One camera wired like StreamWorker / GStreamerCamera, minus RTSP."""
+
+    def __init__(self, cam_id, hub, scheduler, detector, make_source):
+        self.cam_id = cam_id
+        self.hub = hub
+        self.detector = detector
+        self.mailbox = LatestFrameMailbox()
+        self.analytics = AnalyticsWorker(cam_id, self.mailbox, scheduler, self.on_result)
+        self.overlay_ms = REGISTRY.histogram("stage_ms", camera=cam_id, stage="overlay")
+        self.source = make_source(cam_id, self.on_frame)
+        self.latencies = []
+
+    def on_frame(self, frame, captured_at):
+        self.hub.publish(self.cam_id, "raw", frame, captured_at)
+        self.mailbox.put(frame, captured_at)
+
+    def on_result(self, entry, detections, people):
+        if self.hub.channel(self.cam_id, "annotated").has_consumers():
+            with self.overlay_ms.time():
+                annotated = self.detector.overlay.render(entry.frame, detections)
+            self.hub.publish(self.cam_id, "annotated", annotated, entry.timestamp)
+        self.latencies.append((time.time() - entry.timestamp) * 1000.0)
+
+    def start(self):
+        self.analytics.start()
+        self.source.start()
+
+    def stop(self):
+        self.source.stop()
+        self.analytics.stop()
+        self.source.join(timeout=2)
+        self.analytics.join(timeout=2)
+        self.hub.close(self.cam_id)
+
+
+def viewer(channel, stop):
+    for _ in channel.mjpeg_stream():
+        if stop.is_set():
+            return
+
+
+def run_config(args, detector, run_id, cameras, width, height, viewers):
+    hub = FrameHub()
+    scheduler = InferenceScheduler(detector, max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms)
+    frames = synthetic_frames(width, height) if args.source == "numpy" else None
+
+    def make_source(cam_id, on_frame):
+        if args.source == "gst":
+            return GstTestCamera(cam_id, width, height, args.fps, on_frame)
+        return SyntheticCamera(cam_id, frames, args.fps, on_frame)
+
+    cams = [BenchCamera(f"r{run_id}c{i}", hub, scheduler, detector, make_source) for i in range(cameras)]
+    stop = threading.Event()
+    viewer_threads = [
+        threading.Thread(target=viewer, args=(hub.channel(cams[i % cameras].cam_id, "annotated"), stop), daemon=True)
+        for i in range(viewers)
+    ]
+
+    scheduler.start()
+    for thread in viewer_threads:
+        thread.start()
+    for cam in cams:
+        cam.start()
+    time.sleep(args.warmup)
+    for cam in cams:
+        cam.latencies.clear()
+    groups = {
+        "capture": [cam.source for cam in cams],
+        "analytics": [cam.analytics for cam in cams],
+        "inference": [scheduler],
+        "viewers": viewer_threads,
+    }
+    cpu_start = {name: sum(thread_cpu_s(t) for t in threads) for name, threads in groups.items()}
+    process_start = os.times()
+    counts_start = [(cam.mailbox.captured, cam.mailbox.processed) for cam in cams]
+    started = time.perf_counter()
+
+    time.sleep(args.duration)
+
+    elapsed = time.perf_counter() - started
+    process_end = os.times()
+    cpu_end = {name: sum(thread_cpu_s(t) for t in threads) for name, threads in groups.items()}
+    counts_end = [(cam.mailbox.captured, cam.mailbox.processed) for cam in cams]
+    latencies = np.array(list(itertools.chain.from_iterable(cam.latencies for cam in cams)))
+    memory = rss_mb()
+
+    stop.set()
+    for cam in cams:
+        cam.stop()
+    scheduler.stop()
+    scheduler.join(timeout=2)
+
+    frames_in = sum(end[0] - start[0] for start, end in zip(counts_start, counts_end))
+    frames_out = sum(end[1] - start[1] for start, end in zip(counts_start, counts_end))
+    process_cpu = (process_end.user + process_end.system) - (process_start.user + process_start.system)
+    stages = {}
+    for stage in STAGES:
+        # Channel stages are labelled per variant; the annotated one is what viewers get
+        labels = {"variant": "annotated"} if stage in ("publish", "jpeg_encode") else {}
+        histograms = [REGISTRY.histogram("stage_ms", camera=cam.cam_id, stage=stage, **labels) for cam in cams]
+        counted = [h for h in histograms if h.count]
+        if counted:
+            stages[stage] = {
+                "count": sum(h.count for h in counted),
+                "avg_ms": round(sum(h.sum for h in counted) / sum(h.count for h in counted), 3),
+                "p50_ms": round(float(np.mean([h.quantile(0.5) for h in counted])), 3),
+                "p99_ms": round(float(np.mean([h.quantile(0.99) for h in counted])), 3),
+            }
+    result = {
+        "cameras": cameras,
+        "resolution": f"{width}x{height}",
+        "viewers": viewers,
+        "duration_s": round(elapsed, 2),
+        "fps_in": round(frames_in / elapsed, 2),
+        "fps_out": round(frames_out / elapsed, 2),
+        "fps_out_per_camera": round(frames_out / elapsed / cameras, 2),
+        "latency_ms": {
+            "p50": round(float(np.percentile(latencies, 50)), 2) if len(latencies) else None,
+            "p99": round(float(np.percentile(latencies, 99)), 2) if len(latencies) else None,
+        },
+        "cpu_pct": {
+            "process": round(100.0 * process_cpu / elapsed, 1),
+            **{name: round(100.0 * (cpu_end[name] - cpu_start[name]) / elapsed, 1) for name in groups},
+        },
+        "rss_mb": round(memory, 1),
+        "stages": stages,
+        "inference": {"batches": scheduler.batches, "frames": scheduler.frames,
+                      "avg_batch": round(scheduler.frames / scheduler.batches, 2) if scheduler.batches else 0},
+    }
+    # Run-specific series hold the last frames of their cameras; free them
+    # so RSS of the next run is not inflated.
+    for cam in cams:
+        REGISTRY.unregister(camera=cam.cam_id)
+    return result
+
+
+def parse_list(value, cast=int):
+    return [cast(item) for item in value.split(",") if item]
+
+
+def parse_resolution(value):
+    width, height = value.lower().split("x")
+    return int(width), int(height)
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline capture -> detect -> stream benchmark")
+    parser.add_argument("--cameras", default="1,4", help="comma-separated camera counts")
+    parser.add_argument("--resolutions", default="640x480,1280x720", help="comma-separated WxH")
+    parser.add_argument("--viewers", default="0,4", help="comma-separated MJPEG viewer counts")
+    parser.add_argument("--duration", type=float, default=10.0, help="measured seconds per run")
+    parser.add_argument("--warmup", type=float, default=2.0)
+    parser.add_argument("--fps", type=int, default=30, help="per-camera source fps")
+    parser.add_argument("--source", choices=["numpy", "gst"], default="numpy")
+    parser.add_argument("--backend", default="stub", help="detector backend (stub, onnx, openvino, ...)")
+    parser.add_argument("--weights", default=None)
+    parser.add_argument("--stub-latency-ms", type=float, default=15.0, help="stub detector time per batch")
+    parser.add_argument("--max-batch", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    parser.add_argument("--output", default=None, help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.source == "gst":
+        import gi
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst
+        Gst.init(None)
+    if args.backend == "stub":
+        detector = YOLODetector(backend="stub")
+        detector.backend.latency_ms = args.stub_latency_ms
+    else:
+        detector = YOLODetector(backend=args.backend, weights=args.weights)
+
+    runs = []
+    sweep = itertools.product(parse_list(args.cameras), parse_list(args.resolutions, parse_resolution),
+                              parse_list(args.viewers))
+    for run_id, (cameras, (width, height), viewers) in enumerate(sweep):
+        result = run_config(args, detector, run_id, cameras, width, height, viewers)
+        print(f"[BENCH] cameras={cameras} {width}x{height} viewers={viewers}: "
+              f"fps_out={result['fps_out']} p99={result['latency_ms']['p99']}ms "
+              f"cpu={result['cpu_pct']['process']}% rss={result['rss_mb']}MB", flush=True)
+        runs.append(result)
+
+    report = {
+        "meta": {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0, 1),
+            "args": vars(args),
+        },
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
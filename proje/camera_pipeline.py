@@ -0,0 +1,210 @@
+import threading
+import time
+
+from metrics import REGISTRY, Histogram
+from motion import MotionGate, downscale_gray, motion_score
+from scene_analytics import SceneAnalytics, parse_lines, parse_zones
+from tiling import TilePlan, parse_roi
+from tracking import AdaptiveStride, IoUTracker
+from yolo_detector import Detections
+
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 200, 400, 800, 1600, 3200]
+
+DEFAULT_ANALYTICS_CONFIG = {
+    "adaptive": False,         # detect every Nth frame, track in between
+    "target_fps": 30.0,        # analytics fps budget: detector passes / s granted at most
+    "priority": 1,             # higher priorities keep their rate when the detector is overloaded
+    "detector_budget": 0.5,    # max share of frame time spent in the detector
+    "max_stride": 15,
+    "static_factor": 4,        # stride multiplier while the scene is static
+    "motion_threshold": 0.004, # changed-pixel fraction that counts as motion (a walking person: ~0.008)
+    "motion_gate": False,      # skip the detector entirely on static frames
+    "gate_threshold": 0.005,   # changed-pixel fraction vs. background to run inference
+    "gate_pixel_threshold": 15,
+    "gate_max_skip": 150,      # force a detector pass after this many skipped frames
+    "roi": None,               # polygons in normalized coords, e.g. [[[0.1,0.2],[0.5,0.2],[0.5,0.9]]]
+    "tile_rows": 1,            # split the ROI (or frame) into rows x cols overlapping tiles
+    "tile_cols": 1,
+    "tile_overlap": 0.2,
+    "zones": None,             # named occupancy / dwell polygons, e.g. {"door": [[0.4,0.4],[0.8,0.4],[0.8,0.9]]}
+    "lines": None,             # named counting lines, e.g. {"gate": [[0.5,0.0],[0.5,1.0]]}
+}
+# Rates, budgets and counts that only make sense above zero
+POSITIVE_KEYS = ("target_fps", "detector_budget", "max_stride", "static_factor", "gate_max_skip",
+                 "tile_rows", "tile_cols")
+GEOMETRY_PARSERS = {"roi": parse_roi, "zones": parse_zones, "lines": parse_lines}
+
+
+def analytics_config(overrides=None):
+    """Defaults merged with overrides; raises ValueError for values of the wrong type or range."""
+    config = dict(DEFAULT_ANALYTICS_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key not in config or value in (None, ""):
+            continue
+        default = DEFAULT_ANALYTICS_CONFIG[key]
+        try:
+            if default is None:
+                GEOMETRY_PARSERS[key](value)
+                config[key] = value
+            elif isinstance(default, bool):
+                config[key] = value in (True, 1, "1", "true", "on")
+            else:
+                config[key] = type(default)(value)
+        except (TypeError, ValueError, IndexError) as e:
+            raise ValueError(f"invalid analytics {key} {value!r}: {e}") from None
+    for key in POSITIVE_KEYS:
+        if not config[key] > 0:
+            raise ValueError(f"analytics {key} must be > 0")
+    return config
+
+
+class AnalyticsWorker(threading.Thread):
+    """
+    Analytics stage of a camera: always takes the newest frame from the
+    capture mailbox, runs detection and hands the structured Detections to
+    on_result(entry, detections, people). Rendering is left to the consumer
+    so cameras nobody watches never draw boxes. Capture never waits on this
+    thread.
+
+    In adaptive mode the detector only runs on keyframes chosen by
+    AdaptiveStride; the frames in between get boxes propagated by an
+    IoUTracker so counts and annotations stay continuous. In front of both,
+    the MotionGate lets static frames reuse the last detections. With ROI
+    polygons or tiling configured, only the ROI crop / tiles are detected.
+    Every result then goes through SceneAnalytics (class counts, zones,
+    counting lines, dwell times) before on_result.
+    """
+
+    def __init__(self, cam_id, mailbox, scheduler, on_result, config=None):
+        super().__init__(daemon=True)
+        self.cam_id = cam_id
+        self.mailbox = mailbox
+        self.scheduler = scheduler
+        self.on_result = on_result
+        self.config = analytics_config(config)
+        self.running = False
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.tracker = IoUTracker()
+        self.stride = AdaptiveStride(
+            target_fps=self.config["target_fps"],
+            budget=self.config["detector_budget"],
+            max_stride=self.config["max_stride"],
+            static_factor=self.config["static_factor"],
+            motion_threshold=self.config["motion_threshold"],
+        )
+        self.gate = MotionGate(
+            area_threshold=self.config["gate_threshold"],
+            pixel_threshold=self.config["gate_pixel_threshold"],
+            max_skip=self.config["gate_max_skip"],
+        )
+        self.tiles = TilePlan(
+            roi=self.config["roi"],
+            rows=self.config["tile_rows"],
+            cols=self.config["tile_cols"],
+            overlap=self.config["tile_overlap"],
+        )
+        self.scene = SceneAnalytics(zones=self.config["zones"], lines=self.config["lines"])
+        self.prev_small = None
+        self.keyframes = 0
+        self.tracked_frames = 0
+        self.deferred_frames = 0
+        self._register_metrics()
+
+    def _register_metrics(self):
+        cam = self.cam_id
+        REGISTRY.counter_func("frames_in_total", lambda: self.mailbox.captured,
+                              "Frames captured", camera=cam)
+        REGISTRY.counter_func("frames_out_total", lambda: self.mailbox.processed,
+                              "Frames analysed", camera=cam)
+        REGISTRY.counter_func("frames_dropped_total", lambda: self.mailbox.dropped,
+                              "Frames overwritten before analytics took them", camera=cam)
+        REGISTRY.register("end_to_end_ms", self.latency_ms,
+                          "Capture to analytics result latency", camera=cam)
+        REGISTRY.counter_func("detector_passes_total", lambda: self.keyframes,
+                              "Frames sent through the detector", camera=cam)
+        REGISTRY.counter_func("detector_deferred_total", lambda: self.deferred_frames,
+                              "Detector passes deferred by the fair scheduler", camera=cam)
+        REGISTRY.gauge("detector_allocated_fps", lambda: self.scheduler.allocated_fps(cam),
+                       "Detector passes per second granted to the camera", camera=cam)
+        self.queue_wait_ms = REGISTRY.histogram("stage_ms", "Per-stage time", camera=cam, stage="queue_wait")
+        self.inference_ms = REGISTRY.histogram("stage_ms", camera=cam, stage="inference")
+        self.analyze_ms = REGISTRY.histogram("stage_ms", camera=cam, stage="analyze")
+        self.scene_ms = REGISTRY.histogram("stage_ms", camera=cam, stage="scene")
+
+    def analyze(self, frame):
+        """Returns (Nx6 detections, track ids) for frame."""
+        small = None
+        if self.config["motion_gate"]:
+            small = downscale_gray(frame)
+            if not self.gate.needs_inference(small):
+                return self.tracker.tracks()
+        if self.config["adaptive"]:
+            if small is None:
+                small = downscale_gray(frame)
+            motion = motion_score(self.prev_small, small)
+            self.prev_small = small
+            if not self.stride.should_detect(motion):
+                self.tracked_frames += 1
+                return self.tracker.predict()
+        # Fair share of the detector across cameras; over budget, track instead
+        cost = len(self.tiles.windows(frame.shape)) if self.tiles.enabled else 1
+        if not self.scheduler.admit(self.cam_id, self.config["target_fps"], self.config["priority"], cost):
+            self.deferred_frames += 1
+            return self.tracker.predict()
+        started = time.perf_counter()
+        detections = self.detect(frame)
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        self.stride.record(elapsed_ms)
+        self.inference_ms.observe(elapsed_ms)
+        self.keyframes += 1
+        return self.tracker.update(detections)
+
+    def detect(self, frame):
+        """Nx6 detections; ROI crops / tiles go through the scheduler as one batch."""
+        if not self.tiles.enabled:
+            return self.scheduler.predict(self.cam_id, frame)
+        results = self.scheduler.predict_many(self.cam_id, self.tiles.crops(frame))
+        return self.tiles.merge(results, frame.shape)
+
+    def run(self):
+        self.running = True
+        while self.running:
+            entry = self.mailbox.take(timeout=0.5)
+            if entry is None:
+                continue
+            self.queue_wait_ms.observe((time.time() - entry.timestamp) * 1000.0)
+            started = time.perf_counter()
+            try:
+                detections, track_ids = self.analyze(entry.frame)
+            except Exception as e:
+                print(f"[ANALYTICS] {self.cam_id}: detection failed: {e}")
+                continue
+            self.analyze_ms.observe((time.perf_counter() - started) * 1000.0)
+            detections = Detections.from_array(detections, track_ids)
+            with self.scene_ms.time():
+                self.scene.update(detections, entry.timestamp, entry.frame.shape)
+            self.on_result(entry, detections, detections.count_class(0))
+            self.latency_ms.observe((time.time() - entry.timestamp) * 1000.0)
+
+    def stop(self):
+        self.running = False
+        self.mailbox.close()
+
+    def stats(self):
+        stats = self.mailbox.stats()
+        stats["latency_ms"] = self.latency_ms.snapshot()
+        stats["detector"] = {
+            "adaptive": self.config["adaptive"],
+            "keyframes": self.keyframes,
+            "tracked_frames": self.tracked_frames,
+            "stride": self.stride.current,
+            "inference_ms": round(self.stride.latency_ms or 0.0, 2),
+            "deferred_frames": self.deferred_frames,
+        }
+        stats["scheduling"] = self.scheduler.share_stats(self.cam_id)
+        stats["scene"] = self.scene.stats()
+        if self.tiles.enabled:
+            stats["tiling"] = self.tiles.stats()
+        if self.config["motion_gate"]:
+            stats["motion_gate"] = self.gate.stats(self.stride.latency_ms or 0.0)
+        return stats
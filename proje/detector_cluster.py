@@ -0,0 +1,455 @@
+import argparse
+import atexit
+import itertools
+import os
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from inference_backends import COCO_NAMES
+from overlay import OverlayRenderer
+
+# ========== Wire protocol ==========
+# Every message is a fixed big-endian header followed by `payload_len` bytes.
+#
+# request  (ingestion -> worker): magic, encoding, request id, capture time,
+#          height, width, payload_len; payload = BGR pixels or a JPEG
+# response (worker -> ingestion): magic, status, model ready flag, request
+#          id, worker queue depth, worker ms per frame, payload_len; payload =
+#          Nx6 little-endian float32 detections (x1, y1, x2, y2, score, class)
+#          or an error text. Request id 0 with status STATUS and no payload is
+#          a readiness update, sent on connect and once the model is ready.
+MAGIC = b"MVD1"
+REQUEST = struct.Struct("!4sB3xQdHHI")
+RESPONSE = struct.Struct("!4sBB2xQIfI")
+RAW, JPEG = 0, 1
+OK, ERROR, STATUS = 0, 1, 2
+ENCODINGS = {"raw": RAW, "jpeg": JPEG}
+DETECTIONS_DTYPE = np.dtype("<f4")
+
+
+def parse_address(address):
+    """unix:///path/to.sock or tcp://host:port (host:port alone means TCP)."""
+    if address.startswith("unix://"):
+        return socket.AF_UNIX, address[len("unix://"):]
+    host, _, port = address[len("tcp://"):].rpartition(":") if address.startswith("tcp://") \
+        else address.rpartition(":")
+    return socket.AF_INET, (host or "0.0.0.0", int(port))
+
+
+def recv_exact(sock, size):
+    buf = bytearray(size)
+    view = memoryview(buf)
+    while view:
+        n = sock.recv_into(view)
+        if not n:
+            raise ConnectionError("connection closed")
+        view = view[n:]
+    return buf
+
+
+def encode_frame(frame, encoding, jpeg_quality=90):
+    if encoding == JPEG:
+        ok, data = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
+        if not ok:
+            raise ValueError("JPEG encoding failed")
+        return data
+    return np.ascontiguousarray(frame)
+
+
+def decode_frame(payload, encoding, height, width):
+    if encoding == JPEG:
+        frame = cv2.imdecode(np.frombuffer(payload, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError("JPEG decoding failed")
+        return frame
+    return np.frombuffer(payload, np.uint8).reshape(height, width, 3)
+
+
+# ========== Ingestion side ==========
+class WorkerConnection:
+    """
+    One socket to a detector worker. Requests are written under a lock from
+    the dispatching thread; a reader thread resolves their futures as the
+    responses arrive (in any order) and records the worker's reported
+    model readiness, queue depth and per-frame time for load balancing.
+    """
+
+    def __init__(self, address, encoding, jpeg_quality, on_change):
+        self.address = address
+        self.encoding = encoding
+        self.jpeg_quality = jpeg_quality
+        self.on_change = on_change
+        self.sock = None
+        self.model_ready = False
+        self.inflight = {}  # request id -> Future
+        self.queue_depth = 0
+        self.frame_ms = None
+        self.sent = 0
+        self.completed = 0
+        self.failures = 0
+        self.sent_bytes = 0
+        self.write_lock = threading.Lock()
+
+    @property
+    def connected(self):
+        return self.sock is not None
+
+    @property
+    def available(self):
+        """Connected and its worker's model is loaded."""
+        return self.sock is not None and self.model_ready
+
+    @property
+    def load(self):
+        # Our own outstanding requests plus the backlog the worker last reported
+        # (which also contains other ingestion nodes' frames)
+        return len(self.inflight) + self.queue_depth
+
+    def connect(self, timeout=2.0):
+        family, target = parse_address(self.address)
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        sock.connect(target)
+        sock.settimeout(None)
+        if family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock = sock
+        threading.Thread(target=self._read_loop, args=(sock,), daemon=True,
+                         name=f"detector-conn {self.address}").start()
+        print(f"[CLUSTER] Connected to detector worker {self.address}")
+
+    def send(self, request_id, frame, timestamp, future):
+        payload = encode_frame(frame, self.encoding, self.jpeg_quality)
+        header = REQUEST.pack(MAGIC, self.encoding, request_id, timestamp,
+                              frame.shape[0], frame.shape[1], payload.nbytes)
+        self.inflight[request_id] = future
+        try:
+            with self.write_lock:
+                self.sock.sendall(header)
+                self.sock.sendall(payload)
+        except (OSError, AttributeError) as e:
+            self._disconnect(e)
+            if self.inflight.pop(request_id, None) is not None and not future.done():
+                future.set_exception(ConnectionError(f"detector worker {self.address} disconnected"))
+            return
+        self.sent += 1
+        self.sent_bytes += REQUEST.size + payload.nbytes
+
+    def _read_loop(self, sock):
+        try:
+            while True:
+                magic, status, ready, request_id, depth, frame_ms, size = \
+                    RESPONSE.unpack(recv_exact(sock, RESPONSE.size))
+                if magic != MAGIC:
+                    raise ConnectionError("bad response header")
+                payload = recv_exact(sock, size) if size else b""
+                self.model_ready = bool(ready)
+                self.queue_depth = depth
+                self.frame_ms = frame_ms or self.frame_ms
+                if status == STATUS:
+                    self.on_change()
+                    continue
+                future = self.inflight.pop(request_id, None)
+                if future is not None and not future.done():
+                    if status == OK:
+                        dets = np.frombuffer(payload, DETECTIONS_DTYPE).reshape(-1, 6).astype(np.float32)
+                        future.set_result(dets)
+                    else:
+                        future.set_exception(RuntimeError(payload.decode(errors="replace")))
+                self.completed += 1
+                self.on_change()
+        except (OSError, ConnectionError, struct.error) as e:
+            if sock is self.sock:
+                self._disconnect(e)
+
+    def _disconnect(self, error):
+        sock, self.sock = self.sock, None
+        if sock is None:
+            return
+        self.model_ready = False
+        self.failures += 1
+        print(f"[CLUSTER] Lost detector worker {self.address}: {error}")
+        try:
+            sock.close()
+        except OSError:
+            pass
+        inflight, self.inflight = self.inflight, {}
+        for future in inflight.values():
+            if not future.done():
+                future.set_exception(ConnectionError(f"detector worker {self.address} disconnected"))
+        self.queue_depth = 0
+        self.on_change()
+
+    def close(self):
+        self._disconnect("closed")
+
+    def stats(self):
+        return {
+            "connected": self.connected,
+            "model_ready": self.model_ready,
+            "in_flight": len(self.inflight),
+            "queue_depth": self.queue_depth,
+            "frame_ms": round(self.frame_ms, 2) if self.frame_ms else None,
+            "sent": self.sent,
+            "completed": self.completed,
+            "sent_mb": round(self.sent_bytes / 1e6, 1),
+            "failures": self.failures,
+        }
+
+
+class DetectorPool:
+    """
+    Detector stand-in for an ingestion node whose detection runs on a pool
+    of detector workers (local processes or other hosts).
+
+    InferenceScheduler keeps doing admission, fair sharing and latest-frame
+    batching per camera; submit_batch() then spreads the frames over the
+    workers one by one, each to the connection with the least in-flight
+    requests plus reported worker queue depth, and returns futures that the
+    connections' reader threads complete. Only workers that report a loaded
+    model take frames, and the pool is ready once one of them does. Each connection carries at most
+    max_in_flight requests; when every worker is full, dispatch blocks and
+    newer frames keep replacing older ones in the scheduler. Lost workers
+    fail their in-flight frames and are reconnected every retry_s.
+    """
+
+    def __init__(self, addresses, max_in_flight=4, encoding=None, jpeg_quality=90,
+                 retry_s=2.0, submit_timeout_s=5.0, processes=()):
+        self.connections = []
+        for address in addresses:
+            # Raw pixels over local sockets, JPEG over the network by default
+            name = encoding or ("raw" if address.startswith("unix://") else "jpeg")
+            self.connections.append(WorkerConnection(address, ENCODINGS[name], jpeg_quality, self._notify))
+        self.max_in_flight = max_in_flight
+        self.retry_s = retry_s
+        self.submit_timeout_s = submit_timeout_s
+        self.processes = list(processes)
+        if self.processes:
+            atexit.register(self.close)
+        self.request_ids = itertools.count(1)
+        self.cond = threading.Condition()
+        self.ready = threading.Event()
+        self.running = False
+        self.overlay = OverlayRenderer(COCO_NAMES)
+
+    @classmethod
+    def from_spec(cls, spec, **kwargs):
+        """'local:N' spawns N worker processes on this host, otherwise comma-separated addresses."""
+        if spec.startswith("local:"):
+            addresses, processes = spawn_local_workers(int(spec[len("local:"):]))
+            return cls(addresses, processes=processes, **kwargs)
+        return cls([a.strip() for a in spec.split(",") if a.strip()], **kwargs)
+
+    def start(self):
+        self.running = True
+        threading.Thread(target=self._connect_loop, daemon=True, name="detector-pool").start()
+
+    def _connect_loop(self):
+        while self.running:
+            for conn in self.connections:
+                if not conn.connected:
+                    try:
+                        conn.connect()
+                    except OSError:
+                        continue
+            self._notify()
+            time.sleep(self.retry_s)
+
+    def _notify(self):
+        with self.cond:
+            if any(conn.available for conn in self.connections):
+                self.ready.set()
+            else:
+                self.ready.clear()
+            self.cond.notify_all()
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def _pick(self):
+        available = [conn for conn in self.connections
+                     if conn.available and len(conn.inflight) < self.max_in_flight]
+        return min(available, key=lambda conn: conn.load) if available else None
+
+    def submit(self, frame, timestamp=None):
+        future = Future()
+        deadline = time.monotonic() + self.submit_timeout_s
+        with self.cond:
+            conn = self._pick()
+            while conn is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    future.set_exception(TimeoutError("no detector worker available"))
+                    return future
+                self.cond.wait(remaining)
+                conn = self._pick()
+            request_id = next(self.request_ids)
+        conn.send(request_id, frame, timestamp or time.time(), future)
+        return future
+
+    def submit_batch(self, frames):
+        return [self.submit(frame) for frame in frames]
+
+    def predict_batch(self, frames):
+        return [future.result() for future in self.submit_batch(frames)]
+
+    @property
+    def frame_ms(self):
+        """Effective ms per frame of the whole pool (workers run in parallel)."""
+        rates = [1000.0 / conn.frame_ms for conn in self.connections if conn.connected and conn.frame_ms]
+        return 1000.0 / sum(rates) if rates else None
+
+    def close(self):
+        self.running = False
+        for conn in self.connections:
+            conn.close()
+        for process in self.processes:
+            process.terminate()
+
+    def stats(self):
+        frame_ms = self.frame_ms
+        return {
+            "state": "ready" if self.ready.is_set() else "connecting",
+            "ready": self.ready.is_set(),
+            "max_in_flight": self.max_in_flight,
+            "pool_frame_ms": round(frame_ms, 2) if frame_ms else None,
+            "workers": {conn.address: conn.stats() for conn in self.connections},
+        }
+
+
+def spawn_local_workers(count, directory=None):
+    """Start `count` detector worker processes on Unix sockets; returns (addresses, processes)."""
+    directory = directory or tempfile.mkdtemp(prefix="mv-detectors-")
+    addresses, processes = [], []
+    for i in range(count):
+        address = f"unix://{os.path.join(directory, f'detector-{i}.sock')}"
+        # Plain subprocesses, like capture workers: they never import the server
+        processes.append(subprocess.Popen([sys.executable, os.path.abspath(__file__), "--listen", address]))
+        addresses.append(address)
+    print(f"[CLUSTER] Spawned {count} local detector workers in {directory}")
+    return addresses, processes
+
+
+# ========== Worker side ==========
+class DetectorServer:
+    """
+    Detector worker: accepts ingestion connections and feeds every decoded
+    frame into one local InferenceScheduler, so frames from all connections
+    and cameras share the same batches. Each result is written back on its
+    connection as soon as its batch completes, tagged with the request id
+    and the worker's model readiness, current queue depth and per-frame time.
+    A readiness update goes out on connect and again once the model is ready,
+    so ingestion nodes do not route frames to a worker that is still loading.
+    """
+
+    def __init__(self, address, scheduler):
+        self.address = address
+        self.scheduler = scheduler
+        self.connection_ids = itertools.count(1)
+        self.connections = 0
+        self.requests = 0
+
+    def model_ready(self):
+        wait = getattr(self.scheduler.detector, "wait", None)
+        return wait is None or wait(0)
+
+    def serve_forever(self):
+        family, target = parse_address(self.address)
+        if family == socket.AF_UNIX and os.path.exists(target):
+            os.unlink(target)
+        server = socket.socket(family, socket.SOCK_STREAM)
+        if family == socket.AF_INET:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server.bind(target)
+        server.listen()
+        print(f"[DETECTOR] Listening on {self.address}")
+        while True:
+            sock, _ = server.accept()
+            if family == socket.AF_INET:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._serve, args=(sock, next(self.connection_ids)), daemon=True).start()
+
+    def _serve(self, sock, conn_id):
+        self.connections += 1
+        write_lock = threading.Lock()
+
+        def reply(request_id, status, payload=b""):
+            depth = len(self.scheduler.pending)
+            header = RESPONSE.pack(MAGIC, status, self.model_ready(), request_id, depth,
+                                   self.scheduler.frame_ms or 0.0, len(payload))
+            try:
+                with write_lock:
+                    sock.sendall(header + payload)
+            except OSError:
+                pass
+
+        def announce_ready():
+            self.scheduler.detector.wait()
+            reply(0, STATUS)
+
+        def done(key, future):
+            # Unique per-request keys: drop them so the batching target stays
+            # the number of requests actually outstanding
+            self.scheduler.forget(key)
+            if future.cancelled():
+                return
+            error = future.exception()
+            if error is not None:
+                reply(key[1], ERROR, str(error).encode())
+            else:
+                reply(key[1], OK, np.asarray(future.result(), DETECTIONS_DTYPE).tobytes())
+
+        reply(0, STATUS)
+        if not self.model_ready():
+            threading.Thread(target=announce_ready, daemon=True).start()
+        try:
+            while True:
+                magic, encoding, request_id, _, height, width, size = REQUEST.unpack(recv_exact(sock, REQUEST.size))
+                if magic != MAGIC:
+                    raise ConnectionError("bad request header")
+                payload = recv_exact(sock, size)
+                self.requests += 1
+                try:
+                    frame = decode_frame(payload, encoding, height, width)
+                except ValueError as e:
+                    reply(request_id, ERROR, str(e).encode())
+                    continue
+                key = (conn_id, request_id)
+                self.scheduler.submit(key, frame).add_done_callback(lambda f, key=key: done(key, f))
+        except (OSError, ConnectionError, struct.error):
+            pass
+        finally:
+            self.scheduler.forget(conn_id)
+            self.connections -= 1
+            sock.close()
+
+
+def worker_main(address):
+    from inference_scheduler import InferenceScheduler
+    from model_loader import ModelLoader, resolve_weights, DEFAULT_CACHE_DIR
+    from yolo_detector import YOLODetector
+
+    model = ModelLoader(lambda: YOLODetector(
+        backend=os.environ.get("DETECTOR_BACKEND", "torchhub"),
+        weights=resolve_weights(os.environ.get("DETECTOR_WEIGHTS")),
+        cache_dir=DEFAULT_CACHE_DIR,
+    ))
+    scheduler = InferenceScheduler(model, max_batch_size=int(os.environ.get("DETECTOR_BATCH", 8)), max_wait_ms=10)
+    model.start()
+    scheduler.start()
+    DetectorServer(address, scheduler).serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Detector worker for cluster mode")
+    parser.add_argument("--listen", required=True, help="unix:///path/to.sock or tcp://host:port")
+    worker_main(parser.parse_args().listen)
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+from collections import deque
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+from metrics import REGISTRY
+
+DEFAULT_RECORDING_CONFIG = {
+    "dir": None,          # enables event recording for the camera
+    "pre_roll_s": 5.0,    # encoded footage kept from before the trigger
+    "post_roll_s": 10.0,  # keep recording this long after the last trigger
+    "segment_s": 60,      # split long events into segments
+    "container": "mp4",   # mp4 | mkv
+}
+
+MUXERS = {"mp4": "mp4mux", "mkv": "matroskamux"}
+
+
+def recording_config(overrides=None):
+    config = dict(DEFAULT_RECORDING_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key in config and value not in (None, ""):
+            try:
+                config[key] = type(DEFAULT_RECORDING_CONFIG[key] or value)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid recording {key} {value!r}") from None
+    if config["container"] not in MUXERS:
+        raise ValueError(f"container must be one of {', '.join(MUXERS)}")
+    return config
+
+
+class EventRecorder:
+    """
+    Event clips from a camera's shared H264Encoder, without re-encoding.
+
+    Attached as an encoder output, it keeps the last pre_roll_s seconds of
+    encoded access units in a ring that always starts on a keyframe (at
+    most pre-roll plus one GOP of compressed data, instead of raw frames).
+    trigger() opens a splitmuxsink writer, flushes the ring into it and
+    keeps appending live access units until post_roll_s after the last
+    trigger; then the clip is finalized with EOS.
+    """
+
+    def __init__(self, encoder, config=None):
+        self.encoder = encoder
+        self.config = recording_config(config)
+        self.cam_id = encoder.channel.cam_id
+        self.variant = encoder.channel.variant
+        self.ring = deque()  # (pts, buffer, keyframe)
+        self.ring_bytes = 0
+        self.lock = threading.Lock()
+        self.writer = None
+        self.appsrc = None
+        self.base_pts = None
+        self.stop_at = 0.0
+        self.last_pts = -1
+        self.clips = 0
+        self.triggers = 0
+        self.written_bytes = 0
+        labels = {"camera": self.cam_id, "variant": self.variant}
+        REGISTRY.gauge("preroll_bytes", lambda: self.ring_bytes, "Encoded bytes held for pre-roll", **labels)
+        REGISTRY.counter_func("event_clips_total", lambda: self.clips, "Event clips started", **labels)
+        os.makedirs(self.config["dir"], exist_ok=True)
+        encoder.attach(self.on_encoded)
+
+    def close(self):
+        self.encoder.detach(self.on_encoded)
+        self.flush()
+
+    def wall_time(self, pts):
+        """Capture wall-clock time of an encoded buffer (encoder PTS are capture based)."""
+        return (self.encoder.base_timestamp or 0.0) + pts / Gst.SECOND
+
+    def on_encoded(self, buf):
+        keyframe = not buf.has_flags(Gst.BufferFlags.DELTA_UNIT)
+        with self.lock:
+            if buf.pts <= self.last_pts:
+                # Encoder restarted: its timeline starts over
+                self.ring.clear()
+                self.ring_bytes = 0
+            self.last_pts = buf.pts
+            self.ring.append((buf.pts, buf, keyframe))
+            self.ring_bytes += buf.get_size()
+            self._trim(buf.pts)
+            if self.writer is None:
+                return
+            self._push(buf)
+            finished = self.wall_time(buf.pts) > self.stop_at
+        if finished:
+            self.flush()
+
+    def _trim(self, newest_pts):
+        # Drop whole GOPs while the next keyframe is still old enough to
+        # cover the pre-roll on its own.
+        horizon = newest_pts - int(self.config["pre_roll_s"] * Gst.SECOND)
+        while True:
+            second_key = next((i for i, (_, _, key) in enumerate(self.ring) if key and i > 0), None)
+            if second_key is None or self.ring[second_key][0] > horizon:
+                return
+            for _ in range(second_key):
+                self.ring_bytes -= self.ring.popleft()[1].get_size()
+
+    def trigger(self, timestamp=None):
+        """Start (or extend) an event clip; timestamp is the capture time of the triggering frame."""
+        timestamp = timestamp or time.time()
+        with self.lock:
+            self.triggers += 1
+            self.stop_at = max(self.stop_at, timestamp + self.config["post_roll_s"])
+            if self.writer is not None:
+                return
+            start = next((i for i, (_, _, key) in enumerate(self.ring) if key), None)
+            if start is None:
+                return  # no keyframe yet; the next trigger will start the clip
+            self._open(timestamp)
+            for i, (_, buf, _) in enumerate(self.ring):
+                if i >= start:
+                    self._push(buf)
+
+    def _open(self, timestamp):
+        c = self.config
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(timestamp))
+        location = os.path.join(c["dir"], f"{self.cam_id}_{self.variant}_{stamp}_%03d.{c['container']}")
+        self.writer = Gst.parse_launch(
+            'appsrc name=src is-live=false format=time '
+            'caps="video/x-h264,stream-format=byte-stream,alignment=au" ! '
+            'h264parse ! video/x-h264,stream-format=avc,alignment=au ! '
+            f'splitmuxsink muxer-factory={MUXERS[c["container"]]} '
+            f'max-size-time={int(c["segment_s"] * Gst.SECOND)} location="{location}"'
+        )
+        self.appsrc = self.writer.get_by_name("src")
+        self.writer.set_state(Gst.State.PLAYING)
+        self.base_pts = None
+        self.clips += 1
+        print(f"[REC] {self.cam_id}/{self.variant}: event clip {location}")
+
+    def _push(self, buf):
+        if self.base_pts is None:
+            self.base_pts = buf.pts
+        # Shallow copy: same compressed memory, clip-relative timestamps
+        out = buf.copy()
+        out.pts = out.dts = buf.pts - self.base_pts
+        self.written_bytes += out.get_size()
+        self.appsrc.emit("push-buffer", out)
+
+    def flush(self):
+        """Finish the running clip (if any) and finalize its file in the background."""
+        with self.lock:
+            writer, appsrc = self.writer, self.appsrc
+            self.writer = self.appsrc = None
+        if writer is None:
+            return
+        appsrc.emit("end-of-stream")
+        threading.Thread(target=self._finalize, args=(writer,), daemon=True).start()
+
+    def _finalize(self, writer):
+        bus = writer.get_bus()
+        msg = bus.timed_pop_filtered(10 * Gst.SECOND, Gst.MessageType.EOS | Gst.MessageType.ERROR)
+        if msg is not None and msg.type == Gst.MessageType.ERROR:
+            err, _ = msg.parse_error()
+            print(f"[REC] {self.cam_id}/{self.variant}: {err.message}")
+        writer.set_state(Gst.State.NULL)
+
+    def stats(self):
+        with self.lock:
+            span = (self.ring[-1][0] - self.ring[0][0]) / Gst.SECOND if len(self.ring) > 1 else 0.0
+            return {
+                "recording": self.writer is not None,
+                "clips": self.clips,
+                "triggers": self.triggers,
+                "preroll_s": round(span, 2),
+                "preroll_bytes": self.ring_bytes,
+                "written_bytes": self.written_bytes,
+                "config": self.config,
+            }
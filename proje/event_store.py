@@ -0,0 +1,195 @@
+import os
+import re
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+# Column name -> (dtype, values per row)
+COLUMNS = {
+    "ts": (np.float64, 1),
+    "cls": (np.int16, 1),
+    "score": (np.float32, 1),
+    "box": (np.float32, 4),
+    "track": (np.int64, 1),
+}
+
+
+CAM_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def check_cam_id(cam_id):
+    """Camera ids name directories (and RTSP mounts): letters, digits, '_', '-', '.'."""
+    if not isinstance(cam_id, str) or not CAM_ID_PATTERN.fullmatch(cam_id):
+        raise ValueError(f"invalid camera id {cam_id!r}")
+    return cam_id
+
+
+def segment_name(timestamp):
+    return time.strftime("%Y%m%d%H", time.gmtime(timestamp))
+
+
+class EventStore:
+    """
+    Append-only columnar store of detections.
+
+    Every camera gets one segment directory per UTC hour holding one raw
+    binary file per column (ts, cls, score, box, track). append() only puts
+    the rows in a bounded in-memory buffer; a flusher thread appends them to
+    the column files. Camera ids must pass check_cam_id() so they cannot
+    escape the root directory. Queries memory-map the segments that overlap the
+    requested range and filter them with NumPy.
+    """
+
+    def __init__(self, root="events_db", flush_interval_s=1.0, max_pending=100000):
+        self.root = root
+        self.flush_interval_s = flush_interval_s
+        self.max_pending = max_pending
+        self.pending = deque()
+        self.pending_rows = 0
+        self.lock = threading.Lock()
+        self.running = True
+        self.written_rows = 0
+        self.dropped_rows = 0
+        os.makedirs(root, exist_ok=True)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    # ---------- writing ----------
+    def append(self, cam_id, timestamp, detections):
+        """Buffer one frame's Detections; never touches the disk."""
+        n = len(detections.boxes)
+        if not n:
+            return
+        with self.lock:
+            if self.pending_rows + n > self.max_pending:
+                self.dropped_rows += n
+                return
+            self.pending.append((cam_id, timestamp, detections))
+            self.pending_rows += n
+
+    def _run(self):
+        while self.running:
+            time.sleep(self.flush_interval_s)
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            frames, self.pending = self.pending, deque()
+            self.pending_rows = 0
+        if not frames:
+            return
+        groups = {}
+        for cam_id, timestamp, det in frames:
+            groups.setdefault((cam_id, segment_name(timestamp)), []).append((timestamp, det))
+        for (cam_id, segment), items in groups.items():
+            path = self._cam_dir(cam_id)
+            if path is None:
+                with self.lock:
+                    self.dropped_rows += sum(len(d.boxes) for _, d in items)
+                continue
+            path = os.path.join(path, segment)
+            columns = {
+                "ts": np.concatenate([np.full(len(d.boxes), ts, np.float64) for ts, d in items]),
+                "cls": np.concatenate([d.classes for _, d in items]),
+                "score": np.concatenate([d.scores for _, d in items]),
+                "box": np.concatenate([d.boxes for _, d in items]),
+                "track": np.concatenate([d.track_ids for _, d in items]),
+            }
+            os.makedirs(path, exist_ok=True)
+            # ts is written last so readers never see timestamps without data
+            for name in ("cls", "score", "box", "track", "ts"):
+                dtype, _ = COLUMNS[name]
+                with open(os.path.join(path, name), "ab") as f:
+                    f.write(np.ascontiguousarray(columns[name], dtype).tobytes())
+            with self.lock:
+                self.written_rows += len(columns["ts"])
+
+    def close(self):
+        self.running = False
+        self.flush()
+
+    def _cam_dir(self, cam_id):
+        try:
+            return os.path.join(self.root, check_cam_id(cam_id))
+        except ValueError:
+            return None
+
+    # ---------- reading ----------
+    def _segments(self, cam_id, t_from, t_to):
+        cam_dir = self._cam_dir(cam_id)
+        if cam_dir is None or not os.path.isdir(cam_dir):
+            return []
+        first, last = segment_name(t_from), segment_name(t_to)
+        return [os.path.join(cam_dir, s) for s in sorted(os.listdir(cam_dir)) if first <= s <= last]
+
+    @staticmethod
+    def _map(path):
+        sizes = {}
+        for name, (dtype, width) in COLUMNS.items():
+            file = os.path.join(path, name)
+            size = os.path.getsize(file) if os.path.exists(file) else 0
+            sizes[name] = size // (np.dtype(dtype).itemsize * width)
+        rows = min(sizes.values())
+        if not rows:
+            return None
+        mapped = {}
+        for name, (dtype, width) in COLUMNS.items():
+            shape = (rows, width) if width > 1 else (rows,)
+            mapped[name] = np.memmap(os.path.join(path, name), dtype=dtype, mode="r", shape=shape)
+        return mapped
+
+    def query(self, cam_id, t_from, t_to, class_id=None, limit=None):
+        """Rows with t_from <= ts < t_to as a dict of NumPy column arrays."""
+        parts = []
+        for path in self._segments(cam_id, t_from, t_to):
+            seg = self._map(path)
+            if seg is None:
+                continue
+            # Rows are appended in time order within a segment
+            lo, hi = np.searchsorted(seg["ts"], [t_from, t_to])
+            mask = slice(lo, hi)
+            part = {name: np.asarray(col[mask]) for name, col in seg.items()}
+            if class_id is not None:
+                keep = part["cls"] == class_id
+                part = {name: col[keep] for name, col in part.items()}
+            parts.append(part)
+        if not parts:
+            return {name: np.zeros((0, w) if w > 1 else 0, d) for name, (d, w) in COLUMNS.items()}
+        result = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+        if limit is not None:
+            result = {name: col[:limit] for name, col in result.items()}
+        return result
+
+    def counts(self, cam_id, t_from, t_to, class_id=0, bucket_s=60):
+        """
+        Per-bucket aggregates: max objects in a single frame, detections and
+        distinct track ids, all computed with vectorised NumPy reductions.
+        """
+        rows = self.query(cam_id, t_from, t_to, class_id)
+        if not len(rows["ts"]):
+            return []
+        frame_ts, per_frame = np.unique(rows["ts"], return_counts=True)
+        frame_bucket = (frame_ts // bucket_s).astype(np.int64)
+        buckets, starts = np.unique(frame_bucket, return_index=True)
+        max_count = np.maximum.reduceat(per_frame, starts)
+        detections = np.add.reduceat(per_frame, starts)
+        # distinct (bucket, track) pairs per bucket
+        row_bucket = (rows["ts"] // bucket_s).astype(np.int64)
+        pairs = np.unique(np.stack([row_bucket, rows["track"]], 1), axis=0)
+        track_buckets, tracks = np.unique(pairs[:, 0], return_counts=True)
+        tracks_per_bucket = dict(zip(track_buckets.tolist(), tracks.tolist()))
+        return [
+            {
+                "start": int(b * bucket_s),
+                "max_count": int(m),
+                "detections": int(d),
+                "tracks": tracks_per_bucket.get(int(b), 0),
+            }
+            for b, m, d in zip(buckets, max_count, detections)
+        ]
+
+    def stats(self):
+        with self.lock:
+            return {"pending_rows": self.pending_rows, "written_rows": self.written_rows, "dropped_rows": self.dropped_rows}
@@ -0,0 +1,41 @@
+# Export YOLOv5 once (needs network + torch) for the offline detector backends.
+#
+#   python3 export_model.py --model yolov5s --out weights
+#   DETECTOR_BACKEND=onnx DETECTOR_WEIGHTS=weights/yolov5s.onnx python3 gstreamer_server.py
+
+import argparse
+import os
+
+import torch
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export YOLOv5 to ONNX / TorchScript")
+    parser.add_argument("--model", default="yolov5s")
+    parser.add_argument("--img-size", type=int, default=640)
+    parser.add_argument("--out", default="weights")
+    parser.add_argument("--formats", nargs="+", default=["onnx", "torchscript"], choices=["onnx", "torchscript"])
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    model = torch.hub.load('ultralytics/yolov5', args.model, pretrained=True, autoshape=False).eval()
+    model.model[-1].export = True  # Detect layer returns only the concatenated predictions
+    dummy = torch.zeros(1, 3, args.img_size, args.img_size)
+
+    if "onnx" in args.formats:
+        path = os.path.join(args.out, f"{args.model}.onnx")
+        torch.onnx.export(
+            model, dummy, path, opset_version=12,
+            input_names=["images"], output_names=["output"],
+            dynamic_axes={"images": {0: "batch"}, "output": {0: "batch"}},
+        )
+        print(f"[EXPORT] {path}  (OpenVINO can load this file directly)")
+
+    if "torchscript" in args.formats:
+        path = os.path.join(args.out, f"{args.model}.torchscript")
+        torch.jit.trace(model, dummy, strict=False).save(path)
+        print(f"[EXPORT] {path}")
+
+
+if __name__ == "__main__":
+    main()
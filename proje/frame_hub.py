@@ -0,0 +1,248 @@
+import threading
+import time
+
+import cv2
+
+from metrics import REGISTRY
+
+MJPEG_BOUNDARY = "frame"
+MJPEG_MIMETYPE = f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+
+
+class FrameChannel:
+    """
+    Latest frame of one camera variant (e.g. raw / annotated) plus an
+    encode-once JPEG cache. Each published frame gets a sequence number and
+    is JPEG-encoded at most once, on first request; every MJPEG viewer of the
+    channel shares the same cached bytes and sleeps on a condition variable
+    until the next frame is published.
+    """
+
+    def __init__(self, cam_id, variant, jpeg_quality=95):
+        self.cam_id = cam_id
+        self.variant = variant
+        self.jpeg_quality = jpeg_quality
+        self.cond = threading.Condition()
+        self.frame = None
+        self.seq = 0
+        self.timestamp = None
+        self.viewers = 0
+        self.holds = 0
+        self.closed = False
+        self.encodes = 0
+        self._encode_lock = threading.Lock()
+        self._part = None
+        self._part_seq = 0
+        self._memo_lock = threading.Lock()
+        self._memo = {}
+        self._listeners = []
+        self._demand_lock = threading.Lock()
+        self._demand_listeners = []
+        labels = {"camera": cam_id, "variant": variant}
+        self.encode_ms = REGISTRY.histogram("stage_ms", stage="jpeg_encode", **labels)
+        self.publish_ms = REGISTRY.histogram("stage_ms", stage="publish", **labels)
+        REGISTRY.gauge("viewers", lambda: self.viewers, "Active MJPEG viewers", **labels)
+        REGISTRY.counter_func("jpeg_encodes_total", lambda: self.encodes, "JPEG encodes (once per frame)", **labels)
+
+    def publish(self, frame, timestamp=None):
+        started = time.perf_counter()
+        with self.cond:
+            self.closed = False
+            self.frame = frame
+            self.timestamp = timestamp or time.time()
+            self.seq += 1
+            seq, timestamp = self.seq, self.timestamp
+            listeners = list(self._listeners)
+            self.cond.notify_all()
+        for listener in listeners:
+            try:
+                listener(self, seq, timestamp)
+            except Exception as e:
+                print(f"[HUB] {self.cam_id}/{self.variant} listener failed: {e}")
+        self.publish_ms.observe((time.perf_counter() - started) * 1000.0)
+        return seq
+
+    def subscribe(self, listener):
+        """Call listener(channel, seq, timestamp) on the publishing thread for every new frame."""
+        with self.cond:
+            self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        with self.cond:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def wait(self, last_seq, timeout=None):
+        """Block until a frame newer than last_seq exists; returns its seq or None."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.seq > last_seq, timeout):
+                return None
+            if self.seq <= last_seq:
+                return None
+            return self.seq
+
+    def close(self):
+        """Camera stopped: end all MJPEG streams of this channel. The next publish reopens it."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def add_viewer(self):
+        self._update_consumers(viewers=1)
+
+    def remove_viewer(self):
+        self._update_consumers(viewers=-1)
+
+    def latest(self):
+        with self.cond:
+            return self.seq, self.frame, self.timestamp
+
+    def hold(self):
+        """Register a non-HTTP consumer (e.g. a running encoder) of this channel."""
+        self._update_consumers(holds=1)
+
+    def release(self):
+        self._update_consumers(holds=-1)
+
+    def on_demand(self, callback):
+        """Call callback(active) whenever the channel gains its first or loses its last consumer."""
+        with self._demand_lock:
+            self._demand_listeners.append(callback)
+
+    def _update_consumers(self, viewers=0, holds=0):
+        with self._demand_lock:
+            with self.cond:
+                before = self.has_consumers()
+                self.viewers += viewers
+                self.holds = max(self.holds + holds, 0)
+                after = self.has_consumers()
+            if before != after:
+                for callback in self._demand_listeners:
+                    callback(after)
+
+    def has_consumers(self):
+        """True while MJPEG viewers or held consumers want frames of this channel."""
+        return self.viewers > 0 or self.holds > 0
+
+    def memo(self, key, build):
+        """
+        Per-frame derived value (e.g. a wrapped Gst.Buffer) built at most once
+        per seq and shared by every consumer. Returns None before the first frame.
+        """
+        with self._memo_lock:
+            seq, frame, _ = self.latest()
+            if frame is None:
+                return None
+            cached = self._memo.get(key)
+            if cached is not None and cached[0] == seq:
+                return cached[1]
+            value = build(frame)
+            self._memo[key] = (seq, value)
+            return value
+
+    def cached_part(self):
+        """(seq, part) if the current frame is already encoded, else None."""
+        part_seq, part = self._part_seq, self._part
+        if part is not None and part_seq == self.seq:
+            return part_seq, part
+        return None
+
+    def mjpeg_part(self):
+        """Multipart chunk for the current frame, encoded once per seq."""
+        with self._encode_lock:
+            seq, frame, _ = self.latest()
+            if frame is None:
+                return 0, None
+            if self._part_seq != seq:
+                started = time.perf_counter()
+                ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+                if not ok:
+                    return seq, None
+                self._part = (
+                    f"--{MJPEG_BOUNDARY}\r\nContent-Type: image/jpeg\r\n\r\n".encode()
+                    + jpeg.tobytes() + b'\r\n'
+                )
+                self._part_seq = seq
+                self.encodes += 1
+                self.encode_ms.observe((time.perf_counter() - started) * 1000.0)
+            return self._part_seq, self._part
+
+    def mjpeg_stream(self):
+        """Generator for a multipart/x-mixed-replace HTTP response."""
+        self.add_viewer()
+        try:
+            last_seq = 0
+            while not self.closed:
+                if self.wait(last_seq, timeout=1.0) is None:
+                    continue
+                last_seq, part = self.mjpeg_part()
+                if part is not None:
+                    yield part
+        finally:
+            self.remove_viewer()
+
+    def stats(self):
+        return {"seq": self.seq, "viewers": self.viewers, "consumers": self.holds, "jpeg_encodes": self.encodes}
+
+
+class FrameHub:
+    """Registry of FrameChannels keyed by (cam_id, variant)."""
+
+    def __init__(self, jpeg_quality=95):
+        self.jpeg_quality = jpeg_quality
+        self.channels = {}
+        self.watchers = {}  # cam_id -> [callback(channel, active)]
+        self._lock = threading.Lock()
+
+    def channel(self, cam_id, variant):
+        key = (cam_id, variant)
+        with self._lock:
+            ch = self.channels.get(key)
+            if ch is None:
+                ch = FrameChannel(cam_id, variant, self.jpeg_quality)
+                for callback in self.watchers.get(cam_id, []):
+                    self._watch_channel(ch, callback)
+                self.channels[key] = ch
+            return ch
+
+    @staticmethod
+    def _watch_channel(ch, callback):
+        ch.on_demand(lambda active: callback(ch, active))
+
+    def watch(self, cam_id, callback):
+        """callback(channel, active) on demand changes of every current and future channel of cam_id."""
+        with self._lock:
+            self.watchers.setdefault(cam_id, []).append(callback)
+            channels = [ch for (cid, _), ch in self.channels.items() if cid == cam_id]
+        for ch in channels:
+            self._watch_channel(ch, callback)
+
+    def has_demand(self, cam_id):
+        with self._lock:
+            return any(ch.has_consumers() for (cid, _), ch in self.channels.items() if cid == cam_id)
+
+    def remove(self, cam_id):
+        """Camera removed: end its streams and forget its channels and watchers."""
+        self.close(cam_id)
+        with self._lock:
+            for key in [key for key in self.channels if key[0] == cam_id]:
+                del self.channels[key]
+            self.watchers.pop(cam_id, None)
+
+    def has_channel(self, cam_id, variant):
+        with self._lock:
+            return (cam_id, variant) in self.channels
+
+    def publish(self, cam_id, variant, frame, timestamp=None):
+        return self.channel(cam_id, variant).publish(frame, timestamp)
+
+    def close(self, cam_id):
+        with self._lock:
+            channels = [ch for (cid, _), ch in self.channels.items() if cid == cam_id]
+        for ch in channels:
+            ch.close()
+
+    def stats(self, cam_id):
+        with self._lock:
+            channels = [ch for (cid, _), ch in self.channels.items() if cid == cam_id]
+        return {ch.variant: ch.stats() for ch in channels}
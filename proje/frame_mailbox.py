@@ -0,0 +1,58 @@
+import threading
+import time
+from collections import namedtuple
+
+FrameEntry = namedtuple("FrameEntry", ["seq", "frame", "timestamp"])
+
+
+class LatestFrameMailbox:
+    """
+    Single-slot "latest frame wins" mailbox between a capture stage and an
+    analytics stage. put() never blocks and always overwrites the slot;
+    take() returns the newest frame. Frames that are overwritten before
+    being taken are counted as dropped.
+    """
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.entry = None
+        self.seq = 0
+        self.taken_seq = 0
+        self.captured = 0
+        self.processed = 0
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, frame, timestamp=None):
+        with self.cond:
+            if self.entry is not None and self.entry.seq > self.taken_seq:
+                self.dropped += 1
+            self.seq += 1
+            self.captured += 1
+            self.entry = FrameEntry(self.seq, frame, timestamp or time.time())
+            self.cond.notify()
+            return self.seq
+
+    def take(self, timeout=None):
+        """Wait for a frame newer than the last one taken. Returns None on timeout/close."""
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.closed or self.seq > self.taken_seq, timeout):
+                return None
+            if self.closed:
+                return None
+            self.taken_seq = self.entry.seq
+            self.processed += 1
+            return self.entry
+
+    def close(self):
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            return {
+                "captured_frames": self.captured,
+                "processed_frames": self.processed,
+                "dropped_frames": self.dropped,
+            }
@@ -0,0 +1,48 @@
+import sys
+import threading
+
+import numpy as np
+
+
+class FramePool:
+    """
+    Preallocated frame buffers for one camera.
+
+    Buffers are reference-counted through Python itself: a buffer goes back
+    into circulation as soon as nothing but the pool refers to it (no
+    mailbox slot, FrameChannel, view or detector input holds it any more).
+    When every buffer is still in use the pool grows up to max_size, after
+    which plain allocations are handed out untracked.
+    """
+
+    def __init__(self, shape, dtype=np.uint8, size=4, max_size=16):
+        self.shape = tuple(shape)
+        self.dtype = dtype
+        self.max_size = max_size
+        self.frames = [np.empty(self.shape, dtype) for _ in range(size)]
+        self.allocations = size
+        self.reuses = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            for arr in self.frames:
+                # Only the pool list, the loop variable and getrefcount's
+                # own argument refer to a free buffer.
+                if sys.getrefcount(arr) <= 3:
+                    self.reuses += 1
+                    return arr
+            arr = np.empty(self.shape, self.dtype)
+            self.allocations += 1
+            if len(self.frames) < self.max_size:
+                self.frames.append(arr)
+            return arr
+
+    def copy_in(self, data):
+        """Copy raw frame bytes (e.g. a mapped Gst buffer) into a pooled frame."""
+        frame = self.acquire()
+        np.copyto(frame, np.frombuffer(data, dtype=self.dtype).reshape(self.shape))
+        return frame
+
+    def stats(self):
+        return {"pool_size": len(self.frames), "allocations": self.allocations, "reuses": self.reuses}
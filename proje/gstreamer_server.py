@@ -1,61 +1,51 @@
 # === Intelligent Multi-Source Video Analytics & Streaming Platform ===
 # main_server.py (Dual Stream: Raw & Annotated + Toggle Button)
 
+import os
 import threading
 import time
-import json
 import warnings
-import numpy as np
-import paho.mqtt.client as mqtt
 from flask import Flask, Response, request, jsonify
 from yolo_detector import YOLODetector
+from model_loader import ModelLoader, resolve_weights, DEFAULT_CACHE_DIR
+from detector_cluster import DetectorPool
+from inference_scheduler import InferenceScheduler
+from frame_mailbox import LatestFrameMailbox
+from camera_pipeline import AnalyticsWorker, analytics_config
+from frame_hub import FrameHub, MJPEG_MIMETYPE
+from source_pipeline import SourcePipeline, source_config
+from lifecycle import CameraLifecycle, lifecycle_config, ACTIVE, IDLE, STOPPED
+from h264_encoder import H264Encoder, H264RTSPFactory, encoder_config
+from ladder import Rendition, ladder_config, rung_encoder_config
+from event_recorder import EventRecorder, recording_config
+from process_workers import ProcessCapture
+from event_store import EventStore, check_cam_id
+from asgi_server import run_asgi
+from metrics import REGISTRY
+from mqtt_module import MQTTClient, EventPublisher
 
 import gi
 
 gi.require_version('Gst', '1.0')
 gi.require_version('GstRtspServer', '1.0')
-from gi.repository import Gst, GstRtspServer, GLib, GObject
+from gi.repository import Gst, GstRtspServer, GLib
 
-Gst.init(None)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
-detector = YOLODetector()
+# Detector, scheduler and event store are created by startup(), so importing
+# the server neither loads a model, spawns detector workers nor touches disk.
+model = None
+scheduler = None
+event_store = None
 streams = {}
 latest_frames = {}
 raw_frames = {}
+hub = FrameHub()
 mqtt_client = None
-
-# ========== RTSP Media Factory ==========
-class RTSPMediaFactory(GstRtspServer.RTSPMediaFactory):
-    def __init__(self, cam_id, use_raw=False):
-        super().__init__()
-        self.cam_id = cam_id
-        self.use_raw = use_raw
-        self.launch_string = (
-            'appsrc name=source is-live=true block=true format=time do-timestamp=true '
-            'caps="video/x-raw,format=BGR,width=640,height=480,framerate=30/1" ! '
-            'videoconvert ! x264enc tune=zerolatency bitrate=512 speed-preset=superfast ! '
-            'rtph264pay config-interval=1 name=pay0 pt=96'
-        )
-        self.set_launch(self.launch_string)
-        self.set_shared(True)
-        self.frame = None
-
-    def do_configure(self, media):
-        appsrc = media.get_element().get_child_by_name("source")
-        appsrc.connect("need-data", self.on_need_data)
-
-    def on_need_data(self, src, length):
-        frame = raw_frames.get(self.cam_id) if self.use_raw else latest_frames.get(self.cam_id)
-        if frame is None:
-            return
-        data = frame.tobytes()
-        buf = Gst.Buffer.new_allocate(None, len(data), None)
-        buf.fill(0, data)
-        timestamp = Gst.util_uint64_scale(Gst.util_get_timestamp(), 1, Gst.SECOND)
-        buf.pts = buf.dts = timestamp
-        buf.duration = Gst.util_uint64_scale_int(1, Gst.SECOND, 30)
-        src.emit("push-buffer", buf)
+event_publisher = None
+# Run every camera's capture in its own process (shared-memory frame ring)
+CAMERA_PROCESSES = os.environ.get("CAMERA_PROCESSES") == "1"
+REGISTRY.gauge("active_streams", lambda: len(streams), "Running cameras")
 
 # ========== RTSP Server ==========
 class RTSPServer:
@@ -64,6 +54,10 @@ class RTSPServer:
         self.server.set_service(str(port))
         self.mounts = self.server.get_mount_points()
         self.factories = {}
+        self.encoders = {}
+        self.renditions = {}
+        self.recorders = {}
+        self.paths = {}  # cam_id -> [(key, mount path)]
         self.loop = GLib.MainLoop()
         self.thread = threading.Thread(target=self.loop.run)
 
@@ -73,123 +67,296 @@ class RTSPServer:
         print("[RTSP] Server started at rtsp://localhost:8554/")
 
         
-    def add_stream(self, cam_id):
-        raw_factory = RTSPMediaFactory(cam_id, use_raw=True)
-        annotated_factory = RTSPMediaFactory(cam_id, use_raw=False)
-
-        self.mounts.add_factory(f"/raw/{cam_id}", raw_factory)
-        self.mounts.add_factory(f"/annotated/{cam_id}", annotated_factory)
-
-        self.factories[f"raw_{cam_id}"] = raw_factory
-        self.factories[f"annotated_{cam_id}"] = annotated_factory
-
-        print(f"[RTSP] Raw stream available at rtsp://localhost:8554/raw/{cam_id}")
-        print(f"[RTSP] Annotated stream available at rtsp://localhost:8554/annotated/{cam_id}")
-
+    def add_stream(self, cam_id, encoder_config=None, ladder=None, recording=None):
+        # One shared encoder per camera variant; RTSP mounts (and optional
+        # recording / HLS outputs) only re-packetize its H.264 output.
+        for variant in ("raw", "annotated"):
+            key = f"{variant}_{cam_id}"
+            if key in self.encoders:
+                continue
+            base = hub.channel(cam_id, variant)
+            self.mount(cam_id, key, f"/{variant}/{cam_id}", H264Encoder(base, encoder_config))
+            # Ladder rungs are scaled from the same frame, only while watched
+            for rung in ladder_config(ladder):
+                rendition = Rendition(hub, base, rung)
+                self.renditions.setdefault(cam_id, []).append(rendition)
+                self.mount(cam_id, f"{key}@{rendition.name}", f"/{variant}/{cam_id}/{rendition.name}",
+                           H264Encoder(rendition.channel, rendition.encoder_config(encoder_config)))
+        # Event clips are cut from the raw encoder's output (no overlay needed)
+        if recording and recording.get("dir") and cam_id not in self.recorders:
+            self.recorders[cam_id] = EventRecorder(self.encoders[f"raw_{cam_id}"], recording)
+
+    def mount(self, cam_id, key, path, encoder):
+        factory = H264RTSPFactory(encoder)
+        self.mounts.add_factory(path, factory)
+        self.encoders[key] = encoder
+        self.factories[key] = factory
+        self.paths.setdefault(cam_id, []).append((key, path))
+        print(f"[RTSP] Stream available at rtsp://localhost:8554{path}")
+
+    def remove_stream(self, cam_id):
+        """Unmount every path of the camera and stop its encoders and recorder."""
+        recorder = self.recorders.pop(cam_id, None)
+        if recorder is not None:
+            recorder.close()
+        for key, path in self.paths.pop(cam_id, []):
+            self.mounts.remove_factory(path)
+            self.factories.pop(key, None)
+            self.encoders.pop(key).close()
+            print(f"[RTSP] Removed rtsp://localhost:8554{path}")
+        self.renditions.pop(cam_id, None)
+
+    def trigger_recording(self, cam_id, timestamp):
+        recorder = self.recorders.get(cam_id)
+        if recorder is not None:
+            recorder.trigger(timestamp)
+
+    def recording_stats(self, cam_id):
+        recorder = self.recorders.get(cam_id)
+        return recorder.stats() if recorder else None
+
+    def ladder_stats(self, cam_id):
+        return {r.channel.variant: r.stats() for r in self.renditions.get(cam_id, [])}
+
+    def encoder_stats(self, cam_id):
+        return {
+            variant: self.encoders[f"{variant}_{cam_id}"].stats()
+            for variant in ("raw", "annotated")
+            if f"{variant}_{cam_id}" in self.encoders
+        }
 
-    def push_frame(self, cam_id, frame, raw=False):
+    def push_frame(self, cam_id, frame, raw=False, timestamp=None):
         if raw:
             raw_frames[cam_id] = frame
         else:
             latest_frames[cam_id] = frame
-        if cam_id in self.factories:
-            self.factories[cam_id].frame = frame
-
-rtsp_server = RTSPServer()
-rtsp_server.start()
+        hub.publish(cam_id, "raw" if raw else "annotated", frame, timestamp)
+
+rtsp_server = None
+media_ready = threading.Event()
+
+def start_media():
+    # Gst.init scans the plugin registry and the RTSP server starts a GLib
+    # loop; neither should delay the HTTP server answering /healthz
+    global rtsp_server
+    Gst.init(None)
+    server = RTSPServer()
+    server.start()
+    rtsp_server = server
+    media_ready.set()
+
+def build_model():
+    # DETECTOR_BACKEND: torchhub (default) | onnx | openvino | torchscript | stub
+    # The detector is built and warmed up in the background; weights come
+    # from MODEL_CACHE_DIR when present there.
+    # DETECTOR_WORKERS: cluster mode, detection runs on detector workers
+    # (python detector_cluster.py --listen ...) given as comma-separated
+    # unix:///path.sock / tcp://host:port addresses, or local:N to spawn N here.
+    if os.environ.get("DETECTOR_WORKERS"):
+        return DetectorPool.from_spec(os.environ["DETECTOR_WORKERS"])
+    return ModelLoader(lambda: YOLODetector(
+        backend=os.environ.get("DETECTOR_BACKEND", "torchhub"),
+        weights=resolve_weights(os.environ.get("DETECTOR_WEIGHTS")),
+        cache_dir=DEFAULT_CACHE_DIR,
+    ))
+
+def startup():
+    global model, scheduler, event_store
+    event_store = EventStore(os.environ.get("EVENT_STORE_DIR", "events_db"))
+    model = build_model()
+    scheduler = InferenceScheduler(model, max_batch_size=8, max_wait_ms=10)
+    scheduler.start()
+    model.start()
+    threading.Thread(target=start_media, daemon=True, name="media-init").start()
 
 # ========== GStreamer Ingestion (No OpenCV) ==========
 class GStreamerCamera(threading.Thread):
-    def __init__(self, cam_id, device_index):
+    def __init__(self, cam_id, source, isolated=False, analytics_config=None, source_config=None,
+                 lifecycle_config=None):
         super().__init__()
         self.cam_id = cam_id
-        self.device_index = device_index
+        self.source = source
+        self.isolated = isolated
+        self.capture = None
         self.running = False
+        self.mailbox = LatestFrameMailbox()
+        self.analytics = AnalyticsWorker(cam_id, self.mailbox, scheduler, self.on_result, analytics_config)
+        # Devices, files, RTSP and HTTP URLs, decoded and scaled to the
+        # inference resolution inside GStreamer
+        self.pipeline = SourcePipeline(cam_id, source, self.on_frame, source_config)
+        self.overlay_ms = REGISTRY.histogram("stage_ms", camera=cam_id, stage="overlay")
+        self.wake = threading.Event()
+        # Demand-driven: without subscribers the camera idles (slow capture,
+        # no detection) and later releases its source altogether.
+        self.lifecycle = CameraLifecycle(cam_id, hub, self.on_state, lifecycle_config)
+        self.lifecycle.start()
+
+    def on_frame(self, frame, captured_at):
+        rtsp_server.push_frame(self.cam_id, frame, raw=True, timestamp=captured_at)
+        # Detection runs on the analytics thread; the appsink callback
+        # only overwrites the mailbox slot and returns immediately.
+        if self.lifecycle.state == ACTIVE:
+            self.mailbox.put(frame, captured_at)
+
+    def on_state(self, state):
+        if state == ACTIVE:
+            self.pipeline.set_max_rate(0)
+        elif state == IDLE:
+            self.pipeline.set_max_rate(self.lifecycle.config["idle_fps"])
+            scheduler.forget(self.cam_id)
+        self.wake.set()
+
+    def capturing(self):
+        return self.running and self.lifecycle.state != STOPPED
 
     def run(self):
-        pipeline_str = (
-            f"v4l2src device=/dev/video{self.device_index} ! "
-            "video/x-raw,width=640,height=480,framerate=30/1 ! "
-            "videoconvert ! video/x-raw,format=BGR ! appsink name=sink emit-signals=true"
-        )
-        pipeline = Gst.parse_launch(pipeline_str)
-        appsink = pipeline.get_by_name("sink")
-        pipeline.set_state(Gst.State.PLAYING)
-        self.running = True
+        if self.isolated:
+            self.run_isolated()
+            return
 
-        def on_new_sample(sink):
-            sample = sink.emit("pull-sample")
-            buf = sample.get_buffer()
-            caps = sample.get_caps()
-            w = caps.get_structure(0).get_value("width")
-            h = caps.get_structure(0).get_value("height")
-            success, mapinfo = buf.map(Gst.MapFlags.READ)
-            if not success:
-                return Gst.FlowReturn.ERROR
-            frame = np.frombuffer(mapinfo.data, dtype=np.uint8).reshape((h, w, 3))
-            buf.unmap(mapinfo)
-            rtsp_server.push_frame(self.cam_id, frame, raw=True)
-            annotated, people = detector.detect(frame)
-            rtsp_server.push_frame(self.cam_id, annotated, raw=False)
-
-            if mqtt_client:
-                topic = f"events/{self.cam_id}/person"
-                msg = json.dumps({"count": people})
-                mqtt_client.publish(topic, msg)
-
-            return Gst.FlowReturn.OK
-
-        appsink.connect("new-sample", on_new_sample)
-
-        bus = pipeline.get_bus()
+        self.running = True
+        self.analytics.start()
         while self.running:
-            msg = bus.timed_pop_filtered(100 * Gst.MSECOND, Gst.MessageType.ERROR | Gst.MessageType.EOS)
-            if msg:
-                print(f"[GStreamer] Message: {msg.type}")
-                break
-
-        pipeline.set_state(Gst.State.NULL)
+            if not self.capturing():
+                self.wake.wait(0.5)
+                self.wake.clear()
+                continue
+            if not self.pipeline.run(self.capturing):
+                break  # source error / end of stream
+        self.finish()
+
+    def run_isolated(self):
+        # The source pipeline runs in a supervised worker process; frames
+        # arrive as pooled copies out of its shared-memory ring.
+        config = self.pipeline.config
+        self.running = True
+        self.analytics.start()
+        while self.running:
+            if not self.capturing():
+                if self.capture is not None:
+                    self.capture.close()
+                    self.capture = None
+                self.wake.wait(0.5)
+                self.wake.clear()
+                continue
+            if self.capture is None:
+                self.capture = ProcessCapture(self.cam_id, self.pipeline.launch_string(), kind="gst",
+                                              shape=(config["height"], config["width"], 3))
+                self.capture.start()
+            item = self.capture.poll(0.1)
+            if item is None:
+                continue
+            self.on_frame(*item)
+
+        if self.capture is not None:
+            self.capture.close()
+        self.finish()
+
+    def on_result(self, entry, detections, people):
+        event_store.append(self.cam_id, entry.timestamp, detections)
+        # Boxes are only drawn while an annotated consumer (/annotated RTSP
+        # client or /video viewer) is attached.
+        if hub.channel(self.cam_id, "annotated").has_consumers():
+            with self.overlay_ms.time():
+                annotated = model.overlay.render(entry.frame, detections)
+            rtsp_server.push_frame(self.cam_id, annotated, raw=False, timestamp=entry.timestamp)
+
+        if people:
+            rtsp_server.trigger_recording(self.cam_id, entry.timestamp)
+
+        # Change-detected and batched off this thread by the EventPublisher
+        if event_publisher:
+            event_publisher.report(self.cam_id, "person", {"count": people})
+            # Per-class counts, zone occupancy / dwell and line totals
+            for event_type, payload in self.analytics.scene.events().items():
+                event_publisher.report(self.cam_id, event_type, payload)
+
+    def finish(self):
+        self.lifecycle.close()
+        self.analytics.stop()
+        self.analytics.join(timeout=2)
+        scheduler.forget(self.cam_id)
+        if self.cam_id in rtsp_server.recorders:
+            rtsp_server.recorders[self.cam_id].flush()
+        # Ends the MJPEG streams of this camera (Flask and ASGI viewers)
+        hub.close(self.cam_id)
 
     def stop(self):
         self.running = False
+        self.wake.set()
+
+    def stats(self):
+        stats = self.analytics.stats()
+        stats["source"] = self.pipeline.stats()
+        stats["lifecycle"] = self.lifecycle.stats()
+        if self.capture is not None:
+            stats["process"] = self.capture.stats()
+        return stats
 
 # ========== Flask Web Server ==========
 app = Flask(__name__)
 
 @app.route("/video/<cam_id>")
 def video(cam_id):
-    def gen():
-        while True:
-            frame = latest_frames.get(cam_id)
-            if frame is not None:
-                import cv2
-                _, jpeg = cv2.imencode('.jpg', frame)
-                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-            time.sleep(0.05)
-    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(hub.channel(cam_id, "annotated").mjpeg_stream(), mimetype=MJPEG_MIMETYPE)
 
 @app.route("/video_raw/<cam_id>")
 def video_raw(cam_id):
-    def gen():
-        while True:
-            frame = raw_frames.get(cam_id)
-            if frame is not None:
-                import cv2
-                _, jpeg = cv2.imencode('.jpg', frame)
-                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-            time.sleep(0.05)
-    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(hub.channel(cam_id, "raw").mjpeg_stream(), mimetype=MJPEG_MIMETYPE)
+
+@app.route("/video/<cam_id>/<rung>")
+def video_rung(cam_id, rung):
+    # Ladder rung, e.g. /video/cam1/240p
+    return rung_stream(cam_id, f"annotated@{rung}")
+
+@app.route("/video_raw/<cam_id>/<rung>")
+def video_raw_rung(cam_id, rung):
+    return rung_stream(cam_id, f"raw@{rung}")
+
+def rung_stream(cam_id, variant):
+    if not hub.has_channel(cam_id, variant):
+        return jsonify({"error": f"no rung {variant} for {cam_id}"}), 404
+    return Response(hub.channel(cam_id, variant).mjpeg_stream(), mimetype=MJPEG_MIMETYPE)
 
 @app.route("/stream/start", methods=["POST"])
 def start_stream():
     data = request.json
     cam_id = data.get("id")
-    device = int(data.get("url", 0))
+    # Device index (0), device path, file path or rtsp:// / http(s):// / file:// URI
+    source = str(data.get("url", 0))
     if cam_id in streams:
         return jsonify({"status": "already running"})
-    rtsp_server.add_stream(cam_id)
-    worker = GStreamerCamera(cam_id, device)
-    worker.start()
+    if not media_ready.wait(10):
+        return jsonify({"status": "starting, retry shortly"}), 503
+    # Every config is validated before anything is mounted or registered
+    try:
+        check_cam_id(cam_id)
+        # Optional per-camera encoder settings, e.g.
+        # {"bitrate": 1024, "preset": "veryfast", "width": 1280, "height": 720}
+        encoder = encoder_config(data.get("encoder"))
+        # Optional ladder: preset names or {"name", "height", "fps", "bitrate"} rungs
+        ladder = ladder_config(data.get("ladder"))
+        for rung in ladder:
+            encoder_config(rung_encoder_config(rung, encoder))
+        # Optional event recording: {"dir": "events", "pre_roll_s": 5, "post_roll_s": 10, "container": "mkv"}
+        recording = recording_config(data.get("recording")) if data.get("recording") else None
+        # Optional lifecycle: {"mode": "on_demand", "idle_fps": 2, "idle_timeout_s": 300, "events": false}
+        lifecycle = lifecycle_config(data.get("lifecycle"))
+        # Optional per-camera analytics settings, e.g. {"adaptive": true, "target_fps": 15}
+        analytics = analytics_config(data.get("analytics"))
+        # Optional source settings, e.g. {"width": 640, "height": 360, "fps": 15, "loop": true}
+        source_settings = source_config(data.get("source"))
+    except ValueError as e:
+        return jsonify({"status": str(e)}), 400
+    isolated = CAMERA_PROCESSES or bool(data.get("process"))
+    try:
+        rtsp_server.add_stream(cam_id, encoder, ladder, recording)
+        worker = GStreamerCamera(cam_id, source, isolated, analytics, source_settings, lifecycle)
+        worker.start()
+    except Exception:
+        # Leave nothing behind for a camera that never reached `streams`
+        remove_camera(cam_id)
+        raise
     streams[cam_id] = worker
     return jsonify({"status": f"started {cam_id}"})
 
@@ -200,12 +367,77 @@ def stop_stream():
     worker = streams.pop(cam_id, None)
     if worker:
         worker.stop()
+        worker.join(timeout=5)
+        remove_camera(cam_id)
         return jsonify({"status": f"stopped {cam_id}"})
     return jsonify({"status": "not running"})
 
+def remove_camera(cam_id):
+    # Unmount RTSP paths, drop hub channels and the camera's metric series
+    rtsp_server.remove_stream(cam_id)
+    hub.remove(cam_id)
+    latest_frames.pop(cam_id, None)
+    raw_frames.pop(cam_id, None)
+    REGISTRY.unregister(camera=cam_id)
+
+@app.route("/events/<cam_id>")
+def events(cam_id):
+    # ?from=&to= (unix seconds, default: last hour) &class=<id> &limit=<rows>
+    t_to = request.args.get("to", default=time.time(), type=float)
+    t_from = request.args.get("from", default=t_to - 3600, type=float)
+    rows = event_store.query(
+        cam_id, t_from, t_to,
+        class_id=request.args.get("class", type=int),
+        limit=request.args.get("limit", default=1000, type=int),
+    )
+    return jsonify({"cam_id": cam_id, "from": t_from, "to": t_to, "count": int(len(rows["ts"])),
+                    "events": {name: col.tolist() for name, col in rows.items()}})
+
+@app.route("/events/<cam_id>/counts")
+def event_counts(cam_id):
+    # Per-bucket aggregates, default: person (class 0) per minute over the last hour
+    t_to = request.args.get("to", default=time.time(), type=float)
+    t_from = request.args.get("from", default=t_to - 3600, type=float)
+    buckets = event_store.counts(
+        cam_id, t_from, t_to,
+        class_id=request.args.get("class", default=0, type=int),
+        bucket_s=request.args.get("bucket", default=60, type=int),
+    )
+    return jsonify({"cam_id": cam_id, "from": t_from, "to": t_to, "buckets": buckets})
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus text exposition of every pipeline counter / stage histogram
+    return Response(REGISTRY.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: the HTTP server answers
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: GStreamer / RTSP started and the detector loaded and warm
+    ready = media_ready.is_set() and model is not None and model.ready.is_set()
+    model_stats = model.stats() if model is not None else None
+    return jsonify({"ready": ready, "media": media_ready.is_set(), "model": model_stats}), 200 if ready else 503
+
 @app.route("/status")
 def status():
-    return jsonify({"active_streams": list(streams.keys())})
+    return jsonify({
+        "active_streams": list(streams.keys()),
+        "streams": {
+            cam_id: {**worker.stats(), "mjpeg": hub.stats(cam_id), "encoders": rtsp_server.encoder_stats(cam_id),
+                     "ladder": rtsp_server.ladder_stats(cam_id),
+                     "recording": rtsp_server.recording_stats(cam_id)}
+            for cam_id, worker in list(streams.items())
+        },
+        "model": model.stats() if model is not None else None,
+        "inference": scheduler.stats() if scheduler is not None else None,
+        "event_store": event_store.stats() if event_store is not None else None,
+        "metrics": {cam_id: REGISTRY.snapshot(camera=cam_id) for cam_id in list(streams)},
+        "mqtt": event_publisher.stats() if event_publisher else None,
+    })
 
 @app.route("/dashboard")
 def dashboard():
@@ -287,11 +519,18 @@ def dashboard():
 
 # ========== MQTT Setup ==========
 def setup_mqtt():
-    global mqtt_client
-    mqtt_client = mqtt.Client()
-    mqtt_client.connect("localhost", 1883, 60)
-    mqtt_client.loop_start()
+    global mqtt_client, event_publisher
+    mqtt_client = MQTTClient("localhost", 1883)
+    mqtt_client.connect()
+    event_publisher = EventPublisher(mqtt_client, heartbeat_s=10.0, batch_interval_s=0.5)
 
 if __name__ == '__main__':
+    # Model loading and GStreamer / RTSP start-up run in the background
+    startup()
     setup_mqtt()
-    app.run(host='0.0.0.0', port=8000, threaded=True)
+    # HTTP_SERVER=asgi: MJPEG viewers on an asyncio event loop (uvicorn),
+    # all other endpoints served by the Flask app through the same server
+    if os.environ.get("HTTP_SERVER") == "asgi":
+        run_asgi(hub, app, host='0.0.0.0', port=8000)
+    else:
+        app.run(host='0.0.0.0', port=8000, threaded=True)
@@ -0,0 +1,297 @@
+import os
+import threading
+import time
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstRtspServer', '1.0')
+from gi.repository import Gst, GstRtspServer
+import numpy as np
+
+from metrics import REGISTRY
+
+DEFAULT_ENCODER_CONFIG = {
+    "width": 640,
+    "height": 480,
+    "fps": 30,
+    "bitrate": 512,          # kbit/s
+    "preset": "superfast",   # x264 speed-preset
+    "keyint": 60,            # max frames between IDR frames
+    "record_dir": None,      # optional splitmuxsink output
+    "record_segment_s": 60,
+    "hls_dir": None,         # optional hlssink2 output
+}
+
+
+def encoder_config(overrides=None):
+    """Defaults merged with overrides; raises ValueError for values of the wrong type or range."""
+    config = dict(DEFAULT_ENCODER_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key in config and value not in (None, ""):
+            try:
+                config[key] = type(DEFAULT_ENCODER_CONFIG[key] or value)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid encoder {key} {value!r}") from None
+    if config["width"] < 0 or config["height"] < 0:
+        raise ValueError("encoder width and height must be >= 0 (0 = source size)")
+    for key in ("fps", "bitrate", "keyint", "record_segment_s"):
+        if not config[key] > 0:
+            raise ValueError(f"encoder {key} must be > 0")
+    return config
+
+
+def wrap_frame(frame):
+    """
+    (shape, Gst.Buffer) of a published frame, built once and shared by all
+    consumers; keeping the shape with the buffer keeps caps and bytes of the
+    same frame together. The frame is copied once, straight into the mapped
+    buffer memory (new_wrapped(frame.tobytes()) copies twice: tobytes() and
+    PyGObject's marshalling). Bindings that map buffers read-only fall back
+    to fill().
+    """
+    buf = Gst.Buffer.new_allocate(None, frame.nbytes, None)
+    success, mapinfo = buf.map(Gst.MapFlags.WRITE)
+    if success:
+        try:
+            np.copyto(np.frombuffer(mapinfo.data, np.uint8).reshape(frame.shape), frame)
+            return frame.shape, buf
+        except (TypeError, ValueError):
+            pass
+        finally:
+            buf.unmap(mapinfo)
+    buf.fill(0, frame.tobytes())
+    return frame.shape, buf
+
+
+class H264Encoder:
+    """
+    The single H.264 encoder of one camera variant.
+
+    Raw frames of a FrameChannel are pushed in with capture-time PTS and the
+    encoded access units are fanned out through a tee to the attached
+    outputs (RTSP mounts) and to the optional recording / HLS branches.
+    The pipeline only runs while at least one output is attached, or always
+    when recording or HLS is configured.
+    """
+
+    def __init__(self, channel, config=None):
+        self.channel = channel
+        self.config = encoder_config(config)
+        self.name = f"{channel.cam_id}/{channel.variant}"
+        self.pipeline = None
+        self.appsrc = None
+        self.outputs = []
+        self.lock = threading.Lock()
+        self.frame_shape = None
+        self.base_timestamp = None
+        self.last_pts = -1
+        self.frames_in = 0
+        self.access_units_out = 0
+        self.flow_errors = 0
+        labels = {"camera": channel.cam_id, "variant": channel.variant}
+        REGISTRY.counter_func("encoder_frames_in_total", lambda: self.frames_in, "Frames pushed into the H.264 encoder", **labels)
+        REGISTRY.counter_func("encoder_access_units_total", lambda: self.access_units_out, "Encoded H.264 access units", **labels)
+        REGISTRY.counter_func("encoder_flow_errors_total", lambda: self.flow_errors, "appsrc push-buffer flow errors", **labels)
+        self.push_ms = REGISTRY.histogram("stage_ms", stage="encoder_push", **labels)
+        self.persistent = bool(self.config["record_dir"] or self.config["hls_dir"])
+        channel.subscribe(self.on_frame)
+        if self.persistent:
+            self.start()
+
+    def launch_string(self):
+        c = self.config
+        launch = 'appsrc name=src is-live=true block=false format=time do-timestamp=false ! videoconvert ! '
+        if c["width"] and c["height"]:
+            launch += f'videoscale ! video/x-raw,width={c["width"]},height={c["height"]} ! '
+        launch += (
+            f'x264enc tune=zerolatency bitrate={c["bitrate"]} speed-preset={c["preset"]} '
+            f'key-int-max={c["keyint"]} ! '
+            'h264parse config-interval=-1 ! video/x-h264,stream-format=byte-stream,alignment=au ! '
+            'tee name=t '
+            't. ! queue leaky=downstream max-size-buffers=30 ! '
+            'appsink name=out emit-signals=true sync=false max-buffers=30 drop=true '
+        )
+        prefix = f"{self.channel.cam_id}_{self.channel.variant}"
+        if c["record_dir"]:
+            os.makedirs(c["record_dir"], exist_ok=True)
+            location = os.path.join(c["record_dir"], f"{prefix}_%05d.mp4")
+            launch += (
+                't. ! queue ! h264parse ! '
+                f'splitmuxsink location="{location}" max-size-time={c["record_segment_s"] * Gst.SECOND} '
+            )
+        if c["hls_dir"]:
+            os.makedirs(c["hls_dir"], exist_ok=True)
+            launch += (
+                't. ! queue ! h264parse ! '
+                f'hlssink2 location="{os.path.join(c["hls_dir"], prefix + "_%05d.ts")}" '
+                f'playlist-location="{os.path.join(c["hls_dir"], prefix + ".m3u8")}" target-duration=2 '
+            )
+        return launch
+
+    def start(self):
+        with self.lock:
+            if self.pipeline is not None:
+                return
+            self.pipeline = Gst.parse_launch(self.launch_string())
+            self.appsrc = self.pipeline.get_by_name("src")
+            self.appsrc.set_property("max-bytes", 2 * (self.config["width"] or 1920) * (self.config["height"] or 1080) * 3)
+            if self.appsrc.find_property("leaky-type") is not None:
+                Gst.util_set_object_arg(self.appsrc, "leaky-type", "downstream")
+            self.pipeline.get_by_name("out").connect("new-sample", self.on_encoded)
+            self.frame_shape = None
+            self.base_timestamp = None
+            self.last_pts = -1
+            self.pipeline.set_state(Gst.State.PLAYING)
+        self.channel.hold()
+        size = f"{self.config['width']}x{self.config['height']}" if self.config["width"] else "source size"
+        print(f"[ENC] {self.name}: x264 {size} "
+              f"{self.config['bitrate']}kbps preset={self.config['preset']}")
+
+    def stop(self):
+        with self.lock:
+            pipeline, self.pipeline, self.appsrc = self.pipeline, None, None
+        if pipeline is not None:
+            pipeline.set_state(Gst.State.NULL)
+            self.channel.release()
+
+    def close(self):
+        self.channel.unsubscribe(self.on_frame)
+        with self.lock:
+            self.outputs = []
+        self.stop()
+
+    def attach(self, output):
+        """output(buffer) is called with every encoded access unit."""
+        with self.lock:
+            self.outputs.append(output)
+        self.start()
+        self.request_keyframe()
+
+    def detach(self, output):
+        with self.lock:
+            if output in self.outputs:
+                self.outputs.remove(output)
+            idle = not self.outputs and not self.persistent
+        if idle:
+            self.stop()
+
+    def request_keyframe(self):
+        with self.lock:
+            pipeline = self.pipeline
+        if pipeline is None:
+            return
+        event = Gst.Event.new_custom(
+            Gst.EventType.CUSTOM_UPSTREAM,
+            Gst.Structure.new_from_string("GstForceKeyUnit, all-headers=(boolean)true"),
+        )
+        pipeline.get_by_name("out").send_event(event)
+
+    def on_frame(self, channel, seq, timestamp):
+        with self.lock:
+            appsrc = self.appsrc
+            if appsrc is None:
+                return
+            if self.base_timestamp is None:
+                self.base_timestamp = timestamp
+            pts = int((timestamp - self.base_timestamp) * Gst.SECOND)
+            if pts <= self.last_pts:
+                return
+            self.last_pts = pts
+        started = time.perf_counter()
+        wrapped = channel.memo("gst", wrap_frame)
+        if wrapped is None:
+            return
+        shape, shared = wrapped
+        if shape != self.frame_shape:
+            self.frame_shape = shape
+            appsrc.set_property("caps", Gst.Caps.from_string(
+                f"video/x-raw,format=BGR,width={shape[1]},height={shape[0]},"
+                f"framerate={self.config['fps']}/1"
+            ))
+        # Shallow copy: shares the frame memory, only the metadata is private.
+        buf = shared.copy()
+        buf.pts = buf.dts = pts
+        buf.duration = Gst.util_uint64_scale_int(1, Gst.SECOND, self.config["fps"])
+        retval = appsrc.emit("push-buffer", buf)
+        if retval != Gst.FlowReturn.OK:
+            self.flow_errors += 1
+        self.frames_in += 1
+        self.push_ms.observe((time.perf_counter() - started) * 1000.0)
+
+    def on_encoded(self, sink):
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        buf = sample.get_buffer()
+        self.access_units_out += 1
+        with self.lock:
+            outputs = list(self.outputs)
+        for output in outputs:
+            output(buf)
+        return Gst.FlowReturn.OK
+
+    def stats(self):
+        return {
+            "running": self.pipeline is not None,
+            "outputs": len(self.outputs),
+            "frames_in": self.frames_in,
+            "access_units_out": self.access_units_out,
+            "flow_errors": self.flow_errors,
+            "config": self.config,
+        }
+
+
+class H264RTSPFactory(GstRtspServer.RTSPMediaFactory):
+    """RTSP mount that re-packetizes the shared encoder output; no encoding of its own."""
+
+    def __init__(self, encoder):
+        super().__init__()
+        self.encoder = encoder
+        self.launch_string = (
+            'appsrc name=source is-live=true block=false format=time do-timestamp=false '
+            'caps="video/x-h264,stream-format=byte-stream,alignment=au" ! '
+            'h264parse ! rtph264pay config-interval=1 name=pay0 pt=96'
+        )
+        self.set_launch(self.launch_string)
+        self.set_shared(True)
+        self.sources = {}  # appsrc -> base pts of the first keyframe pushed (None until then)
+        self.lock = threading.Lock()
+        self.flow_errors = 0
+        labels = {"camera": encoder.channel.cam_id, "variant": encoder.channel.variant}
+        REGISTRY.gauge("rtsp_clients", lambda: len(self.sources), "Active RTSP media of the mount", **labels)
+        REGISTRY.counter_func("rtsp_flow_errors_total", lambda: self.flow_errors, "RTSP appsrc push-buffer flow errors", **labels)
+
+    def do_configure(self, media):
+        appsrc = media.get_element().get_child_by_name("source")
+        with self.lock:
+            first = not self.sources
+            self.sources[appsrc] = None
+        media.connect("unprepared", lambda m: self.remove_source(appsrc))
+        if first:
+            self.encoder.attach(self.on_encoded)
+        else:
+            self.encoder.request_keyframe()
+
+    def remove_source(self, appsrc):
+        with self.lock:
+            self.sources.pop(appsrc, None)
+            last = not self.sources
+        if last:
+            self.encoder.detach(self.on_encoded)
+
+    def on_encoded(self, buf):
+        with self.lock:
+            sources = list(self.sources.items())
+        for appsrc, base in sources:
+            if base is None:
+                # Every new media starts on a keyframe.
+                if buf.has_flags(Gst.BufferFlags.DELTA_UNIT):
+                    continue
+                base = buf.pts
+                with self.lock:
+                    if appsrc in self.sources:
+                        self.sources[appsrc] = base
+            out = buf.copy()
+            out.pts = out.dts = buf.pts - base
+            if appsrc.emit("push-buffer", out) != Gst.FlowReturn.OK:
+                self.flow_errors += 1
@@ -0,0 +1,183 @@
+import cv2
+import numpy as np
+
+COCO_NAMES = [
+    'person', 'bicycle', 'car', 'motorcycle', 'airplane', 'bus', 'train', 'truck', 'boat',
+    'traffic light', 'fire hydrant', 'stop sign', 'parking meter', 'bench', 'bird', 'cat', 'dog',
+    'horse', 'sheep', 'cow', 'elephant', 'bear', 'zebra', 'giraffe', 'backpack', 'umbrella',
+    'handbag', 'tie', 'suitcase', 'frisbee', 'skis', 'snowboard', 'sports ball', 'kite',
+    'baseball bat', 'baseball glove', 'skateboard', 'surfboard', 'tennis racket', 'bottle',
+    'wine glass', 'cup', 'fork', 'knife', 'spoon', 'bowl', 'banana', 'apple', 'sandwich', 'orange',
+    'broccoli', 'carrot', 'hot dog', 'pizza', 'donut', 'cake', 'chair', 'couch', 'potted plant',
+    'bed', 'dining table', 'toilet', 'tv', 'laptop', 'mouse', 'remote', 'keyboard', 'cell phone',
+    'microwave', 'oven', 'toaster', 'sink', 'refrigerator', 'book', 'clock', 'vase', 'scissors',
+    'teddy bear', 'hair drier', 'toothbrush',
+]
+
+
+# ========== Pre / post processing ==========
+def letterbox(frames, size=640, fill=114):
+    """
+    Resize every frame into a size x size letterbox and stack them into one
+    NCHW float32 RGB batch in [0, 1]. Returns (batch, scales, pads) where
+    pads are (pad_x, pad_y) per frame, for mapping boxes back.
+    """
+    batch = np.full((len(frames), size, size, 3), fill, np.uint8)
+    scales = np.empty(len(frames), np.float32)
+    pads = np.empty((len(frames), 2), np.float32)
+    for i, frame in enumerate(frames):
+        h, w = frame.shape[:2]
+        scale = min(size / h, size / w)
+        nw, nh = int(round(w * scale)), int(round(h * scale))
+        px, py = (size - nw) // 2, (size - nh) // 2
+        batch[i, py:py + nh, px:px + nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        scales[i] = scale
+        pads[i] = (px, py)
+    # BGR -> RGB, NHWC -> NCHW and normalisation as one vectorised pass
+    tensor = np.ascontiguousarray(batch[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32)
+    tensor *= 1.0 / 255.0
+    return tensor, scales, pads
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy NMS; returns indices of kept boxes, highest score first."""
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(-scores)
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / np.maximum(areas[i] + areas[rest] - inter, 1e-6)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, np.int64)
+
+
+def non_max_suppression(pred, conf_thres=0.25, iou_thres=0.45, max_det=300):
+    """
+    YOLOv5 raw output for one image (N x (5 + classes): cx, cy, w, h, obj,
+    class scores) -> Nx6 float32 (x1, y1, x2, y2, score, class).
+    """
+    pred = pred[pred[:, 4] > conf_thres]
+    if not len(pred):
+        return np.zeros((0, 6), np.float32)
+    class_scores = pred[:, 5:] * pred[:, 4:5]
+    cls = class_scores.argmax(1)
+    conf = class_scores[np.arange(len(pred)), cls]
+    mask = conf > conf_thres
+    pred, cls, conf = pred[mask], cls[mask], conf[mask]
+    if not len(pred):
+        return np.zeros((0, 6), np.float32)
+    boxes = np.empty((len(pred), 4), np.float32)
+    boxes[:, :2] = pred[:, :2] - pred[:, 2:4] / 2
+    boxes[:, 2:] = pred[:, :2] + pred[:, 2:4] / 2
+    # Offset boxes per class so one NMS pass never suppresses across classes
+    offsets = cls[:, None].astype(np.float32) * 4096.0
+    keep = nms(boxes + offsets, conf, iou_thres)[:max_det]
+    return np.column_stack([boxes[keep], conf[keep], cls[keep]]).astype(np.float32)
+
+
+def scale_boxes(dets, scale, pad, shape):
+    """Map letterboxed boxes back onto the original frame (in place)."""
+    dets[:, [0, 2]] = (dets[:, [0, 2]] - pad[0]) / scale
+    dets[:, [1, 3]] = (dets[:, [1, 3]] - pad[1]) / scale
+    dets[:, [0, 2]] = dets[:, [0, 2]].clip(0, shape[1])
+    dets[:, [1, 3]] = dets[:, [1, 3]].clip(0, shape[0])
+    return dets
+
+
+# ========== Backends ==========
+class Backend:
+    """Runs an exported YOLOv5 model: NCHW float32 batch -> raw (B, N, 5 + classes)."""
+
+    names = COCO_NAMES
+
+    def infer(self, batch):
+        raise NotImplementedError
+
+
+class OnnxRuntimeBackend(Backend):
+    def __init__(self, weights, threads=0):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(weights, options, providers=["CPUExecutionProvider"])
+        self.input = self.session.get_inputs()[0]
+        self.static_batch = isinstance(self.input.shape[0], int)
+
+    def infer(self, batch):
+        if self.static_batch and len(batch) != self.input.shape[0]:
+            return np.concatenate([self.infer(batch[i:i + 1]) for i in range(len(batch))])
+        return self.session.run(None, {self.input.name: batch})[0]
+
+
+class OpenVINOBackend(Backend):
+    def __init__(self, weights, device="CPU"):
+        from openvino.runtime import Core
+        self.model = Core().compile_model(weights, device)
+        self.output = self.model.output(0)
+        self.static_batch = not self.model.input(0).get_partial_shape()[0].is_dynamic
+
+    def infer(self, batch):
+        if self.static_batch and len(batch) > 1:
+            return np.concatenate([self.infer(batch[i:i + 1]) for i in range(len(batch))])
+        return self.model([batch])[self.output]
+
+
+class TorchScriptBackend(Backend):
+    def __init__(self, weights, device="cpu"):
+        import torch
+        self.torch = torch
+        self.device = device
+        self.model = torch.jit.load(weights, map_location=device).eval()
+
+    def infer(self, batch):
+        with self.torch.inference_mode():
+            out = self.model(self.torch.from_numpy(batch).to(self.device))
+        if isinstance(out, (list, tuple)):
+            out = out[0]
+        return out.cpu().numpy()
+
+
+class StubBackend(Backend):
+    """
+    Weight-free backend for tests and benchmarks: returns a fixed raw
+    prediction (by default one confident person in the middle of the
+    letterbox) so the whole pre/post-processing path still runs.
+    """
+
+    def __init__(self, boxes=((320, 320, 120, 240, 0),), num_classes=80, latency_ms=0.0):
+        self.raw = np.zeros((len(boxes), 5 + num_classes), np.float32)
+        for i, (cx, cy, w, h, cls) in enumerate(boxes):
+            self.raw[i, :5] = (cx, cy, w, h, 0.9)
+            self.raw[i, 5 + cls] = 0.9
+        self.latency_ms = latency_ms
+
+    def infer(self, batch):
+        if self.latency_ms:
+            import time
+            time.sleep(self.latency_ms / 1000.0)
+        return np.repeat(self.raw[None], len(batch), axis=0)
+
+
+BACKENDS = {
+    "onnx": OnnxRuntimeBackend,
+    "openvino": OpenVINOBackend,
+    "torchscript": TorchScriptBackend,
+    "stub": StubBackend,
+}
+
+
+def create_backend(name, weights=None, **kwargs):
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown detector backend '{name}' (choose from {', '.join(BACKENDS)})")
+    if name == "stub":
+        return StubBackend(**kwargs)
+    if not weights:
+        raise ValueError(f"Detector backend '{name}' needs a weights file")
+    return BACKENDS[name](weights, **kwargs)
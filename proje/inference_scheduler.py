@@ -0,0 +1,317 @@
+import threading
+import time
+from concurrent.futures import Future
+
+from metrics import REGISTRY, Counter, Histogram
+
+BATCH_SIZE_BUCKETS = [1, 2, 4, 8, 16, 32]
+QUEUE_WAIT_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 250, 500, 1000]
+
+
+def _forward(futures, source):
+    """Completes every waiter of a batch entry with the result of `source`."""
+    error = None if source.cancelled() else source.exception()
+    for future in futures:
+        if future.cancelled():
+            continue
+        if source.cancelled():
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(source.result())
+
+
+class CameraShare:
+    """
+    A camera's claim on the detector: target detector passes per second,
+    priority and cost (crops per pass), plus the rate granted by the last
+    allocation and the measured request / pass rates.
+    """
+
+    def __init__(self, fps, priority, cost):
+        self.fps = fps
+        self.priority = priority
+        self.cost = cost
+        self.allocated = fps
+        self.created_at = time.monotonic()
+        self.admitted_at = None
+        self.requests = Counter()
+        self.passes = Counter()
+        self.deferred = 0
+
+    def demand(self, now):
+        """Passes per second the camera currently asks for (target until a rate is measured)."""
+        if now - self.created_at < 2.0:
+            return self.fps
+        return min(self.fps, self.requests.rate() * 1.1)
+
+    def stats(self):
+        return {
+            "target_fps": self.fps,
+            "priority": self.priority,
+            "cost": self.cost,
+            "requested_fps": round(self.requests.rate(), 2),
+            "allocated_fps": round(self.allocated, 2),
+            "effective_fps": round(self.passes.rate(), 2),
+            "deferred": self.deferred,
+        }
+
+
+class InferenceScheduler(threading.Thread):
+    """
+    Collects the latest frame of every active camera and runs them through
+    the detector as a single batch.
+
+    A batch is dispatched as soon as every active camera (one that submitted
+    within active_window_s) has a frame waiting, the batch is full
+    (max_batch_size) or the oldest frame has waited max_wait_ms. If a camera submits again before its previous frame was
+    taken, the newer frame replaces the older one and all waiters receive
+    the newer result.
+
+    Cameras share the detector through admit(): each has a target fps and a
+    priority. The detector's capacity is measured from the batch times; while
+    the cameras' demand fits, every camera runs at its target. Under
+    overload, higher priority levels are served first and the cameras of one
+    level get the same fraction of their demand, so low-priority cameras
+    degrade first (down to min_fps) instead of all cameras stalling. When
+    more frames are pending than fit a batch, higher priorities go first.
+
+    The blocking helpers give up after result_timeout_s (TimeoutError), so a
+    detector that is still loading or a stalled worker cannot hang callers.
+    """
+
+    def __init__(self, detector, max_batch_size=8, max_wait_ms=10, max_utilization=0.9, min_fps=0.2,
+                 result_timeout_s=30.0, active_window_s=1.0):
+        super().__init__(daemon=True)
+        self.detector = detector
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.max_utilization = max_utilization
+        self.min_fps = min_fps
+        self.result_timeout_s = result_timeout_s
+        self.active_window_s = active_window_s
+        self.shares = {}  # cam_id -> CameraShare
+        self.frame_ms = None  # EWMA detector time per frame
+        self.allocated_at = 0.0
+        self.cond = threading.Condition()
+        self.pending = {}  # cam_id -> [frame, enqueued_at, [futures]]
+        self.last_submit = {}  # key -> monotonic time of its latest submit
+        self.running = False
+        self.batches = 0
+        self.frames = 0
+        self.batch_sizes = Histogram(BATCH_SIZE_BUCKETS)
+        self.queue_wait_ms = Histogram(QUEUE_WAIT_BUCKETS_MS)
+        self.batch_ms = Histogram()
+        REGISTRY.register("inference_batch_size", self.batch_sizes, "Frames per detector batch")
+        REGISTRY.register("inference_queue_wait_ms", self.queue_wait_ms, "Time a frame waited for its batch")
+        REGISTRY.register("inference_batch_ms", self.batch_ms, "Detector time per batch")
+
+    def submit(self, cam_id, frame):
+        future = Future()
+        with self.cond:
+            self.last_submit[cam_id] = time.monotonic()
+            entry = self.pending.get(cam_id)
+            if entry is None:
+                self.pending[cam_id] = [frame, time.monotonic(), [future]]
+            else:
+                entry[0] = frame
+                entry[2].append(future)
+            self.cond.notify()
+        return future
+
+    def predict(self, cam_id, frame):
+        """Blocking helper: Nx6 detections (x1, y1, x2, y2, score, class) for frame."""
+        return self.submit(cam_id, frame).result(self.result_timeout_s)
+
+    def predict_many(self, cam_id, frames):
+        """
+        Blocking helper for several crops of one camera frame (ROI / tiles).
+        Each crop is queued under its own (cam_id, index) key so all of them
+        are batched into the same forward pass when possible.
+        """
+        if len(frames) == 1:
+            return [self.predict(cam_id, frames[0])]
+        futures = [self.submit((cam_id, i), frame) for i, frame in enumerate(frames)]
+        deadline = time.monotonic() + self.result_timeout_s
+        return [future.result(max(0.0, deadline - time.monotonic())) for future in futures]
+
+    def admit(self, cam_id, fps, priority=1, cost=1):
+        """
+        Fair-share gate in front of a detector pass. False when the camera is
+        ahead of its allocated rate; the caller should track that frame
+        instead of detecting it. fps <= 0 disables the gate for the camera.
+        """
+        if fps <= 0:
+            return True
+        now = time.monotonic()
+        with self.cond:
+            share = self.shares.get(cam_id)
+            if share is None:
+                share = self.shares[cam_id] = CameraShare(fps, priority, cost)
+                self._allocate(now)
+            elif (share.fps, share.priority, share.cost) != (fps, priority, cost):
+                share.fps, share.priority, share.cost = fps, priority, cost
+                self._allocate(now)
+            elif now - self.allocated_at >= 1.0:
+                self._allocate(now)
+            share.requests.inc()
+            if share.admitted_at is not None and now - share.admitted_at < 0.95 / share.allocated:
+                share.deferred += 1
+                return False
+            share.admitted_at = now
+        share.passes.inc()
+        return True
+
+    def capacity_fps(self):
+        """Detector frames per second at max_utilization, None until measured."""
+        if not self.frame_ms:
+            return None
+        return self.max_utilization * 1000.0 / self.frame_ms
+
+    def _allocate(self, now):
+        # Called with self.cond held. Rates are in detector frames (crops)
+        # per second; shares get them back in passes per second.
+        self.allocated_at = now
+        shares = self.shares.values()
+        capacity = self.capacity_fps()
+        demand = {share: share.demand(now) * share.cost for share in shares}
+        if capacity is None or sum(demand.values()) <= capacity:
+            for share in shares:
+                share.allocated = share.fps
+            return
+        granted = {share: min(self.min_fps * share.cost, demand[share]) for share in shares}
+        remaining = capacity - sum(granted.values())
+        for priority in sorted({share.priority for share in shares}, reverse=True):
+            level = [share for share in shares if share.priority == priority]
+            wanted = sum(demand[share] - granted[share] for share in level)
+            if wanted <= 0:
+                continue
+            fraction = min(1.0, max(remaining, 0.0) / wanted)
+            for share in level:
+                granted[share] += (demand[share] - granted[share]) * fraction
+            remaining -= wanted * fraction
+        for share in shares:
+            share.allocated = max(granted[share] / share.cost, self.min_fps)
+
+    def allocated_fps(self, cam_id):
+        share = self.shares.get(cam_id)
+        return share.allocated if share else 0.0
+
+    def share_stats(self, cam_id):
+        share = self.shares.get(cam_id)
+        return share.stats() if share else None
+
+    def _priority(self, key):
+        share = self.shares.get(key[0] if isinstance(key, tuple) else key)
+        return share.priority if share else 1
+
+    def forget(self, cam_id):
+        with self.cond:
+            self.shares.pop(cam_id, None)
+            keys = [key for key in set(self.last_submit) | set(self.pending)
+                    if key == cam_id or (isinstance(key, tuple) and key[0] == cam_id)]
+            entries = [self.pending.pop(key, None) for key in keys]
+            for key in keys:
+                self.last_submit.pop(key, None)
+        for entry in entries:
+            for future in entry[2] if entry else ():
+                future.cancel()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+
+    def start(self):
+        self.running = True
+        super().start()
+
+    def _ready(self):
+        # Keys that stopped submitting (gated, deferred, no longer tiling)
+        # must not hold back every batch until max_wait.
+        horizon = time.monotonic() - self.active_window_s
+        for key in [key for key, at in self.last_submit.items() if at < horizon and key not in self.pending]:
+            del self.last_submit[key]
+        target = min(self.max_batch_size, max(len(self.last_submit), 1))
+        return len(self.pending) >= target
+
+    def _take_batch(self):
+        with self.cond:
+            while self.running and not self.pending:
+                self.cond.wait(0.5)
+            if not self.running:
+                return []
+            oldest = min(entry[1] for entry in self.pending.values())
+            deadline = oldest + self.max_wait
+            while self.running and not self._ready():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.cond.wait(remaining)
+            ordered = sorted(self.pending.items(), key=lambda kv: (-self._priority(kv[0]), kv[1][1]))
+            batch = ordered[:self.max_batch_size]
+            for cam_id, _ in batch:
+                del self.pending[cam_id]
+        return batch
+
+    def run(self):
+        # A background ModelLoader stands in for the detector until it is
+        # ready; frames submitted meanwhile wait (latest per camera) in pending.
+        wait = getattr(self.detector, "wait", None)
+        while self.running and wait is not None and not wait(0.5):
+            continue
+        # Asynchronous detectors (DetectorPool) return one future per frame
+        # and complete them from their own threads.
+        submit_batch = getattr(self.detector, "submit_batch", None)
+        while self.running:
+            batch = self._take_batch()
+            if not batch:
+                continue
+            now = time.monotonic()
+            for _, (_, enqueued_at, _) in batch:
+                self.queue_wait_ms.observe((now - enqueued_at) * 1000.0)
+            self.batch_sizes.observe(len(batch))
+
+            frames = [entry[0] for _, entry in batch]
+            if submit_batch is not None:
+                for (_, (_, _, futures)), source in zip(batch, submit_batch(frames)):
+                    source.add_done_callback(lambda source, futures=futures: _forward(futures, source))
+                self.batches += 1
+                self.frames += len(frames)
+                self.frame_ms = self.detector.frame_ms
+                continue
+            try:
+                with self.batch_ms.time():
+                    results = self.detector.predict_batch(frames)
+            except Exception as e:
+                print(f"[INFER] Batch of {len(frames)} failed: {e}")
+                for _, (_, _, futures) in batch:
+                    for future in futures:
+                        if not future.cancelled():
+                            future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.frames += len(frames)
+            frame_ms = (time.monotonic() - now) * 1000.0 / len(frames)
+            self.frame_ms = frame_ms if self.frame_ms is None else 0.9 * self.frame_ms + 0.1 * frame_ms
+            for (_, (_, _, futures)), result in zip(batch, results):
+                for future in futures:
+                    if not future.cancelled():
+                        future.set_result(result)
+
+    def stats(self):
+        capacity = self.capacity_fps()
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "batches": self.batches,
+            "frames": self.frames,
+            "batch_size": self.batch_sizes.snapshot(),
+            "queue_wait_ms": self.queue_wait_ms.snapshot(),
+            "batch_ms": self.batch_ms.snapshot(),
+            "capacity_fps": round(capacity, 1) if capacity else None,
+            "active_keys": len(self.last_submit),
+            "cameras": {cam_id: share.stats() for cam_id, share in list(self.shares.items())},
+        }
@@ -0,0 +1,109 @@
+import threading
+
+import cv2
+
+LADDER_PRESETS = {
+    "1080p": {"height": 1080, "fps": 30, "bitrate": 4000},
+    "720p": {"height": 720, "fps": 30, "bitrate": 2000},
+    "480p": {"height": 480, "fps": 30, "bitrate": 1000},
+    "360p": {"height": 360, "fps": 25, "bitrate": 600},
+    "240p": {"height": 240, "fps": 15, "bitrate": 300},
+}
+DEFAULT_LADDER = ["480p", "240p"]
+
+
+def ladder_config(spec=None):
+    """
+    Rungs as [{"name", "height", "fps", "bitrate"}] from preset names (list or
+    comma-separated string) and/or explicit dicts; None gives DEFAULT_LADDER.
+    """
+    if spec is None:
+        spec = DEFAULT_LADDER
+    if isinstance(spec, str):
+        spec = [name.strip() for name in spec.split(",") if name.strip()]
+    rungs = []
+    for item in spec:
+        if isinstance(item, str):
+            if item not in LADDER_PRESETS:
+                raise ValueError(f"unknown ladder rung {item!r}")
+            item = {"name": item, **LADDER_PRESETS[item]}
+        rung = {"fps": 0, "bitrate": 1000, **item}
+        rung.setdefault("name", f"{rung['height']}p")
+        rungs.append(rung)
+    return rungs
+
+
+def rung_size(shape, height):
+    """
+    (width, height) for a rung: same aspect as the frame, never upscaled. The
+    width is a multiple of 4 so BGR rows need no padding (GStreamer's stride).
+    """
+    frame_h, frame_w = shape[:2]
+    if height >= frame_h:
+        return frame_w, frame_h
+    width = max(4, int(round(frame_w * height / frame_h / 4)) * 4)
+    return width, height
+
+
+def rung_encoder_config(rung, base_config=None):
+    """Encoder settings for a rung: input already has the rung size, no recording."""
+    config = dict(base_config or {})
+    config.update(width=0, height=0, fps=rung["fps"] or config.get("fps") or 30,
+                  bitrate=rung["bitrate"], record_dir=None, hls_dir=None)
+    return config
+
+
+class Rendition:
+    """
+    One rung of a camera's output ladder. While its own channel has
+    consumers (MJPEG viewers or a running RTSP encoder) it holds the base
+    channel and publishes every base frame, scaled once and rate-limited to
+    the rung's fps; otherwise it is detached and costs nothing.
+    """
+
+    def __init__(self, hub, base, rung):
+        self.base = base
+        self.rung = rung
+        self.name = rung["name"]
+        self.channel = hub.channel(base.cam_id, f"{base.variant}@{self.name}")
+        self.min_interval = 1.0 / rung["fps"] * 0.9 if rung["fps"] else 0.0
+        self.last_timestamp = 0.0
+        self.size = None
+        self.active = False
+        self.frames = 0
+        self.lock = threading.Lock()
+        self.channel.on_demand(self.set_active)
+
+    def set_active(self, active):
+        with self.lock:
+            if active == self.active:
+                return
+            self.active = active
+            if active:
+                self.base.hold()
+                self.base.subscribe(self.on_frame)
+            else:
+                self.base.unsubscribe(self.on_frame)
+                self.base.release()
+        print(f"[LADDER] {self.channel.cam_id}/{self.channel.variant} {'active' if active else 'idle'}")
+
+    def on_frame(self, base, seq, timestamp):
+        if timestamp - self.last_timestamp < self.min_interval:
+            return
+        _, frame, _ = base.latest()
+        if frame is None:
+            return
+        self.last_timestamp = timestamp
+        size = rung_size(frame.shape, self.rung["height"])
+        self.size = size
+        if size != (frame.shape[1], frame.shape[0]):
+            frame = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        self.frames += 1
+        self.channel.publish(frame, timestamp)
+
+    def encoder_config(self, base_config=None):
+        return rung_encoder_config(self.rung, base_config)
+
+    def stats(self):
+        return {"active": self.active, "frames": self.frames,
+                "size": list(self.size) if self.size else None, **self.channel.stats()}
@@ -0,0 +1,129 @@
+import os
+import threading
+import time
+
+from metrics import REGISTRY
+
+ACTIVE, IDLE, STOPPED = "active", "idle", "stopped"
+STATE_VALUES = {STOPPED: 0, IDLE: 1, ACTIVE: 2}
+
+DEFAULT_LIFECYCLE_CONFIG = {
+    # always: capture + detection run from start_stream until stop (previous behaviour)
+    # on_demand: full pipeline only while something subscribes to the camera
+    "mode": os.environ.get("CAMERA_LIFECYCLE", "always"),
+    "idle_fps": 2.0,           # capture rate while nobody subscribes (detection paused)
+    "idle_timeout_s": 300.0,   # then release the source entirely; 0 = never
+    "events": False,           # events consumed elsewhere (MQTT / event store): always subscribed
+}
+
+
+def lifecycle_config(overrides=None):
+    """Defaults merged with overrides; raises ValueError for values of the wrong type or range."""
+    config = dict(DEFAULT_LIFECYCLE_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key not in config or value in (None, ""):
+            continue
+        default = DEFAULT_LIFECYCLE_CONFIG[key]
+        if isinstance(default, bool):
+            config[key] = value in (True, 1, "1", "true", "on")
+        else:
+            try:
+                config[key] = type(default)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid lifecycle {key} {value!r}") from None
+    if config["mode"] not in ("always", "on_demand"):
+        raise ValueError("lifecycle mode must be 'always' or 'on_demand'")
+    # 0 would mean "no rate limit" to the capture, i.e. full rate while idle
+    if not config["idle_fps"] > 0:
+        raise ValueError("lifecycle idle_fps must be > 0")
+    if config["idle_timeout_s"] < 0:
+        raise ValueError("lifecycle idle_timeout_s must be >= 0 (0 = never)")
+    return config
+
+
+class CameraLifecycle:
+    """
+    Demand-driven state of one camera. Subscribers are every consumer of the
+    camera's FrameHub channels (MJPEG viewers, RTSP clients through their
+    encoders, ladder rungs, event recorders); with config "events" the
+    camera's events are consumed elsewhere (MQTT, detection history) and it
+    always counts as subscribed.
+
+    active  - someone subscribes: full capture rate, detection running
+    idle    - no subscribers: capture at idle_fps, detection paused
+    stopped - idle for idle_timeout_s: source released until the next subscriber
+
+    on_state(state) is called on every transition; the first subscriber of an
+    idle or stopped camera brings it straight back to active. start() applies
+    the initial state, so the owner can store the lifecycle before its
+    on_state callback first runs.
+    """
+
+    def __init__(self, cam_id, hub, on_state, config=None):
+        self.cam_id = cam_id
+        self.hub = hub
+        self.on_state = on_state
+        self.config = lifecycle_config(config)
+        self.lock = threading.Lock()
+        self.timer = None
+        self.transitions = 0
+        self.changed_at = time.time()
+        self.state = ACTIVE
+        REGISTRY.gauge("camera_state", lambda: STATE_VALUES[self.state],
+                       "0 stopped, 1 idle (low-cost), 2 active", camera=cam_id)
+
+    def start(self):
+        if self.config["mode"] == "on_demand":
+            self.hub.watch(self.cam_id, self._channel_demand)
+            if not self.wanted():
+                self._set(IDLE)
+
+    def wanted(self):
+        return self.config["events"] or self.hub.has_demand(self.cam_id)
+
+    def _channel_demand(self, channel, active):
+        self._update()
+
+    def _update(self):
+        if self.config["mode"] != "on_demand":
+            return
+        if self.wanted():
+            self._set(ACTIVE)
+        elif self.state == ACTIVE:
+            self._set(IDLE)
+
+    def _set(self, state):
+        with self.lock:
+            if state == self.state:
+                return
+            self.state = state
+            self.transitions += 1
+            self.changed_at = time.time()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            if state == IDLE and self.config["idle_timeout_s"] > 0:
+                self.timer = threading.Timer(self.config["idle_timeout_s"], self._idle_timeout)
+                self.timer.daemon = True
+                self.timer.start()
+        print(f"[LIFECYCLE] {self.cam_id}: {state}")
+        self.on_state(state)
+
+    def _idle_timeout(self):
+        if self.state == IDLE and not self.wanted():
+            self._set(STOPPED)
+
+    def close(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+    def stats(self):
+        return {
+            "mode": self.config["mode"],
+            "state": self.state,
+            "since_s": round(time.time() - self.changed_at, 1),
+            "transitions": self.transitions,
+            "events": self.config["events"],
+        }
@@ -0,0 +1,89 @@
+# Simulates N concurrent MJPEG viewers against a running server.
+#
+#   python3 load_test_mjpeg.py --url http://localhost:8000/video/cam1 --viewers 500 --duration 30
+#
+# A fraction of the viewers (--slow) read slowly to check that the server
+# skips frames for them instead of buffering. Prints per-viewer fps stats.
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlparse
+
+BOUNDARY = b"--frame"
+
+
+async def viewer(host, port, path, duration, slow_delay, result):
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        result["error"] = str(e)
+        return
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n\r\n".encode())
+    await writer.drain()
+    deadline = time.monotonic() + duration
+    tail = b""
+    try:
+        while time.monotonic() < deadline:
+            try:
+                chunk = await asyncio.wait_for(reader.read(65536), timeout=max(deadline - time.monotonic(), 0.01))
+            except asyncio.TimeoutError:
+                break
+            if not chunk:
+                result["ended"] = True
+                break
+            data = tail + chunk
+            result["frames"] += data.count(BOUNDARY)
+            result["bytes"] += len(chunk)
+            tail = data[-len(BOUNDARY):]
+            if slow_delay:
+                await asyncio.sleep(slow_delay)
+    finally:
+        writer.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="MJPEG viewer load test")
+    parser.add_argument("--url", default="http://localhost:8000/video/cam1")
+    parser.add_argument("--viewers", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--slow", type=float, default=0.1, help="fraction of slow viewers")
+    parser.add_argument("--slow-delay", type=float, default=0.5, help="seconds slow viewers sleep per read")
+    args = parser.parse_args()
+
+    url = urlparse(args.url)
+    n_slow = int(args.viewers * args.slow)
+    results = [{"frames": 0, "bytes": 0, "slow": i < n_slow, "ended": False} for i in range(args.viewers)]
+    started = time.monotonic()
+    await asyncio.gather(*[
+        viewer(url.hostname, url.port or 80, url.path, args.duration,
+               args.slow_delay if r["slow"] else 0.0, r)
+        for r in results
+    ])
+    elapsed = time.monotonic() - started
+
+    def summary(group):
+        fps = sorted(r["frames"] / elapsed for r in group)
+        if not fps:
+            return None
+        return {
+            "viewers": len(group),
+            "fps_min": round(fps[0], 2),
+            "fps_p50": round(fps[len(fps) // 2], 2),
+            "fps_max": round(fps[-1], 2),
+            "mbytes": round(sum(r["bytes"] for r in group) / 1e6, 1),
+            "errors": sum(1 for r in group if "error" in r),
+            "ended_by_server": sum(1 for r in group if r["ended"]),
+        }
+
+    print(json.dumps({
+        "url": args.url,
+        "duration_s": round(elapsed, 1),
+        "fast": summary([r for r in results if not r["slow"]]),
+        "slow": summary([r for r in results if r["slow"]]),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
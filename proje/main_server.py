@@ -1,14 +1,27 @@
 # === Intelligent Multi-Source Video Analytics & Streaming Platform ===
 # main_server.py
 
-import cv2
+import os
 import threading
 import time
-import torch
-import numpy as np
 import warnings
 from flask import Flask, Response, request, jsonify
 from yolo_detector import YOLODetector
+from model_loader import ModelLoader, resolve_weights, DEFAULT_CACHE_DIR
+from detector_cluster import DetectorPool
+from inference_scheduler import InferenceScheduler
+from frame_mailbox import LatestFrameMailbox
+from camera_pipeline import AnalyticsWorker, DEFAULT_ANALYTICS_CONFIG, analytics_config
+from frame_hub import FrameHub, MJPEG_MIMETYPE
+from h264_encoder import H264Encoder, H264RTSPFactory, DEFAULT_ENCODER_CONFIG, encoder_config
+from ladder import Rendition, ladder_config, rung_encoder_config
+from event_recorder import EventRecorder, recording_config, DEFAULT_RECORDING_CONFIG
+from process_workers import ProcessCapture
+from source_pipeline import SourcePipeline, DEFAULT_SOURCE_CONFIG, source_config
+from lifecycle import CameraLifecycle, DEFAULT_LIFECYCLE_CONFIG, lifecycle_config, ACTIVE, IDLE, STOPPED
+from event_store import EventStore, check_cam_id
+from asgi_server import run_asgi
+from metrics import REGISTRY
 
 # RTSP için gerekli
 import gi
@@ -16,52 +29,32 @@ gi.require_version('Gst', '1.0')
 gi.require_version('GstRtspServer', '1.0')
 from gi.repository import Gst, GstRtspServer, GLib
 
-Gst.init(None)
 warnings.filterwarnings("ignore", category=FutureWarning)
 
 # ========== GLOBALS ==========
-detector = YOLODetector()
+# Detector, scheduler and event store are created by startup(), so importing
+# the server neither loads a model, spawns detector workers nor touches disk.
+model = None
+scheduler = None
+event_store = None
 streams = {}
 latest_frames = {}
+hub = FrameHub()
+# Run every camera's capture in its own process (shared-memory frame ring)
+CAMERA_PROCESSES = os.environ.get("CAMERA_PROCESSES") == "1"
+REGISTRY.gauge("active_streams", lambda: len(streams), "Running cameras")
 
 # ========== RTSP SERVER ==========
-class RTSPMediaFactory(GstRtspServer.RTSPMediaFactory):
-    def __init__(self, cam_id):
-        super().__init__()
-        self.cam_id = cam_id
-        self.launch_string = (
-            'appsrc name=source is-live=true block=true format=time do-timestamp=true caps="video/x-raw,format=BGR,width=640,height=480,framerate=30/1" ! '
-            'videoconvert ! x264enc tune=zerolatency bitrate=512 speed-preset=superfast ! rtph264pay config-interval=1 name=pay0 pt=96'
-        )
-        self.set_launch(self.launch_string)
-        self.set_shared(True)
-        self.frame = None
-        self.source = None
-
-    def do_configure(self, rtsp_media):
-        self.source = rtsp_media.get_element().get_child_by_name("source")
-        self.source.connect("need-data", self.on_need_data)
-
-    def on_need_data(self, src, length):
-        if self.frame is None:
-            return
-        frame = cv2.resize(self.frame, (640, 480))
-        data = frame.tobytes()
-        buf = Gst.Buffer.new_allocate(None, len(data), None)
-        buf.fill(0, data)
-        timestamp = Gst.util_uint64_scale(Gst.util_get_timestamp(), 1, Gst.SECOND)
-        buf.pts = buf.dts = timestamp
-        buf.duration = Gst.util_uint64_scale_int(1, Gst.SECOND, 30)
-        retval = src.emit("push-buffer", buf)
-        if retval != Gst.FlowReturn.OK:
-            print(f"[RTSP] Flow error: {retval}")
-
 class RTSPServer:
     def __init__(self, port=8554):
         self.server = GstRtspServer.RTSPServer()
         self.server.set_service(str(port))
         self.mounts = self.server.get_mount_points()
         self.factories = {}
+        self.encoders = {}
+        self.renditions = {}
+        self.recorders = {}
+        self.paths = {}  # cam_id -> [(key, mount path)]
         self.loop = GLib.MainLoop()
         self.thread = threading.Thread(target=self.loop.run)
 
@@ -70,62 +63,223 @@ class RTSPServer:
         self.thread.start()
         print("[RTSP] Server started at rtsp://localhost:8554/")
 
-    def add_stream(self, cam_id):
-        factory = RTSPMediaFactory(cam_id)
-        self.factories[cam_id] = factory
-        path = f"/annotated/{cam_id}"
+    def add_stream(self, cam_id, encoder_config=None, ladder=None, recording=None):
+        if cam_id in self.factories:
+            return
+        # One shared encoder per camera; the mount only re-packetizes its output.
+        base = hub.channel(cam_id, "annotated")
+        encoder = H264Encoder(base, encoder_config)
+        self.mount(cam_id, cam_id, f"/annotated/{cam_id}", encoder)
+        # Lower rungs: scaled from the annotated frame only while watched
+        renditions = self.renditions[cam_id] = [Rendition(hub, base, rung) for rung in ladder_config(ladder)]
+        for rendition in renditions:
+            rung_encoder = H264Encoder(rendition.channel, rendition.encoder_config(encoder_config))
+            self.mount(cam_id, f"{cam_id}@{rendition.name}", f"/annotated/{cam_id}/{rendition.name}", rung_encoder)
+        # Event clips with pre-roll, cut from the encoder's output
+        if recording and recording.get("dir"):
+            self.recorders[cam_id] = EventRecorder(encoder, recording)
+
+    def mount(self, cam_id, key, path, encoder):
+        factory = H264RTSPFactory(encoder)
+        self.encoders[key] = encoder
+        self.factories[key] = factory
+        self.paths.setdefault(cam_id, []).append((key, path))
         self.mounts.add_factory(path, factory)
         print(f"[RTSP] Stream available at rtsp://localhost:8554{path}")
 
-    def push_frame(self, cam_id, frame):
-        if cam_id in self.factories:
-            self.factories[cam_id].frame = frame
+    def remove_stream(self, cam_id):
+        """Unmount every path of the camera and stop its encoders and recorder."""
+        recorder = self.recorders.pop(cam_id, None)
+        if recorder is not None:
+            recorder.close()
+        for key, path in self.paths.pop(cam_id, []):
+            self.mounts.remove_factory(path)
+            self.factories.pop(key, None)
+            self.encoders.pop(key).close()
+            print(f"[RTSP] Removed rtsp://localhost:8554{path}")
+        self.renditions.pop(cam_id, None)
 
-rtsp_server = RTSPServer()
-rtsp_server.start()
+    def trigger_recording(self, cam_id, timestamp):
+        recorder = self.recorders.get(cam_id)
+        if recorder is not None:
+            recorder.trigger(timestamp)
+
+    def recording_stats(self, cam_id):
+        recorder = self.recorders.get(cam_id)
+        return recorder.stats() if recorder else None
+
+    def ladder_stats(self, cam_id):
+        return {r.name: r.stats() for r in self.renditions.get(cam_id, [])}
+
+    def push_frame(self, cam_id, frame, timestamp=None):
+        hub.publish(cam_id, "annotated", frame, timestamp)
+
+rtsp_server = None
+media_ready = threading.Event()
+
+def start_media():
+    # Gst.init scans the plugin registry and the RTSP server starts a GLib
+    # loop; neither should delay the HTTP server answering /healthz
+    global rtsp_server
+    Gst.init(None)
+    server = RTSPServer()
+    server.start()
+    rtsp_server = server
+    media_ready.set()
+
+def build_model():
+    # DETECTOR_BACKEND: torchhub (default) | onnx | openvino | torchscript | stub
+    # The detector is built and warmed up in the background; weights come
+    # from MODEL_CACHE_DIR when present there.
+    # DETECTOR_WORKERS: cluster mode, detection runs on detector workers
+    # (python detector_cluster.py --listen ...) given as comma-separated
+    # unix:///path.sock / tcp://host:port addresses, or local:N to spawn N here.
+    if os.environ.get("DETECTOR_WORKERS"):
+        return DetectorPool.from_spec(os.environ["DETECTOR_WORKERS"])
+    return ModelLoader(lambda: YOLODetector(
+        backend=os.environ.get("DETECTOR_BACKEND", "torchhub"),
+        weights=resolve_weights(os.environ.get("DETECTOR_WEIGHTS")),
+        cache_dir=DEFAULT_CACHE_DIR,
+    ))
+
+def startup():
+    global model, scheduler, event_store
+    event_store = EventStore(os.environ.get("EVENT_STORE_DIR", "events_db"))
+    model = build_model()
+    scheduler = InferenceScheduler(model, max_batch_size=8, max_wait_ms=10)
+    scheduler.start()
+    model.start()
+    threading.Thread(target=start_media, daemon=True, name="media-init").start()
 
 # ========== VIDEO INGESTION + ANALYTICS ==========
 class StreamWorker(threading.Thread):
-    def __init__(self, cam_id, source_url):
+    def __init__(self, cam_id, source_url, isolated=False, analytics_config=None, source_config=None,
+                 lifecycle_config=None):
         super().__init__()
         self.cam_id = cam_id
         self.source_url = source_url
+        self.isolated = isolated
+        self.capture = None
         self.running = False
+        self.mailbox = LatestFrameMailbox()
+        self.analytics = AnalyticsWorker(cam_id, self.mailbox, scheduler, self.on_result, analytics_config)
+        # Decoding and scaling to the inference resolution happen inside
+        # GStreamer; only inference-sized frames reach Python.
+        self.pipeline = SourcePipeline(cam_id, source_url, self.on_frame, source_config)
+        self.overlay_ms = REGISTRY.histogram("stage_ms", camera=cam_id, stage="overlay")
+        self.wake = threading.Event()
+        # Demand-driven: without subscribers the camera idles (slow capture,
+        # no detection) and later releases its source altogether.
+        self.lifecycle = CameraLifecycle(cam_id, hub, self.on_state, lifecycle_config)
+        self.lifecycle.start()
+
+    def on_frame(self, frame, captured_at):
+        # Capture stage: only overwrites the mailbox slot so a slow detector
+        # never backs up the decoder (appsink keeps a single buffer).
+        if self.lifecycle.state == ACTIVE:
+            self.mailbox.put(frame, captured_at)
+
+    def on_state(self, state):
+        if state == ACTIVE:
+            self.pipeline.set_max_rate(0)
+        elif state == IDLE:
+            self.pipeline.set_max_rate(self.lifecycle.config["idle_fps"])
+            scheduler.forget(self.cam_id)
+        self.wake.set()
+
+    def capturing(self):
+        return self.running and self.lifecycle.state != STOPPED
 
     def run(self):
-        cap = cv2.VideoCapture(self.source_url)
-        if not cap.isOpened():
-            print(f"[ERROR] Cannot open {self.source_url}")
+        if self.isolated:
+            self.run_isolated()
             return
 
         self.running = True
+        self.analytics.start()
+        while self.running:
+            if not self.capturing():
+                self.wake.wait(0.5)
+                self.wake.clear()
+                continue
+            if not self.pipeline.run(self.capturing):
+                break  # source error / end of stream
+        self.finish()
+
+    def run_isolated(self):
+        # Capture runs in a supervised worker process; frames arrive as
+        # pooled copies out of its shared-memory ring.
+        config = self.pipeline.config
+        self.running = True
+        self.analytics.start()
         while self.running:
-            ret, frame = cap.read()
-            if not ret:
+            if not self.capturing():
+                if self.capture is not None:
+                    self.capture.close()
+                    self.capture = None
+                self.wake.wait(0.5)
+                self.wake.clear()
                 continue
+            if self.capture is None:
+                self.capture = ProcessCapture(self.cam_id, self.pipeline.launch_string(), kind="gst",
+                                              shape=(config["height"], config["width"], 3))
+                self.capture.start()
+            item = self.capture.poll(0.1)
+            if item is not None:
+                self.on_frame(*item)
 
-            annotated, people = detector.detect(frame)
-            latest_frames[self.cam_id] = annotated
-            rtsp_server.push_frame(self.cam_id, annotated)
+        if self.capture is not None:
+            self.capture.close()
+        self.finish()
+
+    def on_result(self, entry, detections, people):
+        event_store.append(self.cam_id, entry.timestamp, detections)
+        if people:
+            rtsp_server.trigger_recording(self.cam_id, entry.timestamp)
+        # Boxes are only drawn while an annotated consumer (/annotated RTSP
+        # client or /video viewer) is attached.
+        if not hub.channel(self.cam_id, "annotated").has_consumers():
+            return
+        with self.overlay_ms.time():
+            annotated = model.overlay.render(entry.frame, detections)
+        latest_frames[self.cam_id] = annotated
+        rtsp_server.push_frame(self.cam_id, annotated, entry.timestamp)
 
-        cap.release()
+    def finish(self):
+        self.lifecycle.close()
+        self.analytics.stop()
+        self.analytics.join(timeout=2)
+        scheduler.forget(self.cam_id)
+        if self.cam_id in rtsp_server.recorders:
+            rtsp_server.recorders[self.cam_id].flush()
+        # Ends the MJPEG streams of this camera (Flask and ASGI viewers)
+        hub.close(self.cam_id)
 
     def stop(self):
         self.running = False
+        self.wake.set()
+
+    def stats(self):
+        stats = self.analytics.stats()
+        stats["source"] = self.pipeline.stats()
+        stats["lifecycle"] = self.lifecycle.stats()
+        if self.capture is not None:
+            stats["process"] = self.capture.stats()
+        return stats
 
 # ========== STREAMING SERVER (MJPEG via Flask) ==========
 app = Flask(__name__)
 
 @app.route("/video/<cam_id>")
 def video(cam_id):
-    def gen():
-        while True:
-            frame = latest_frames.get(cam_id)
-            if frame is not None:
-                _, jpeg = cv2.imencode('.jpg', frame)
-                yield (b'--frame\r\nContent-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-            time.sleep(0.05)
-    return Response(gen(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return Response(hub.channel(cam_id, "annotated").mjpeg_stream(), mimetype=MJPEG_MIMETYPE)
+
+@app.route("/video/<cam_id>/<rung>")
+def video_rung(cam_id, rung):
+    # Ladder rung, e.g. /video/cam1/240p
+    if not hub.has_channel(cam_id, f"annotated@{rung}"):
+        return jsonify({"error": f"no rung {rung} for {cam_id}"}), 404
+    return Response(hub.channel(cam_id, f"annotated@{rung}").mjpeg_stream(), mimetype=MJPEG_MIMETYPE)
 
 @app.route("/dashboard")
 def dashboard():
@@ -134,7 +288,7 @@ def dashboard():
     <h1>Camera Control</h1>
     <form action="/stream/start" method="post">
         <input type="text" name="id" placeholder="Camera ID">
-        <input type="text" name="url" placeholder="Camera URL (0 = webcam)">
+        <input type="text" name="url" placeholder="0 = webcam, file path, rtsp:// or http:// URL">
         <input type="submit" value="Start">
     </form>
     <form action="/stream/stop" method="post">
@@ -153,10 +307,42 @@ def start_stream():
 
     if cam_id in streams:
         return jsonify({"status": "already running"})
+    if not media_ready.wait(10):
+        return jsonify({"status": "starting, retry shortly"}), 503
 
-    rtsp_server.add_stream(cam_id)
-    worker = StreamWorker(cam_id, url)
-    worker.start()
+    # Optional encoder fields: bitrate, preset, width, height, fps, keyint, record_dir, hls_dir
+    encoder = {key: data.get(key) for key in DEFAULT_ENCODER_CONFIG if data.get(key)}
+    # Optional event recording fields (prefixed): event_dir, event_pre_roll_s, event_post_roll_s, event_container
+    recording = {key: data.get(f"event_{key}") for key in DEFAULT_RECORDING_CONFIG if data.get(f"event_{key}")}
+    # Optional lifecycle fields (prefixed): lifecycle_mode=on_demand, lifecycle_idle_fps, lifecycle_idle_timeout_s
+    lifecycle = {key: data.get(f"lifecycle_{key}") for key in DEFAULT_LIFECYCLE_CONFIG if data.get(f"lifecycle_{key}")}
+    # Optional analytics fields: adaptive, target_fps, max_stride, motion_threshold, ...
+    analytics = {key: data.get(key) for key in DEFAULT_ANALYTICS_CONFIG if data.get(key)}
+    # Optional source fields (prefixed): source_width, source_height, source_fps, source_loop
+    source = {key: data.get(f"source_{key}") for key in DEFAULT_SOURCE_CONFIG if data.get(f"source_{key}")}
+    # Every config is validated before anything is mounted or registered
+    try:
+        check_cam_id(cam_id)
+        encoder = encoder_config(encoder)
+        # Optional ladder field: comma-separated rungs, e.g. "720p,480p,240p"
+        ladder = ladder_config(data.get("ladder") or None)
+        for rung in ladder:
+            encoder_config(rung_encoder_config(rung, encoder))
+        recording = recording_config(recording) if recording else None
+        lifecycle = lifecycle_config(lifecycle)
+        analytics = analytics_config(analytics)
+        source = source_config(source)
+    except ValueError as e:
+        return jsonify({"status": str(e)}), 400
+    isolated = CAMERA_PROCESSES or data.get("process") == "1"
+    try:
+        rtsp_server.add_stream(cam_id, encoder, ladder, recording)
+        worker = StreamWorker(cam_id, url, isolated, analytics, source, lifecycle)
+        worker.start()
+    except Exception:
+        # Leave nothing behind for a camera that never reached `streams`
+        remove_camera(cam_id)
+        raise
     streams[cam_id] = worker
     return jsonify({"status": f"started {cam_id}"})
 
@@ -168,13 +354,83 @@ def stop_stream():
     worker = streams.pop(cam_id, None)
     if worker:
         worker.stop()
+        worker.join(timeout=5)
+        remove_camera(cam_id)
         return jsonify({"status": f"stopped {cam_id}"})
     return jsonify({"status": "not running"})
 
+def remove_camera(cam_id):
+    # Unmount RTSP paths, drop hub channels and the camera's metric series
+    rtsp_server.remove_stream(cam_id)
+    hub.remove(cam_id)
+    latest_frames.pop(cam_id, None)
+    REGISTRY.unregister(camera=cam_id)
+
+@app.route("/events/<cam_id>")
+def events(cam_id):
+    # ?from=&to= (unix seconds, default: last hour) &class=<id> &limit=<rows>
+    t_to = request.args.get("to", default=time.time(), type=float)
+    t_from = request.args.get("from", default=t_to - 3600, type=float)
+    rows = event_store.query(
+        cam_id, t_from, t_to,
+        class_id=request.args.get("class", type=int),
+        limit=request.args.get("limit", default=1000, type=int),
+    )
+    return jsonify({"cam_id": cam_id, "from": t_from, "to": t_to, "count": int(len(rows["ts"])),
+                    "events": {name: col.tolist() for name, col in rows.items()}})
+
+@app.route("/events/<cam_id>/counts")
+def event_counts(cam_id):
+    # Per-bucket aggregates, default: person (class 0) per minute over the last hour
+    t_to = request.args.get("to", default=time.time(), type=float)
+    t_from = request.args.get("from", default=t_to - 3600, type=float)
+    buckets = event_store.counts(
+        cam_id, t_from, t_to,
+        class_id=request.args.get("class", default=0, type=int),
+        bucket_s=request.args.get("bucket", default=60, type=int),
+    )
+    return jsonify({"cam_id": cam_id, "from": t_from, "to": t_to, "buckets": buckets})
+
+@app.route("/metrics")
+def metrics():
+    # Prometheus text exposition of every pipeline counter / stage histogram
+    return Response(REGISTRY.prometheus(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/healthz")
+def healthz():
+    # Liveness: the HTTP server answers
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    # Readiness: GStreamer / RTSP started and the detector loaded and warm
+    ready = media_ready.is_set() and model is not None and model.ready.is_set()
+    model_stats = model.stats() if model is not None else None
+    return jsonify({"ready": ready, "media": media_ready.is_set(), "model": model_stats}), 200 if ready else 503
+
 @app.route("/status")
 def status():
-    return jsonify({"active_streams": list(streams.keys())})
+    return jsonify({
+        "active_streams": list(streams.keys()),
+        "streams": {
+            cam_id: {**worker.stats(), "mjpeg": hub.stats(cam_id), "encoder": rtsp_server.encoders[cam_id].stats(),
+                     "ladder": rtsp_server.ladder_stats(cam_id),
+                     "recording": rtsp_server.recording_stats(cam_id)}
+            for cam_id, worker in list(streams.items())
+        },
+        "model": model.stats() if model is not None else None,
+        "inference": scheduler.stats() if scheduler is not None else None,
+        "event_store": event_store.stats() if event_store is not None else None,
+        "metrics": {cam_id: REGISTRY.snapshot(camera=cam_id) for cam_id in list(streams)},
+    })
 
 # ========== ENTRY POINT ==========
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=8000, threaded=True)
+    # Model loading and GStreamer / RTSP start-up run in the background
+    startup()
+    # HTTP_SERVER=asgi: MJPEG viewers on an asyncio event loop (uvicorn),
+    # all other endpoints served by the Flask app through the same server
+    if os.environ.get("HTTP_SERVER") == "asgi":
+        run_asgi(hub, app, host='0.0.0.0', port=8000)
+    else:
+        app.run(host='0.0.0.0', port=8000, threaded=True)
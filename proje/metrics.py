@@ -0,0 +1,216 @@
+import threading
+import time
+import bisect
+
+STAGE_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+
+
+class Histogram:
+    """Thread-safe cumulative histogram (Prometheus-style buckets)."""
+
+    def __init__(self, buckets=STAGE_BUCKETS_MS):
+        self.buckets = sorted(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot = +Inf
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[idx] += 1
+            self.count += 1
+            self.sum += value
+
+    def time(self):
+        """Context manager observing the elapsed milliseconds."""
+        return _Timer(self)
+
+    def quantile(self, q):
+        """Estimate of the q-quantile, interpolated inside its bucket (like histogram_quantile)."""
+        with self._lock:
+            counts = list(self.counts)
+            count = self.count
+        if not count:
+            return 0.0
+        rank, running, lower = q * count, 0, 0.0
+        for bound, c in zip(self.buckets, counts):
+            if c and running + c >= rank:
+                return lower + (bound - lower) * (rank - running) / c
+            running += c
+            lower = bound
+        return float(self.buckets[-1])
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+        cumulative, running = {}, 0
+        for bound, c in zip(self.buckets + ["+Inf"], counts):
+            running += c
+            cumulative[str(bound)] = running
+        return {
+            "count": count,
+            "sum": round(total, 3),
+            "avg": round(total / count, 3) if count else 0.0,
+            "buckets": cumulative,
+        }
+
+
+class _Timer:
+    __slots__ = ("histogram", "started")
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000.0)
+        return False
+
+
+class Counter:
+    """
+    Monotonic counter that also reports its rate since the previous snapshot.
+    With fn, the value is read from an existing counter (e.g. mailbox.captured)
+    instead of being incremented, so hot paths pay nothing extra.
+    """
+
+    def __init__(self, fn=None):
+        self.fn = fn
+        self._value = 0
+        self._lock = threading.Lock()
+        self._last = (time.monotonic(), self.value)
+        self._rate = 0.0
+
+    @property
+    def value(self):
+        return self.fn() if self.fn is not None else self._value
+
+    def inc(self, n=1):
+        with self._lock:
+            self._value += n
+
+    def rate(self):
+        now = time.monotonic()
+        value = self.value
+        with self._lock:
+            last_time, last_value = self._last
+            if now - last_time >= 1.0:
+                self._rate = (value - last_value) / (now - last_time)
+                self._last = (now, value)
+            return self._rate
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    @property
+    def value(self):
+        try:
+            return self.fn()
+        except Exception:
+            return 0
+
+
+class Registry:
+    """
+    Named, labelled metrics shared by the whole pipeline. Exported as
+    Prometheus text (/metrics) and as a JSON section of /status.
+    """
+
+    def __init__(self, prefix="mv_"):
+        self.prefix = prefix
+        self.metrics = {}  # (name, labels) -> (kind, help, metric)
+        self._lock = threading.Lock()
+
+    def _get(self, kind, name, help, labels, factory):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            entry = self.metrics.get(key)
+            if entry is None:
+                entry = self.metrics[key] = (kind, help, factory())
+            return entry[2]
+
+    def counter(self, name, help="", **labels):
+        return self._get("counter", name, help, labels, Counter)
+
+    def counter_func(self, name, fn, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.metrics[key] = ("counter", help, Counter(fn))
+
+    def histogram(self, name, help="", buckets=STAGE_BUCKETS_MS, **labels):
+        return self._get("histogram", name, help, labels, lambda: Histogram(buckets))
+
+    def gauge(self, name, fn, help="", **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.metrics[key] = ("gauge", help, Gauge(fn))
+
+    def register(self, name, metric, help="", **labels):
+        """Export an existing Histogram / Counter under name."""
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        with self._lock:
+            self.metrics[(name, tuple(sorted(labels.items())))] = (kind, help, metric)
+
+    def unregister(self, **labels):
+        """Drop every metric whose labels include all of `labels` (e.g. camera=...)."""
+        match = set(labels.items())
+        with self._lock:
+            for key in [k for k in self.metrics if match <= set(k[1])]:
+                del self.metrics[key]
+
+    def _items(self):
+        with self._lock:
+            return sorted(self.metrics.items(), key=lambda kv: kv[0])
+
+    def prometheus(self):
+        items = self._items()
+        helps = {name: help for (name, _), (_, help, _) in items if help}
+        lines, declared = [], set()
+        for (name, labels), (kind, _, metric) in items:
+            full = self.prefix + name
+            if full not in declared:
+                declared.add(full)
+                if name in helps:
+                    lines.append(f"# HELP {full} {helps[name]}")
+                lines.append(f"# TYPE {full} {kind}")
+            label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+            if kind == "histogram":
+                snap = metric.snapshot()
+                sep = "," if label_str else ""
+                for bound, value in snap["buckets"].items():
+                    lines.append(f'{full}_bucket{{{label_str}{sep}le="{bound}"}} {value}')
+                lines.append(f"{full}_sum{{{label_str}}} {snap['sum']}")
+                lines.append(f"{full}_count{{{label_str}}} {snap['count']}")
+            else:
+                lines.append(f"{full}{{{label_str}}} {metric.value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self, **labels):
+        """JSON view; counters carry their current rate, histograms count/avg only."""
+        match = set(labels.items())
+        out = {}
+        for (name, key_labels), (kind, _, metric) in self._items():
+            if not match <= set(key_labels):
+                continue
+            rest = [f"{k}={v}" for k, v in key_labels if (k, v) not in match]
+            key = name + (f"[{','.join(rest)}]" if rest else "")
+            if kind == "histogram":
+                snap = metric.snapshot()
+                out[key] = {"count": snap["count"], "avg_ms": snap["avg"]}
+            elif kind == "counter":
+                out[key] = {"total": metric.value, "rate": round(metric.rate(), 2)}
+            else:
+                out[key] = metric.value
+        return out
+
+
+REGISTRY = Registry()
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+from metrics import REGISTRY
+
+# Detector weights (exported models, torch.hub repo + .pt files) are kept here
+# so restarts load offline instead of downloading again.
+DEFAULT_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", os.path.expanduser("~/.cache/mv_models"))
+
+PENDING, LOADING, WARMING, READY, FAILED = "pending", "loading", "warming", "ready", "failed"
+
+
+def resolve_weights(weights, cache_dir=DEFAULT_CACHE_DIR):
+    """A weights path as given, or the same file name inside the cache directory."""
+    if not weights or os.path.exists(weights) or not cache_dir:
+        return weights
+    cached = os.path.join(cache_dir, os.path.basename(weights))
+    return cached if os.path.exists(cached) else weights
+
+
+class ModelLoader(threading.Thread):
+    """
+    Builds the detector in the background so the servers answer /healthz and
+    accept cameras immediately. After loading, a warm-up pass per batch size
+    runs on a blank frame so the first real batch does not pay for lazy
+    allocations, JIT compilation or kernel selection. A failed load (e.g. no
+    network for torch.hub) is retried every retry_s instead of killing the
+    server.
+
+    Used in place of the detector by InferenceScheduler: wait() blocks until
+    the model is ready, predict_batch() delegates to it.
+    """
+
+    def __init__(self, factory, warmup_shape=(480, 640, 3), warmup_batch_sizes=(1,), retry_s=10.0):
+        super().__init__(daemon=True, name="model-loader")
+        self.factory = factory
+        self.warmup_shape = warmup_shape
+        self.warmup_batch_sizes = warmup_batch_sizes
+        self.retry_s = retry_s
+        self.detector = None
+        self.state = PENDING
+        self.error = None
+        self.attempts = 0
+        self.load_ms = None
+        self.warmup_ms = None
+        self.ready = threading.Event()
+        self.started_at = time.time()
+        REGISTRY.gauge("model_ready", lambda: int(self.ready.is_set()), "1 once the detector is loaded and warm")
+
+    def run(self):
+        while True:
+            self.attempts += 1
+            try:
+                self.state = LOADING
+                started = time.perf_counter()
+                detector = self.factory()
+                self.load_ms = (time.perf_counter() - started) * 1000.0
+                self.state = WARMING
+                self.warmup_ms = self.warmup(detector)
+            except Exception as e:
+                self.state, self.error = FAILED, str(e)
+                print(f"[MODEL] Load attempt {self.attempts} failed: {e}; retrying in {self.retry_s:g}s")
+                time.sleep(self.retry_s)
+                continue
+            self.detector = detector
+            self.state, self.error = READY, None
+            self.ready.set()
+            print(f"[MODEL] Ready: load {self.load_ms:.0f} ms, warm-up {self.warmup_ms:.0f} ms")
+            return
+
+    def warmup(self, detector):
+        started = time.perf_counter()
+        blank = np.zeros(self.warmup_shape, np.uint8)
+        for size in self.warmup_batch_sizes:
+            detector.predict_batch([blank] * size)
+        return (time.perf_counter() - started) * 1000.0
+
+    @property
+    def overlay(self):
+        return self.detector.overlay
+
+    def wait(self, timeout=None):
+        return self.ready.wait(timeout)
+
+    def predict_batch(self, frames):
+        self.ready.wait()
+        return self.detector.predict_batch(frames)
+
+    def stats(self):
+        return {
+            "state": self.state,
+            "ready": self.ready.is_set(),
+            "attempts": self.attempts,
+            "error": self.error,
+            "load_ms": round(self.load_ms, 1) if self.load_ms is not None else None,
+            "warmup_ms": round(self.warmup_ms, 1) if self.warmup_ms is not None else None,
+            "since_start_s": round(time.time() - self.started_at, 1),
+        }
@@ -0,0 +1,70 @@
+import time
+
+import cv2
+import numpy as np
+
+MOTION_SIZE = (64, 48)
+
+
+def downscale_gray(frame, size=MOTION_SIZE):
+    """Tiny grayscale thumbnail used for cheap motion estimates."""
+    small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def motion_score(prev, cur, pixel_threshold=25):
+    """Fraction of thumbnail pixels that changed by more than pixel_threshold."""
+    if prev is None:
+        return 1.0
+    diff = cv2.absdiff(prev, cur)
+    return np.count_nonzero(diff > pixel_threshold) / diff.size
+
+
+class MotionGate:
+    """
+    Pre-filter in front of the detector. Keeps a running-average background
+    of the thumbnail and lets a frame through only when enough pixels differ
+    from it; otherwise the caller reuses its last detections. A frame is let
+    through at least every max_skip frames so slow changes are picked up.
+    """
+
+    def __init__(self, area_threshold=0.005, pixel_threshold=15, learning_rate=0.05, max_skip=150):
+        self.area_threshold = area_threshold
+        self.pixel_threshold = pixel_threshold
+        self.learning_rate = learning_rate
+        self.max_skip = max_skip
+        self.background = None
+        self.since_pass = 0
+        self.frames = 0
+        self.skipped = 0
+        self.gate_ms = 0.0
+
+    def needs_inference(self, small):
+        """small: thumbnail from downscale_gray()."""
+        started = time.perf_counter()
+        self.frames += 1
+        if self.background is None:
+            self.background = small.astype(np.float32)
+            changed = 1.0
+        else:
+            diff = cv2.absdiff(small, cv2.convertScaleAbs(self.background))
+            changed = np.count_nonzero(diff > self.pixel_threshold) / diff.size
+            cv2.accumulateWeighted(small, self.background, self.learning_rate)
+        self.since_pass += 1
+        passed = changed >= self.area_threshold or self.since_pass >= self.max_skip
+        if passed:
+            self.since_pass = 0
+        else:
+            self.skipped += 1
+        self.gate_ms += (time.perf_counter() - started) * 1000.0
+        return passed
+
+    def stats(self, inference_ms=0.0):
+        """inference_ms: current per-frame detector cost, used to estimate the time saved."""
+        return {
+            "frames": self.frames,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / self.frames, 3) if self.frames else 0.0,
+            "gate_ms": round(self.gate_ms, 1),
+            "saved_ms": round(max(self.skipped * inference_ms - self.gate_ms, 0.0), 1),
+        }
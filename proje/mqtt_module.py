@@ -1,11 +1,14 @@
 import paho.mqtt.client as mqtt
 import threading
 import json
+import time
+from collections import deque
 
 class MQTTClient:
-    def __init__(self, host='localhost', port=1883):
+    def __init__(self, host='localhost', port=1883, verbose=False):
         self.host = host
         self.port = port
+        self.verbose = verbose
         self.client = mqtt.Client()
         self.subscriptions = {}
 
@@ -39,9 +42,127 @@ class MQTTClient:
         payload = payload or {}
         message = json.dumps(payload)
         self.client.publish(topic, message)
-        print(f"[MQTT] Published to {topic}: {message}")
+        if self.verbose:
+            print(f"[MQTT] Published to {topic}: {message}")
 
     def subscribe(self, topic, callback):
         self.subscriptions[topic] = callback
         self.client.subscribe(topic)
-        print(f"[MQTT] Subscribed to: {topic}")
\ No newline at end of file
+        print(f"[MQTT] Subscribed to: {topic}")
+
+
+class EventPublisher:
+    """
+    Event pipeline on top of MQTTClient.
+
+    report() is called from capture/analytics threads and only compares the
+    new state with the last one published (or already queued): unchanged
+    states are dropped unless the heartbeat is due. Accepted events go into a
+    bounded outbound queue (the oldest event is dropped and counted when it
+    is full). last_sent only moves on a successful publish, so a state lost
+    to a full queue or a failed publish goes out again on the next report. A sender thread
+    coalesces the queue every batch_interval seconds, keeping the newest
+    state per (camera, event type), and publishes a single JSON message to
+    batch_topic. With legacy_topics=True every event is additionally
+    published to events/<cam_id>/<event_type>.
+    """
+
+    def __init__(self, client, heartbeat_s=10.0, batch_interval_s=0.5, max_queue=1000,
+                 batch_topic="events/batch", legacy_topics=False):
+        self.client = client
+        self.heartbeat_s = heartbeat_s
+        self.batch_interval_s = batch_interval_s
+        self.batch_topic = batch_topic
+        self.legacy_topics = legacy_topics
+        self.queue = deque()
+        self.max_queue = max_queue
+        self.last_sent = {}  # (cam_id, event_type) -> (payload, monotonic time) of the last publish
+        self.queued = {}     # (cam_id, event_type) -> (payload, seq) of its newest queued event
+        self.seq = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.running = True
+        self.reported = 0
+        self.suppressed = 0
+        self.dropped = 0
+        self.batches = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def report(self, cam_id, event_type, payload):
+        now = time.monotonic()
+        key = (cam_id, event_type)
+        with self.lock:
+            self.reported += 1
+            last = self.last_sent.get(key)
+            queued = self.queued.get(key)
+            if (queued is not None and queued[0] == payload) or (
+                    queued is None and last is not None and last[0] == payload and now - last[1] < self.heartbeat_s):
+                self.suppressed += 1
+                return False
+            if len(self.queue) >= self.max_queue:
+                dropped = self.queue.popleft()
+                self.dropped += 1
+                self._unqueue([dropped])
+            self.seq += 1
+            self.queued[key] = (payload, self.seq)
+            self.queue.append((cam_id, event_type, payload, time.time(), self.seq))
+        return True
+
+    def _unqueue(self, events, published=False):
+        """Forget events that left the queue; published ones become last_sent. Call with the lock held."""
+        now = time.monotonic()
+        for cam_id, event_type, payload, _, seq in events:
+            key = (cam_id, event_type)
+            if published:
+                self.last_sent[key] = (payload, now)
+            if self.queued.get(key, (None, None))[1] == seq:
+                del self.queued[key]
+
+    def _drain(self):
+        """Newest queued event per (camera, event type); they stay in `queued` until published."""
+        with self.lock:
+            events, self.queue = self.queue, deque()
+        latest = {}
+        for event in events:
+            latest[(event[0], event[1])] = event
+        return list(latest.values())
+
+    def _run(self):
+        while self.running:
+            self.wakeup.wait(self.batch_interval_s)
+            self.wakeup.clear()
+            events = self._drain()
+            if not events:
+                continue
+            batch = [{"cam_id": cam_id, "type": event_type, "ts": ts, "payload": payload}
+                     for cam_id, event_type, payload, ts, _ in events]
+            try:
+                info = self.client.client.publish(self.batch_topic, json.dumps({"ts": time.time(), "events": batch}))
+                if info.rc != mqtt.MQTT_ERR_SUCCESS:
+                    raise ConnectionError(mqtt.error_string(info.rc))
+                if self.legacy_topics:
+                    for event in batch:
+                        self.client.publish_event(event["cam_id"], event["type"], event["payload"])
+                published = True
+                self.batches += 1
+            except Exception as e:
+                published = False
+                print(f"[MQTT] Batch publish failed: {e}")
+            with self.lock:
+                self._unqueue(events, published)
+
+    def stop(self):
+        self.running = False
+        self.wakeup.set()
+        self.thread.join(timeout=2)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "reported": self.reported,
+                "suppressed": self.suppressed,
+                "queued": len(self.queue),
+                "dropped": self.dropped,
+                "batches": self.batches,
+            }
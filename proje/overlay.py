@@ -0,0 +1,62 @@
+import cv2
+import numpy as np
+
+BOX_COLORS = np.array([(56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255),
+                       (49, 210, 207), (10, 249, 72), (23, 204, 146), (134, 219, 61)], np.uint8)
+
+
+def fill_rects(image, rects, colors):
+    """
+    Fill many axis-aligned rectangles (Kx4 x1,y1,x2,y2, exclusive end) with
+    per-rectangle colors in a single fancy-index assignment.
+    """
+    h, w = image.shape[:2]
+    rects = rects.astype(np.int64)
+    rects[:, [0, 2]] = rects[:, [0, 2]].clip(0, w)
+    rects[:, [1, 3]] = rects[:, [1, 3]].clip(0, h)
+    widths = rects[:, 2] - rects[:, 0]
+    heights = rects[:, 3] - rects[:, 1]
+    valid = (widths > 0) & (heights > 0)
+    rects, widths, colors = rects[valid], widths[valid], colors[valid]
+    sizes = widths * heights[valid]
+    if not sizes.size:
+        return image
+    starts = np.repeat(np.cumsum(sizes) - sizes, sizes)
+    idx = np.arange(sizes.sum()) - starts
+    rep_w = np.repeat(widths, sizes)
+    rows = idx // rep_w + np.repeat(rects[:, 1], sizes)
+    cols = idx % rep_w + np.repeat(rects[:, 0], sizes)
+    image[rows, cols] = np.repeat(colors, sizes, axis=0)
+    return image
+
+
+class OverlayRenderer:
+    """Draws a frame's Detections: all box outlines in one batched pass, then labels."""
+
+    def __init__(self, names, thickness=2, labels=True):
+        self.names = names
+        self.thickness = thickness
+        self.labels = labels
+
+    def render(self, frame, detections):
+        annotated = frame.copy()
+        if not len(detections.boxes):
+            return annotated
+        t = self.thickness
+        x1, y1, x2, y2 = np.round(detections.boxes).astype(np.int64).T
+        classes = detections.classes.astype(np.int64)
+        colors = BOX_COLORS[classes % len(BOX_COLORS)]
+        rects = np.concatenate([
+            np.stack([x1, y1, x2, y1 + t], 1),   # top
+            np.stack([x1, y2 - t, x2, y2], 1),   # bottom
+            np.stack([x1, y1, x1 + t, y2], 1),   # left
+            np.stack([x2 - t, y1, x2, y2], 1),   # right
+        ])
+        fill_rects(annotated, rects, np.tile(colors, (4, 1)))
+        if self.labels:
+            for i in range(len(classes)):
+                label = f"{self.names[classes[i]]} {detections.scores[i]:.2f}"
+                color = tuple(int(c) for c in colors[i])
+                cv2.putText(annotated, label, (int(x1[i]), max(int(y1[i]) - 4, 10)),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 1, cv2.LINE_AA)
+        return annotated
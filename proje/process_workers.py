@@ -0,0 +1,275 @@
+import argparse
+import os
+import select
+import subprocess
+import sys
+import time
+from multiprocessing import shared_memory, resource_tracker
+
+import numpy as np
+
+from frame_pool import FramePool
+
+HEADER_FIELDS = 4  # write_seq, height, width, slots
+
+
+class SharedFrameRing:
+    """
+    Fixed-size ring of BGR frames in multiprocessing shared memory.
+
+    Layout: int64 header [write_seq, height, width, slots], int64 seq and
+    float64 timestamp per slot, then `slots` frames back to back. The single
+    writer marks a slot as being written (seq = -1), fills it, stamps it and
+    finally bumps write_seq. Readers get NumPy views straight onto the
+    shared memory; a view stays valid until the writer laps the ring, which
+    is what `slots` is sized for. Consumers that keep frames longer than
+    that (analytics, overlay) must use copy_latest() instead.
+    """
+
+    def __init__(self, name=None, shape=(480, 640, 3), slots=16, create=False):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.frame_bytes = int(np.prod(self.shape))
+        meta_bytes = 8 * (HEADER_FIELDS + 2 * slots)
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=meta_bytes + slots * self.frame_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            # The creating process owns the segment; keep this process'
+            # resource tracker from unlinking it on exit.
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.owner = create
+        buf = self.shm.buf
+        self.header = np.ndarray((HEADER_FIELDS,), np.int64, buf, 0)
+        self.slot_seq = np.ndarray((slots,), np.int64, buf, 8 * HEADER_FIELDS)
+        self.slot_ts = np.ndarray((slots,), np.float64, buf, 8 * (HEADER_FIELDS + slots))
+        self.frames = np.ndarray((slots,) + self.shape, np.uint8, buf, meta_bytes)
+        if create:
+            self.header[:] = (0, self.shape[0], self.shape[1], slots)
+            self.slot_seq[:] = 0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def write_seq(self):
+        return int(self.header[0])
+
+    def write(self, frame, timestamp):
+        seq = self.write_seq + 1
+        slot = seq % self.slots
+        self.slot_seq[slot] = -1
+        np.copyto(self.frames[slot], frame)
+        self.slot_ts[slot] = timestamp
+        self.slot_seq[slot] = seq
+        self.header[0] = seq
+        return seq
+
+    def read_latest(self):
+        """Returns (seq, frame view, timestamp) of the newest complete frame, or None."""
+        seq = self.write_seq
+        if seq == 0:
+            return None
+        slot = seq % self.slots
+        if self.slot_seq[slot] != seq:
+            return None
+        return seq, self.frames[slot], float(self.slot_ts[slot])
+
+    def copy_latest(self, out):
+        """
+        Copy the newest complete frame into `out`; returns (seq, timestamp) or
+        None. Seqlock check: if the writer started on the slot during the
+        copy, the torn frame is discarded.
+        """
+        latest = self.read_latest()
+        if latest is None:
+            return None
+        seq, view, timestamp = latest
+        np.copyto(out, view)
+        if self.slot_seq[seq % self.slots] != seq:
+            return None
+        return seq, timestamp
+
+    def close(self):
+        # Drop our views before closing the mapping.
+        self.header = self.slot_seq = self.slot_ts = self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Frame views are still referenced downstream; the mapping is
+            # released when they are garbage collected.
+            pass
+        if self.owner:
+            self.shm.unlink()
+
+
+def capture_main(source, kind, ring_name, shape, slots, notify):
+    """Camera worker process: capture frames into the ring, one notify byte per frame."""
+    import cv2
+
+    ring = SharedFrameRing(ring_name, shape, slots)
+    height, width = shape[:2]
+
+    if kind == "gst":
+        import gi
+        gi.require_version('Gst', '1.0')
+        from gi.repository import Gst
+        Gst.init(None)
+        pipeline = Gst.parse_launch(source)
+        appsink = pipeline.get_by_name("sink")
+        pipeline.set_state(Gst.State.PLAYING)
+
+        def read():
+            sample = appsink.try_pull_sample(Gst.SECOND)
+            if sample is None:
+                return None
+            caps = sample.get_caps().get_structure(0)
+            buf = sample.get_buffer()
+            success, mapinfo = buf.map(Gst.MapFlags.READ)
+            if not success:
+                return None
+            frame = np.frombuffer(mapinfo.data, dtype=np.uint8).reshape(
+                (caps.get_value("height"), caps.get_value("width"), 3)).copy()
+            buf.unmap(mapinfo)
+            return frame
+    else:
+        cap = cv2.VideoCapture(source)
+        if not cap.isOpened():
+            print(f"[WORKER] Cannot open {source}")
+            return
+
+        def read():
+            ret, frame = cap.read()
+            return frame if ret else None
+
+    failures = 0
+    while True:
+        frame = read()
+        if frame is None:
+            failures += 1
+            if failures > 100:
+                print(f"[WORKER] {source}: too many read failures, exiting")
+                return
+            continue
+        failures = 0
+        if frame.shape[:2] != (height, width):
+            frame = cv2.resize(frame, (width, height))
+        ring.write(frame, time.time())
+        notify.write(b"\x01")
+        notify.flush()
+
+
+class ProcessCapture:
+    """
+    Front-end side of a camera captured in its own process. Owns the shared
+    frame ring, (re)starts the worker process and hands out new frames,
+    copied once out of the ring into a FramePool so they stay valid however
+    long analytics or viewers hold them. A crashed worker is restarted with exponential backoff.
+
+    Workers are started as plain `python process_workers.py` subprocesses so
+    they never re-import the server module (and its model / RTSP server).
+    """
+
+    def __init__(self, cam_id, source, kind="cv2", shape=(480, 640, 3), slots=16):
+        self.cam_id = cam_id
+        self.source = source
+        self.kind = kind
+        self.ring = SharedFrameRing(shape=shape, slots=slots, create=True)
+        self.pool = FramePool(self.ring.shape)
+        self.process = None
+        self.last_seq = 0
+        self.restarts = 0
+        self.backoff = 1.0
+        self.next_start = 0.0
+        self.started_at = 0.0
+
+    def start(self):
+        height, width = self.ring.shape[:2]
+        self.process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__),
+             "--source", str(self.source), "--kind", self.kind,
+             "--ring", self.ring.name, "--height", str(height), "--width", str(width),
+             "--slots", str(self.ring.slots)],
+            stdout=subprocess.PIPE,
+        )
+        self.started_at = time.monotonic()
+        print(f"[WORKER] {self.cam_id}: capture process pid={self.process.pid}")
+
+    def supervise(self):
+        if self.process is not None and self.process.poll() is None:
+            if time.monotonic() - self.started_at > 30:
+                self.backoff = 1.0
+            return
+        now = time.monotonic()
+        if self.process is not None:
+            print(f"[WORKER] {self.cam_id}: process exited ({self.process.returncode}), "
+                  f"restarting in {self.backoff:.0f}s")
+            self.process.stdout.close()
+            self.process = None
+            self.next_start = now + self.backoff
+            self.backoff = min(self.backoff * 2, 30.0)
+        if now >= self.next_start:
+            self.restarts += 1
+            self.start()
+
+    def poll(self, timeout=0.1):
+        """
+        Wait for a new frame; returns (frame, timestamp) or None. The frame is
+        a FramePool copy, not a view of the ring, so it stays valid after the
+        writer reuses the slot.
+        """
+        self.supervise()
+        if self.process is None:
+            time.sleep(timeout)
+            return None
+        fd = self.process.stdout.fileno()
+        ready, _, _ = select.select([fd], [], [], timeout)
+        if not ready:
+            return None
+        if not os.read(fd, 4096):
+            self.process.wait()
+            return None
+        if self.ring.write_seq == self.last_seq:
+            return None
+        frame = self.pool.acquire()
+        latest = self.ring.copy_latest(frame)
+        if latest is None or latest[0] == self.last_seq:
+            return None
+        self.last_seq = latest[0]
+        return frame, latest[1]
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            self.process.stdout.close()
+        self.ring.close()
+
+    def stats(self):
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": bool(self.process and self.process.poll() is None),
+            "restarts": self.restarts,
+            "ring_seq": self.ring.write_seq,
+            "frame_pool": self.pool.stats(),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Camera capture worker process")
+    parser.add_argument("--source", required=True)
+    parser.add_argument("--kind", choices=["cv2", "gst"], default="cv2")
+    parser.add_argument("--ring", required=True)
+    parser.add_argument("--height", type=int, default=480)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--slots", type=int, default=16)
+    args = parser.parse_args()
+    source = int(args.source) if args.kind == "cv2" and args.source.isdigit() else args.source
+    # stdout carries the frame notifications; keep logs on stderr.
+    notify = sys.stdout.buffer
+    sys.stdout = sys.stderr
+    capture_main(source, args.kind, args.ring, (args.height, args.width, 3), args.slots, notify)
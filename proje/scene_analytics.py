@@ -0,0 +1,254 @@
+import json
+
+import numpy as np
+
+from inference_backends import COCO_NAMES
+from tiling import parse_roi
+
+
+def parse_zones(zones):
+    """Named polygons (normalized coords): {"name": polygon}, or a list of polygons named zone0, zone1..."""
+    if zones in (None, "", [], {}):
+        return {}
+    if isinstance(zones, str):
+        zones = json.loads(zones)
+    if isinstance(zones, dict):
+        return {name: parse_roi(poly)[0] for name, poly in zones.items()}
+    return {f"zone{i}": poly for i, poly in enumerate(parse_roi(zones))}
+
+
+def parse_lines(lines):
+    """Named counting lines (normalized coords): {"name": [[x1, y1], [x2, y2]]} -> {name: 2x2 array}."""
+    if lines in (None, "", [], {}):
+        return {}
+    if isinstance(lines, str):
+        lines = json.loads(lines)
+    if not isinstance(lines, dict):
+        lines = {f"line{i}": line for i, line in enumerate(lines)}
+    parsed = {name: np.asarray(line, np.float32).reshape(-1, 2) for name, line in lines.items()}
+    for name, line in parsed.items():
+        if len(line) != 2:
+            raise ValueError(f"line {name!r} needs exactly 2 points")
+    return parsed
+
+
+def polygon_edges(polygons):
+    """Edges of all polygons concatenated (x1, y1, x2, y2, dx/dy) plus each polygon's first edge index."""
+    edges, starts = [], []
+    for poly in polygons:
+        starts.append(sum(len(e) for e in edges))
+        nxt = np.roll(poly, -1, axis=0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inv_slope = (nxt[:, 0] - poly[:, 0]) / (nxt[:, 1] - poly[:, 1])
+        edges.append(np.column_stack([poly, nxt, inv_slope]))
+    return np.concatenate(edges).astype(np.float32), np.array(starts, np.int64)
+
+
+def points_in_polygons(points, edges, starts):
+    """Z x N even-odd test of N points against every polygon at once (see polygon_edges)."""
+    x, y = points[:, 0:1], points[:, 1:2]
+    straddles = (edges[:, 1] > y) != (edges[:, 3] > y)
+    with np.errstate(invalid="ignore"):
+        hits = straddles & (x < edges[:, 0] + (y - edges[:, 1]) * edges[:, 4])
+    return (np.add.reduceat(hits, starts, axis=1) % 2 == 1).T
+
+
+def cross2(o, a, b):
+    """z of (a - o) x (b - o), broadcast over any leading dimensions."""
+    return (a[..., 0] - o[..., 0]) * (b[..., 1] - o[..., 1]) - (a[..., 1] - o[..., 1]) * (b[..., 0] - o[..., 0])
+
+
+class SceneAnalytics:
+    """
+    Per-frame spatial analytics on the full detection arrays of a camera.
+
+    Each object is placed at the bottom centre of its box. Per frame:
+    class counts (one bincount), zone occupancy per class (one even-odd test
+    per zone over all points), line crossings (every track's movement since
+    its previous position against every line in one broadcast segment
+    intersection) and dwell time per (track, zone) pair, kept in sorted key
+    arrays and matched with searchsorted. Lost tracks keep their position
+    and dwell entry for grace_s so short tracker gaps do not reset them.
+
+    Crossing a line towards the right-hand side of its a->b direction (as
+    seen in the image, y pointing down) counts as "in", the other way as "out".
+    """
+
+    def __init__(self, zones=None, lines=None, names=COCO_NAMES, grace_s=1.0):
+        self.zones = parse_zones(zones)
+        self.lines = parse_lines(lines)
+        self.zone_names = list(self.zones)
+        self.line_names = list(self.lines)
+        self.names = names
+        self.num_classes = len(names)
+        self.grace_s = grace_s
+        self._shape = None
+        self._edges = self._edge_starts = None
+        self._line_px = np.zeros((0, 2, 2), np.float32)
+        # Last known position per track (sorted by id)
+        self.track_ids = np.zeros(0, np.int64)
+        self.track_points = np.zeros((0, 2), np.float32)
+        self.track_seen = np.zeros(0, np.float64)
+        # Dwell entries per (track id * zones + zone) key (sorted)
+        self.dwell_keys = np.zeros(0, np.int64)
+        self.dwell_since = np.zeros(0, np.float64)
+        self.dwell_seen = np.zeros(0, np.float64)
+        # Cumulative results
+        self.crossings = np.zeros((len(self.lines), 2, self.num_classes), np.int64)  # line, in/out, class
+        self.visits = np.zeros(len(self.zones), np.int64)
+        self.visit_seconds = np.zeros(len(self.zones), np.float64)
+        self.frames = 0
+        self.result = {}
+
+    def _scale(self, shape):
+        if shape != self._shape:
+            scale = np.array([shape[1], shape[0]], np.float32)
+            if self.zones:
+                self._edges, self._edge_starts = polygon_edges([poly * scale for poly in self.zones.values()])
+            if self.lines:
+                self._line_px = np.stack([line * scale for line in self.lines.values()])
+            self._shape = shape
+
+    def update(self, detections, timestamp, shape):
+        """detections: Detections (boxes, scores, classes, track_ids) of one frame."""
+        self._scale(shape[:2])
+        boxes = detections.boxes
+        classes = np.clip(detections.classes, 0, self.num_classes - 1)
+        points = np.column_stack([(boxes[:, 0] + boxes[:, 2]) * 0.5, boxes[:, 3]])
+        counts = np.bincount(classes, minlength=self.num_classes)
+        result = {"classes": self._named(counts)}
+
+        tracked = detections.track_ids > 0
+        ids, track_points, track_classes = detections.track_ids[tracked], points[tracked], classes[tracked]
+        order = np.argsort(ids)
+        ids, track_points, track_classes = ids[order], track_points[order], track_classes[order]
+
+        if self.zones:
+            inside = points_in_polygons(points, self._edges, self._edge_starts)  # Z x N
+            result["zones"] = self._zones(inside, inside[:, tracked][:, order], classes, ids, timestamp)
+        if self.lines:
+            result["crossings"] = self._cross(ids, track_points, track_classes)
+            result["lines"] = {
+                name: {"in": int(self.crossings[i, 0].sum()), "out": int(self.crossings[i, 1].sum())}
+                for i, name in enumerate(self.line_names)
+            }
+        self._remember(ids, track_points, timestamp)
+        self.frames += 1
+        self.result = result
+        return result
+
+    def _named(self, counts):
+        return {self.names[c]: int(counts[c]) for c in np.flatnonzero(counts)}
+
+    def _zones(self, inside, tracked_inside, classes, ids, timestamp):
+        num_zones = len(self.zone_names)
+        zone_idx, det_idx = np.nonzero(inside)
+        per_class = np.bincount(zone_idx * self.num_classes + classes[det_idx],
+                                minlength=num_zones * self.num_classes).reshape(num_zones, self.num_classes)
+
+        # Dwell: (track, zone) pairs present now, matched against the open entries
+        zone_t, track_t = np.nonzero(tracked_inside)
+        keys = np.unique(ids[track_t] * num_zones + zone_t)
+        if len(self.dwell_keys):
+            pos = np.minimum(np.searchsorted(self.dwell_keys, keys), len(self.dwell_keys) - 1)
+            known = self.dwell_keys[pos] == keys
+            since = np.where(known, self.dwell_since[pos], timestamp)
+        else:
+            pos, known = np.zeros(len(keys), np.int64), np.zeros(len(keys), bool)
+            since = np.full(len(keys), timestamp)
+
+        # Entries not seen now survive grace_s, then count as a finished visit
+        absent = np.ones(len(self.dwell_keys), bool)
+        absent[pos[known]] = False
+        lingering = absent & (timestamp - self.dwell_seen <= self.grace_s)
+        ended = absent & ~lingering
+        if ended.any():
+            ended_zones = self.dwell_keys[ended] % num_zones
+            durations = self.dwell_seen[ended] - self.dwell_since[ended]
+            self.visits += np.bincount(ended_zones, minlength=num_zones)
+            self.visit_seconds += np.bincount(ended_zones, durations, minlength=num_zones)
+
+        all_keys = np.concatenate([keys, self.dwell_keys[lingering]])
+        order = np.argsort(all_keys)
+        self.dwell_keys = all_keys[order]
+        self.dwell_since = np.concatenate([since, self.dwell_since[lingering]])[order]
+        self.dwell_seen = np.concatenate([np.full(len(keys), timestamp), self.dwell_seen[lingering]])[order]
+
+        current_zone = keys % num_zones
+        dwell = timestamp - since
+        dwell_max = np.zeros(num_zones)
+        np.maximum.at(dwell_max, current_zone, dwell)
+        dwell_sum = np.bincount(current_zone, dwell, minlength=num_zones)
+        dwell_n = np.bincount(current_zone, minlength=num_zones)
+
+        zones = {}
+        for z, name in enumerate(self.zone_names):
+            zones[name] = {
+                "count": int(per_class[z].sum()),
+                "classes": self._named(per_class[z]),
+                "dwell_max_s": round(float(dwell_max[z]), 1),
+                "dwell_avg_s": round(float(dwell_sum[z] / dwell_n[z]), 1) if dwell_n[z] else 0.0,
+                "visits": int(self.visits[z]),
+                "visit_avg_s": round(float(self.visit_seconds[z] / self.visits[z]), 1) if self.visits[z] else 0.0,
+            }
+        return zones
+
+    def _cross(self, ids, points, classes):
+        if not len(ids) or not len(self.track_ids):
+            return []
+        pos = np.minimum(np.searchsorted(self.track_ids, ids), len(self.track_ids) - 1)
+        seen = self.track_ids[pos] == ids
+        if not seen.any():
+            return []
+        start, end, cls, moved_ids = self.track_points[pos[seen]], points[seen], classes[seen], ids[seen]
+        # Broadcast L lines x M movements: proper segment intersection test
+        a, b = self._line_px[:, None, 0], self._line_px[:, None, 1]    # L x 1 x 2
+        p, q = start[None], end[None]                                   # 1 x M x 2
+        side_p, side_q = cross2(a, b, p), cross2(a, b, q)               # L x M
+        hit = (side_p * side_q < 0) & (cross2(p, q, a) * cross2(p, q, b) < 0)
+        line_idx, move_idx = np.nonzero(hit)
+        direction = (side_q[line_idx, move_idx] < 0).astype(np.int64)  # 0: in, 1: out
+        np.add.at(self.crossings, (line_idx, direction, cls[move_idx]), 1)
+        return [
+            {"line": self.line_names[l], "direction": "in" if d == 0 else "out",
+             "track_id": int(moved_ids[m]), "class": self.names[cls[m]]}
+            for l, m, d in zip(line_idx.tolist(), move_idx.tolist(), direction.tolist())
+        ]
+
+    def _remember(self, ids, points, timestamp):
+        # Current tracks replace their old positions; lost ones linger for grace_s
+        keep = timestamp - self.track_seen <= self.grace_s
+        if len(ids):
+            pos = np.minimum(np.searchsorted(ids, self.track_ids), len(ids) - 1)
+            keep &= ids[pos] != self.track_ids
+        all_ids = np.concatenate([ids, self.track_ids[keep]])
+        order = np.argsort(all_ids)
+        self.track_ids = all_ids[order]
+        self.track_points = np.concatenate([points, self.track_points[keep]])[order]
+        self.track_seen = np.concatenate([np.full(len(ids), timestamp), self.track_seen[keep]])[order]
+
+    def events(self):
+        """State payloads for the EventPublisher, one per event type."""
+        events = {"classes": self.result.get("classes", {})}
+        if self.zones:
+            events["zones"] = {name: {"count": z["count"], "classes": z["classes"],
+                                      "dwell_max_s": round(z["dwell_max_s"])}
+                               for name, z in self.result.get("zones", {}).items()}
+        if self.lines:
+            events["lines"] = self.line_totals()
+        return events
+
+    def line_totals(self):
+        return {
+            name: {"in": self._named(self.crossings[i, 0]), "out": self._named(self.crossings[i, 1])}
+            for i, name in enumerate(self.line_names)
+        }
+
+    def stats(self):
+        return {
+            "frames": self.frames,
+            "zones": self.zone_names,
+            "lines": self.line_names,
+            "latest": {k: v for k, v in self.result.items() if k != "crossings"},
+            "line_totals": self.line_totals() if self.lines else None,
+        }
@@ -0,0 +1,188 @@
+import math
+import time
+from pathlib import Path
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+from frame_pool import FramePool
+from metrics import REGISTRY
+
+DEFAULT_SOURCE_CONFIG = {
+    "width": 640,    # inference resolution; scaling happens inside GStreamer
+    "height": 480,
+    "fps": 0,        # 0 = source rate, otherwise frames are dropped before conversion
+    "loop": False,   # restart files at EOS
+}
+
+MAX_RATE = 2147483647  # videorate's "no limit"
+URI_SCHEMES = ("rtsp://", "rtsps://", "http://", "https://", "file://", "udp://", "rtmp://")
+
+
+def source_config(overrides=None):
+    config = dict(DEFAULT_SOURCE_CONFIG)
+    for key, value in (overrides or {}).items():
+        if key not in config or value in (None, ""):
+            continue
+        default = DEFAULT_SOURCE_CONFIG[key]
+        if isinstance(default, bool):
+            config[key] = value in (True, 1, "1", "true", "on")
+        else:
+            try:
+                config[key] = type(default)(value)
+            except (TypeError, ValueError):
+                raise ValueError(f"invalid source {key} {value!r}") from None
+    if config["height"] <= 0 or config["width"] <= 0 or config["fps"] < 0:
+        raise ValueError("source width and height must be > 0, fps >= 0")
+    # BGR rows are padded to 4 bytes in GStreamer buffers; a width that is a
+    # multiple of 4 keeps appsink buffers exactly height * width * 3.
+    config["width"] = max(4, config["width"] // 4 * 4)
+    return config
+
+
+def is_live(source):
+    """Cameras and network streams are live; files are paced by the appsink clock."""
+    source = str(source)
+    return source.isdigit() or source.startswith(("/dev/video", "videotestsrc")) or (
+        source.startswith(URI_SCHEMES) and not source.startswith("file://"))
+
+
+def source_element(source):
+    """GStreamer source (and decoder) for a device index, device path, URI or file path."""
+    source = str(source)
+    if source.isdigit():
+        return f"v4l2src device=/dev/video{source}"
+    if source.startswith("/dev/video"):
+        return f"v4l2src device={source}"
+    if source.startswith("videotestsrc"):
+        # Synthetic camera (benchmarks / demos); extra properties may follow
+        return f"{source} is-live=true" if source == "videotestsrc" else source
+    if source.startswith(URI_SCHEMES):
+        uri = source
+    else:
+        uri = Path(source).expanduser().resolve().as_uri()
+    # uridecodebin picks the highest-ranked decoder available (VA-API, NVDEC,
+    # V4L2 M2M, ... or software), so the pipeline is hardware agnostic.
+    return f'uridecodebin uri="{uri}"'
+
+
+def source_pipeline_string(source, config=None, sink_name="sink"):
+    """
+    Decode -> (rate limit) -> scale in the decoder's native format -> convert
+    the already small frame to BGR -> appsink keeping only the newest buffer.
+    Python never sees a frame larger than the inference resolution.
+    """
+    c = source_config(config)
+    # videorate only drops frames (max-rate), so the rate can also be lowered
+    # at runtime, e.g. while nobody watches the camera.
+    launch = f"{source_element(source)} ! videorate name=rate drop-only=true "
+    if c["fps"]:
+        launch += f"max-rate={c['fps']} "
+    launch += ("! "
+        "videoscale add-borders=true ! "
+        f"video/x-raw,width={c['width']},height={c['height']},pixel-aspect-ratio=1/1 ! "
+        "videoconvert ! video/x-raw,format=BGR ! "
+        f"appsink name={sink_name} emit-signals=true max-buffers=1 drop=true "
+        f"sync={'false' if is_live(source) else 'true'}"
+    )
+    return launch
+
+
+class SourcePipeline:
+    """
+    In-process GStreamer capture of one camera source. Every decoded frame is
+    copied once out of the mapped buffer into a pooled array and handed to
+    on_frame(frame, captured_at) on the streaming thread.
+    """
+
+    def __init__(self, cam_id, source, on_frame, config=None):
+        self.cam_id = cam_id
+        self.source = source
+        self.on_frame = on_frame
+        self.config = source_config(config)
+        self.pool = None
+        self.pipeline = None
+        self.max_rate = None
+        self.min_interval = 0.0
+        self.last_frame_at = 0.0
+        self.frames = 0
+        self.capture_ms = REGISTRY.histogram("stage_ms", camera=cam_id, stage="capture")
+
+    def launch_string(self):
+        return source_pipeline_string(self.source, self.config)
+
+    def on_new_sample(self, sink):
+        started = time.perf_counter()
+        sample = sink.emit("pull-sample")
+        if sample is None:
+            return Gst.FlowReturn.OK
+        now = time.time()
+        if now - self.last_frame_at < self.min_interval:
+            return Gst.FlowReturn.OK
+        self.last_frame_at = now
+        buf = sample.get_buffer()
+        caps = sample.get_caps().get_structure(0)
+        shape = (caps.get_value("height"), caps.get_value("width"), 3)
+        success, mapinfo = buf.map(Gst.MapFlags.READ)
+        if not success:
+            return Gst.FlowReturn.ERROR
+        if self.pool is None or self.pool.shape != shape:
+            self.pool = FramePool(shape)
+        # Single copy out of the mapped Gst memory into a reusable buffer;
+        # the mapping is only valid until unmap().
+        frame = self.pool.copy_in(mapinfo.data)
+        buf.unmap(mapinfo)
+        self.capture_ms.observe((time.perf_counter() - started) * 1000.0)
+        self.frames += 1
+        self.on_frame(frame, now)
+        return Gst.FlowReturn.OK
+
+    def set_max_rate(self, fps):
+        """
+        Cap the delivered frame rate (0 = configured rate); applies to the
+        running pipeline too. videorate only takes whole frames per second,
+        so rates below 1 fps are enforced here on top of a 1 fps cap.
+        """
+        self.min_interval = 1.0 / fps if 0 < fps < 1 else 0.0
+        self.max_rate = math.ceil(fps) or self.config["fps"] or MAX_RATE
+        pipeline = self.pipeline
+        if pipeline is not None:
+            pipeline.get_by_name("rate").set_property("max-rate", self.max_rate)
+
+    def run(self, running):
+        """
+        Play until running() turns false (returns True), or an error occurs
+        or a non-looping source ends (returns False).
+        """
+        self.pipeline = Gst.parse_launch(self.launch_string())
+        self.pipeline.get_by_name("sink").connect("new-sample", self.on_new_sample)
+        if self.max_rate:
+            self.pipeline.get_by_name("rate").set_property("max-rate", self.max_rate)
+        self.pipeline.set_state(Gst.State.PLAYING)
+        bus = self.pipeline.get_bus()
+        try:
+            while running():
+                msg = bus.timed_pop_filtered(100 * Gst.MSECOND, Gst.MessageType.ERROR | Gst.MessageType.EOS)
+                if msg is None:
+                    continue
+                if msg.type == Gst.MessageType.EOS and self.config["loop"]:
+                    self.pipeline.seek_simple(Gst.Format.TIME, Gst.SeekFlags.FLUSH | Gst.SeekFlags.KEY_UNIT, 0)
+                    continue
+                if msg.type == Gst.MessageType.ERROR:
+                    err, _ = msg.parse_error()
+                    print(f"[SOURCE] {self.cam_id}: {err.message}")
+                else:
+                    print(f"[SOURCE] {self.cam_id}: end of stream")
+                return False
+            return True
+        finally:
+            self.pipeline.set_state(Gst.State.NULL)
+            self.pipeline = None
+
+    def stats(self):
+        stats = {"source": str(self.source), "frames": self.frames,
+                 "resolution": [self.config["width"], self.config["height"]]}
+        if self.pool is not None:
+            stats["frame_pool"] = self.pool.stats()
+        return stats
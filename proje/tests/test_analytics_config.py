@@ -0,0 +1,51 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_pipeline import analytics_config
+
+
+def test_fractional_rates_are_kept():
+    config = analytics_config({"target_fps": 0.5, "detector_budget": "0.25"})
+    assert config["target_fps"] == 0.5
+    assert config["detector_budget"] == 0.25
+
+
+def test_form_values_are_parsed():
+    config = analytics_config({"target_fps": "2.5", "max_stride": "8", "adaptive": "0"})
+    assert config["target_fps"] == 2.5
+    assert config["max_stride"] == 8
+    assert config["adaptive"] is False
+
+
+@pytest.mark.parametrize("overrides", [
+    {"target_fps": 0},
+    {"target_fps": -1},
+    {"target_fps": "fast"},
+    {"max_stride": [3]},
+    {"tile_rows": 0},
+])
+def test_bad_values_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        analytics_config(overrides)
+
+
+@pytest.mark.parametrize("overrides", [
+    {"roi": [[0.1, 0.1], [0.5, 0.5]]},
+    {"roi": "not json"},
+    {"zones": {"door": [[0.1, 0.1]]}},
+    {"lines": {"gate": [[0.5, 0.0], [0.5, 0.5], [0.5, 1.0]]}},
+    {"lines": 5},
+])
+def test_bad_geometry_is_rejected(overrides):
+    with pytest.raises(ValueError):
+        analytics_config(overrides)
+
+
+def test_valid_geometry_is_kept():
+    zones = {"door": [[0.4, 0.4], [0.8, 0.4], [0.8, 0.9]]}
+    config = analytics_config({"zones": zones, "lines": {"gate": [[0.5, 0], [0.5, 1]]}})
+    assert config["zones"] == zones
@@ -0,0 +1,103 @@
+import os
+import socket
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from detector_cluster import DetectorPool, DetectorServer, parse_address
+from inference_scheduler import InferenceScheduler
+from model_loader import ModelLoader
+
+
+class StubDetector:
+    """Returns one box per frame whose score encodes the frame's first pixel."""
+
+    def predict_batch(self, frames):
+        results = []
+        for frame in frames:
+            if frame[0, 0, 0] == 255:
+                raise RuntimeError("stub failure")
+            results.append(np.array([[1, 2, 3, 4, frame[0, 0, 0] / 100.0, 0]], np.float32))
+        return results
+
+
+def serve(tmp_path, detector):
+    scheduler = InferenceScheduler(detector, max_wait_ms=1)
+    scheduler.start()
+    address = "unix://" + str(tmp_path / "detector.sock")
+    threading.Thread(target=DetectorServer(address, scheduler).serve_forever, daemon=True).start()
+    wait_for(lambda: os.path.exists(tmp_path / "detector.sock"))
+    return address
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached"
+        time.sleep(0.01)
+
+
+def frame(value):
+    return np.full((8, 8, 3), value, np.uint8)
+
+
+def test_parse_address():
+    assert parse_address("unix:///tmp/d.sock") == (socket.AF_UNIX, "/tmp/d.sock")
+    assert parse_address("tcp://10.0.0.2:7000") == (socket.AF_INET, ("10.0.0.2", 7000))
+    assert parse_address(":7000") == (socket.AF_INET, ("0.0.0.0", 7000))
+
+
+def test_pool_waits_for_model_then_round_trips(tmp_path):
+    release = threading.Event()
+
+    def factory():
+        release.wait()
+        return StubDetector()
+
+    loader = ModelLoader(factory, warmup_shape=(8, 8, 3))
+    pool = DetectorPool([serve(tmp_path, loader)], retry_s=0.05)
+    pool.start()
+    try:
+        address = pool.connections[0].address
+        wait_for(lambda: pool.stats()["workers"][address]["connected"])
+        # Connected, but the worker's model is still loading
+        assert not pool.wait(0.2)
+
+        release.set()
+        loader.start()
+        assert pool.wait(5)
+        results = pool.predict_batch([frame(10), frame(20), frame(30)])
+        assert [round(float(dets[0, 4]), 2) for dets in results] == [0.1, 0.2, 0.3]
+        assert results[0][0, :4].tolist() == [1, 2, 3, 4]
+        assert pool.stats()["workers"][address]["completed"] == 3
+    finally:
+        pool.close()
+
+
+def test_worker_error_is_raised_and_connection_stays_usable(tmp_path):
+    pool = DetectorPool([serve(tmp_path, StubDetector())], retry_s=0.05, encoding="jpeg")
+    pool.start()
+    try:
+        assert pool.wait(5)
+        with pytest.raises(RuntimeError, match="stub failure"):
+            pool.submit(frame(255)).result(timeout=5)
+        assert pool.submit(frame(40)).result(timeout=5).shape == (1, 6)
+        assert pool.stats()["workers"][pool.connections[0].address]["failures"] == 0
+    finally:
+        pool.close()
+
+
+def test_submit_times_out_without_workers(tmp_path):
+    pool = DetectorPool(["unix://" + str(tmp_path / "missing.sock")], retry_s=0.05, submit_timeout_s=0.1)
+    pool.start()
+    try:
+        with pytest.raises(TimeoutError):
+            pool.submit(frame(0)).result(timeout=1)
+        assert pool.stats()["state"] == "connecting"
+    finally:
+        pool.close()
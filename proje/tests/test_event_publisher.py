@@ -0,0 +1,85 @@
+import json
+import os
+import sys
+import time
+import types
+
+import paho.mqtt.client as mqtt
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mqtt_module import EventPublisher
+
+
+class FakePaho:
+    def __init__(self):
+        self.messages = []
+        self.rc = mqtt.MQTT_ERR_SUCCESS
+
+    def publish(self, topic, message):
+        if self.rc == mqtt.MQTT_ERR_SUCCESS:
+            self.messages.append((topic, json.loads(message)))
+        return types.SimpleNamespace(rc=self.rc)
+
+
+def publisher(**kwargs):
+    paho = FakePaho()
+    # A long batch interval keeps the sender thread out of the way; tests flush by hand.
+    pub = EventPublisher(types.SimpleNamespace(client=paho), batch_interval_s=3600, **kwargs)
+    return pub, paho
+
+
+def flush(pub):
+    pub.wakeup.set()
+    deadline = time.monotonic() + 2
+    while pub.queue and time.monotonic() < deadline:
+        time.sleep(0.01)
+    time.sleep(0.05)
+
+
+def payloads(paho):
+    return [[e["payload"] for e in msg["events"]] for _, msg in paho.messages]
+
+
+def test_unchanged_state_is_suppressed():
+    pub, paho = publisher()
+    assert pub.report("cam1", "people", {"count": 1})
+    assert not pub.report("cam1", "people", {"count": 1})
+    flush(pub)
+    assert not pub.report("cam1", "people", {"count": 1})
+    assert pub.report("cam1", "people", {"count": 2})
+    flush(pub)
+    assert payloads(paho) == [[{"count": 1}], [{"count": 2}]]
+    pub.stop()
+
+
+def test_batch_keeps_newest_state_per_event_type():
+    pub, paho = publisher()
+    pub.report("cam1", "people", {"count": 1})
+    pub.report("cam1", "people", {"count": 2})
+    pub.report("cam2", "people", {"count": 5})
+    flush(pub)
+    assert payloads(paho) == [[{"count": 2}, {"count": 5}]]
+    pub.stop()
+
+
+def test_state_dropped_from_full_queue_is_resent():
+    pub, paho = publisher(max_queue=1)
+    pub.report("cam1", "people", {"count": 3})
+    pub.report("cam1", "cars", {"count": 1})  # pushes the people event out
+    assert pub.stats()["dropped"] == 1
+    assert pub.report("cam1", "people", {"count": 3})
+    pub.stop()
+
+
+def test_failed_publish_is_retried_on_next_report():
+    pub, paho = publisher()
+    paho.rc = mqtt.MQTT_ERR_NO_CONN
+    pub.report("cam1", "people", {"count": 4})
+    flush(pub)
+    assert paho.messages == []
+    paho.rc = mqtt.MQTT_ERR_SUCCESS
+    assert pub.report("cam1", "people", {"count": 4})
+    flush(pub)
+    assert payloads(paho) == [[{"count": 4}]]
+    pub.stop()
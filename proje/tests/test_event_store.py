@@ -0,0 +1,78 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from event_store import EventStore, check_cam_id
+from yolo_detector import Detections
+
+T0 = 1700000000.0  # 22:13:20 UTC
+
+
+def dets(*rows, tracks=None):
+    return Detections.from_array(np.array(rows, np.float32),
+                                 np.array(tracks or [0] * len(rows), np.int64))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EventStore(str(tmp_path / "db"), flush_interval_s=3600)
+    yield store
+    store.close()
+
+
+def test_round_trip(store):
+    store.append("cam1", T0, dets([0, 0, 10, 10, 0.9, 0], [5, 5, 20, 20, 0.8, 2], tracks=[1, 2]))
+    store.append("cam1", T0 + 1, dets([1, 1, 11, 11, 0.7, 0], tracks=[1]))
+    store.append("cam2", T0, dets([0, 0, 1, 1, 0.5, 0]))
+    store.flush()
+    rows = store.query("cam1", T0, T0 + 10)
+    assert rows["ts"].tolist() == [T0, T0, T0 + 1]
+    assert rows["cls"].tolist() == [0, 2, 0]
+    assert rows["track"].tolist() == [1, 2, 1]
+    np.testing.assert_allclose(rows["box"][1], [5, 5, 20, 20])
+    np.testing.assert_allclose(rows["score"], [0.9, 0.8, 0.7], rtol=1e-6)
+    assert store.stats() == {"pending_rows": 0, "written_rows": 4, "dropped_rows": 0}
+
+
+def test_query_filters_range_class_and_limit(store):
+    for i in range(5):
+        store.append("cam1", T0 + i, dets([0, 0, 1, 1, 0.9, i % 2]))
+    store.flush()
+    assert store.query("cam1", T0 + 1, T0 + 3)["ts"].tolist() == [T0 + 1, T0 + 2]
+    assert store.query("cam1", T0, T0 + 10, class_id=1)["ts"].tolist() == [T0 + 1, T0 + 3]
+    assert len(store.query("cam1", T0, T0 + 10, limit=2)["ts"]) == 2
+    assert len(store.query("other", T0, T0 + 10)["ts"]) == 0
+
+
+def test_query_spans_hour_segments(store):
+    store.append("cam1", T0, dets([0, 0, 1, 1, 0.9, 0]))
+    store.append("cam1", T0 + 3600, dets([0, 0, 1, 1, 0.9, 0]))
+    store.flush()
+    assert len(os.listdir(os.path.join(store.root, "cam1"))) == 2
+    assert store.query("cam1", T0, T0 + 3601)["ts"].tolist() == [T0, T0 + 3600]
+
+
+def test_counts_per_bucket(store):
+    base = T0 - T0 % 60
+    store.append("cam1", base, dets([0, 0, 1, 1, 0.9, 0], [0, 0, 1, 1, 0.9, 0], tracks=[1, 2]))
+    store.append("cam1", base + 1, dets([0, 0, 1, 1, 0.9, 0], tracks=[1]))
+    store.append("cam1", base + 61, dets([0, 0, 1, 1, 0.9, 0], [0, 0, 1, 1, 0.9, 2], tracks=[3, 4]))
+    store.flush()
+    assert store.counts("cam1", base, base + 120, class_id=0, bucket_s=60) == [
+        {"start": int(base), "max_count": 2, "detections": 3, "tracks": 2},
+        {"start": int(base) + 60, "max_count": 1, "detections": 1, "tracks": 1},
+    ]
+
+
+def test_bad_camera_ids_stay_inside_the_root(store, tmp_path):
+    store.append("../escape", T0, dets([0, 0, 1, 1, 0.9, 0]))
+    store.flush()
+    assert os.listdir(tmp_path) == ["db"]
+    assert store.stats()["dropped_rows"] == 1
+    assert len(store.query("..", T0, T0 + 1)["ts"]) == 0
+    with pytest.raises(ValueError):
+        check_cam_id("a/b")
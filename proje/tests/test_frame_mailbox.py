@@ -0,0 +1,39 @@
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_mailbox import LatestFrameMailbox
+
+
+def test_newest_frame_replaces_unread_one():
+    mailbox = LatestFrameMailbox()
+    mailbox.put("a", 1.0)
+    mailbox.put("b", 2.0)
+    entry = mailbox.take(timeout=0)
+    assert (entry.frame, entry.timestamp) == ("b", 2.0)
+    assert mailbox.stats() == {"captured_frames": 2, "processed_frames": 1, "dropped_frames": 1}
+
+
+def test_taken_frame_is_not_counted_as_dropped():
+    mailbox = LatestFrameMailbox()
+    mailbox.put("a", 1.0)
+    mailbox.take(timeout=0)
+    mailbox.put("b", 2.0)
+    assert mailbox.dropped == 0
+
+
+def test_take_waits_for_a_new_frame():
+    mailbox = LatestFrameMailbox()
+    mailbox.put("a", 1.0)
+    mailbox.take(timeout=0)
+    assert mailbox.take(timeout=0.01) is None  # nothing newer than "a"
+    threading.Timer(0.05, mailbox.put, args=("b", 2.0)).start()
+    assert mailbox.take(timeout=2).frame == "b"
+
+
+def test_close_wakes_a_waiting_take():
+    mailbox = LatestFrameMailbox()
+    threading.Timer(0.05, mailbox.close).start()
+    assert mailbox.take(timeout=2) is None
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_pool import FramePool
+
+
+def test_released_buffer_is_reused():
+    pool = FramePool((2, 2, 3), size=1)
+    first = pool.acquire()
+    first_id = id(first)
+    del first
+    assert id(pool.acquire()) == first_id
+    assert pool.stats() == {"pool_size": 1, "allocations": 1, "reuses": 2}
+
+
+def test_held_buffers_are_not_handed_out_twice():
+    pool = FramePool((2, 2, 3), size=1, max_size=2)
+    held = [pool.acquire() for _ in range(3)]
+    assert len({id(arr) for arr in held}) == 3
+    assert pool.stats()["pool_size"] == 2  # the third one is untracked
+
+
+def test_copy_in_reads_raw_bytes():
+    pool = FramePool((2, 2, 3))
+    frame = pool.copy_in(bytes(range(12)))
+    assert frame.shape == (2, 2, 3)
+    assert frame.reshape(-1).tolist() == list(range(12))
+    assert isinstance(frame, np.ndarray)
@@ -0,0 +1,159 @@
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_scheduler import InferenceScheduler
+
+
+class RecordingDetector:
+    """Returns each frame's fill value as its single detection score; records batches."""
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.batches = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def predict_batch(self, frames):
+        self.release.wait()
+        time.sleep(self.delay_s)
+        self.batches.append(len(frames))
+        return [np.array([[0, 0, 1, 1, float(frame[0, 0]), 0]], np.float32) for frame in frames]
+
+
+def frame(value):
+    return np.full((2, 2), value, np.float32)
+
+
+@pytest.fixture
+def scheduler():
+    schedulers = []
+
+    def make(detector, **kwargs):
+        sched = InferenceScheduler(detector, **kwargs)
+        sched.start()
+        schedulers.append(sched)
+        return sched
+
+    yield make
+    for sched in schedulers:
+        sched.stop()
+
+
+def test_cameras_share_one_batch(scheduler):
+    detector = RecordingDetector()
+    sched = scheduler(detector, max_wait_ms=200)
+    # Both cameras are known before the first batch is cut
+    detector.release.clear()
+    futures = [sched.submit(cam, frame(i)) for i, cam in enumerate(["a", "b", "c"])]
+    detector.release.set()
+    results = [future.result(2) for future in futures]
+    assert [r[0, 4] for r in results] == [0, 1, 2]
+    assert sum(detector.batches) == 3 and len(detector.batches) <= 2
+
+
+def test_newer_frame_replaces_pending_one(scheduler):
+    detector = RecordingDetector()
+    sched = scheduler(detector, max_wait_ms=200)
+    detector.release.clear()
+    sched.submit("busy", frame(9))  # occupies the detector
+    time.sleep(0.05)
+    first = sched.submit("a", frame(1))
+    second = sched.submit("a", frame(2))
+    detector.release.set()
+    assert first.result(2)[0, 4] == 2
+    assert second.result(2)[0, 4] == 2
+
+
+def test_silent_camera_does_not_hold_back_batches(scheduler):
+    detector = RecordingDetector()
+    sched = scheduler(detector, max_wait_ms=300, active_window_s=0.1)
+    sched.predict("gone", frame(0))
+    time.sleep(0.2)
+    started = time.monotonic()
+    sched.predict("live", frame(1))
+    assert time.monotonic() - started < 0.25
+
+
+def test_forget_cancels_pending_frames(scheduler):
+    detector = RecordingDetector()
+    sched = scheduler(detector)
+    detector.release.clear()
+    sched.submit("busy", frame(0))
+    time.sleep(0.05)
+    futures = [sched.submit(("tiled", i), frame(i)) for i in range(2)]
+    sched.forget("tiled")
+    detector.release.set()
+    assert all(future.cancelled() for future in futures)
+    assert "tiled" not in sched.last_submit and ("tiled", 0) not in sched.last_submit
+
+
+def test_predict_times_out(scheduler):
+    detector = RecordingDetector()
+    detector.release.clear()
+    sched = scheduler(detector, result_timeout_s=0.1)
+    with pytest.raises(TimeoutError):
+        sched.predict("a", frame(0))
+    detector.release.set()
+
+
+def test_failed_batch_fails_its_futures(scheduler):
+    class Broken:
+        def predict_batch(self, frames):
+            raise RuntimeError("boom")
+
+    sched = scheduler(Broken())
+    with pytest.raises(RuntimeError, match="boom"):
+        sched.predict("a", frame(0))
+
+
+def allocated(sched, shares):
+    """Register (cam_id, fps, priority, cost) shares and return the allocated fps per camera."""
+    for cam_id, fps, priority, cost in shares:
+        sched.admit(cam_id, fps, priority, cost)
+    return {cam_id: round(sched.allocated_fps(cam_id), 2) for cam_id, *_ in shares}
+
+
+def test_demand_within_capacity_gets_target_rates():
+    sched = InferenceScheduler(RecordingDetector())
+    sched.frame_ms = 10.0  # 90 frames / s at 90% utilization
+    assert allocated(sched, [("a", 30, 1, 1), ("b", 0.5, 1, 1)]) == {"a": 30, "b": 0.5}
+
+
+def test_unmeasured_detector_grants_targets():
+    sched = InferenceScheduler(RecordingDetector())
+    assert allocated(sched, [("a", 60, 1, 1), ("b", 60, 1, 1)]) == {"a": 60, "b": 60}
+
+
+def test_same_priority_shares_overload_equally():
+    sched = InferenceScheduler(RecordingDetector())
+    sched.frame_ms = 10.0
+    assert allocated(sched, [("a", 60, 1, 1), ("b", 60, 1, 1)]) == {"a": 45, "b": 45}
+
+
+def test_higher_priority_keeps_its_rate():
+    sched = InferenceScheduler(RecordingDetector())
+    sched.frame_ms = 10.0
+    assert allocated(sched, [("entrance", 60, 2, 1), ("lot", 60, 1, 1)]) == {"entrance": 60, "lot": 30}
+
+
+def test_low_priority_keeps_min_fps_and_cost_counts_crops():
+    sched = InferenceScheduler(RecordingDetector(), min_fps=0.2)
+    sched.frame_ms = 10.0
+    # 4 tiles at 30 fps alone need 120 crops / s > 90
+    shares = allocated(sched, [("tiled", 30, 2, 4), ("lot", 10, 1, 1)])
+    assert shares == {"tiled": 22.45, "lot": 0.2}
+
+
+def test_admit_defers_frames_ahead_of_the_allocation():
+    sched = InferenceScheduler(RecordingDetector())
+    assert sched.admit("a", 0.5)
+    assert not sched.admit("a", 0.5)
+    assert sched.share_stats("a")["deferred"] == 1
+    assert sched.admit("b", 0)  # fps <= 0: no gate
@@ -0,0 +1,34 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ladder import DEFAULT_LADDER, ladder_config, rung_encoder_config, rung_size
+
+
+def test_ladder_config_presets_and_explicit_rungs():
+    assert [rung["name"] for rung in ladder_config()] == DEFAULT_LADDER
+    rungs = ladder_config("720p, 240p")
+    assert [(r["name"], r["height"], r["fps"]) for r in rungs] == [("720p", 720, 30), ("240p", 240, 15)]
+    assert ladder_config([{"height": 300}]) == [{"name": "300p", "height": 300, "fps": 0, "bitrate": 1000}]
+    with pytest.raises(ValueError):
+        ladder_config("999p")
+
+
+def test_rung_size_keeps_aspect_with_width_multiple_of_4():
+    assert rung_size((1080, 1920, 3), 480) == (852, 480)
+    assert rung_size((480, 640, 3), 360) == (480, 360)
+    assert rung_size((1080, 1440, 3), 250)[0] % 4 == 0
+
+
+def test_rung_size_never_upscales():
+    assert rung_size((360, 640, 3), 720) == (640, 360)
+
+
+def test_rung_encoder_config_uses_input_size_and_no_recording():
+    base = {"width": 1280, "height": 720, "fps": 25, "bitrate": 4000, "record_dir": "/rec", "hls_dir": "/hls"}
+    config = rung_encoder_config({"fps": 0, "bitrate": 300}, base)
+    assert config == {"width": 0, "height": 0, "fps": 25, "bitrate": 300, "record_dir": None, "hls_dir": None}
+    assert base["record_dir"] == "/rec"
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lifecycle import lifecycle_config
+
+
+def test_fractional_idle_fps_is_kept():
+    assert lifecycle_config({"idle_fps": 0.5})["idle_fps"] == 0.5
+    assert lifecycle_config({"idle_fps": "0.25"})["idle_fps"] == 0.25
+
+
+def test_zero_idle_timeout_means_never():
+    assert lifecycle_config({"idle_timeout_s": 0})["idle_timeout_s"] == 0
+
+
+@pytest.mark.parametrize("overrides", [
+    {"idle_fps": 0},
+    {"idle_fps": -2},
+    {"idle_fps": "slow"},
+    {"idle_timeout_s": -1},
+    {"mode": "sometimes"},
+])
+def test_bad_values_are_rejected(overrides):
+    with pytest.raises(ValueError):
+        lifecycle_config(overrides)
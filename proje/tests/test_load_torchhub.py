@@ -0,0 +1,48 @@
+import os
+import sys
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from yolo_detector import load_torchhub
+
+
+class FakeHub:
+    def __init__(self):
+        self.dir = None
+        self.calls = []
+
+    def set_dir(self, path):
+        self.dir = path
+
+    def load(self, repo, model, **kwargs):
+        self.calls.append((repo, model, kwargs))
+        return "model"
+
+
+def fake_torch(monkeypatch):
+    hub = FakeHub()
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(hub=hub))
+    return hub
+
+
+def test_without_cache_uses_pretrained(monkeypatch):
+    hub = fake_torch(monkeypatch)
+    assert load_torchhub("yolov5s") == "model"
+    assert hub.calls == [("ultralytics/yolov5", "yolov5s", {"pretrained": True})]
+
+
+def test_first_start_downloads_into_cache(monkeypatch, tmp_path):
+    hub = fake_torch(monkeypatch)
+    load_torchhub("yolov5s", str(tmp_path))
+    assert hub.dir == os.path.join(str(tmp_path), "hub")
+    assert hub.calls == [("ultralytics/yolov5", "custom", {"path": os.path.join(str(tmp_path), "yolov5s.pt")})]
+
+
+def test_cached_repo_loads_offline(monkeypatch, tmp_path):
+    hub = fake_torch(monkeypatch)
+    repo = tmp_path / "hub" / "ultralytics_yolov5_master"
+    repo.mkdir(parents=True)
+    load_torchhub("yolov5s", str(tmp_path))
+    assert hub.calls == [(str(repo), "custom", {"path": os.path.join(str(tmp_path), "yolov5s.pt"),
+                                                 "source": "local"})]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_pipeline import DEFAULT_ANALYTICS_CONFIG
+from motion import MotionGate, downscale_gray
+
+
+def scene(x=None):
+    frame = np.full((480, 640, 3), 120, np.uint8)
+    if x is not None:
+        frame[300:420, x:x + 50] = 30
+    return frame
+
+
+def test_static_scene_is_skipped():
+    gate = MotionGate(max_skip=1000)
+    small = downscale_gray(scene())
+    assert gate.needs_inference(small)  # first frame builds the background
+    assert not any(gate.needs_inference(small) for _ in range(20))
+    assert gate.stats()["skipped"] == 20
+
+
+def test_moving_object_passes():
+    gate = MotionGate(area_threshold=DEFAULT_ANALYTICS_CONFIG["gate_threshold"], max_skip=1000)
+    gate.needs_inference(downscale_gray(scene()))
+    assert all(gate.needs_inference(downscale_gray(scene(x))) for x in range(100, 300, 8))
+
+
+def test_max_skip_forces_a_pass():
+    gate = MotionGate(max_skip=5)
+    small = downscale_gray(scene())
+    passes = [gate.needs_inference(small) for _ in range(11)]
+    assert passes == [True, False, False, False, False, True, False, False, False, False, True]
+
+
+def test_motion_gate_is_opt_in():
+    assert DEFAULT_ANALYTICS_CONFIG["motion_gate"] is False
@@ -0,0 +1,101 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scene_analytics import SceneAnalytics
+from yolo_detector import Detections
+
+SHAPE = (100, 100, 3)
+LEFT_HALF = [[0.0, 0.0], [0.5, 0.0], [0.5, 1.0], [0.0, 1.0]]
+GATE = [[0.5, 0.0], [0.5, 1.0]]  # a->b points down the image
+
+
+def person(cx, bottom, track_id, cls=0):
+    return [cx - 5, bottom - 20, cx + 5, bottom, 0.9, cls], track_id
+
+
+def frame(*objects):
+    rows = [row for row, _ in objects]
+    ids = np.array([tid for _, tid in objects], np.int64)
+    return Detections.from_array(rows, ids)
+
+
+def test_class_counts():
+    analytics = SceneAnalytics()
+    result = analytics.update(frame(person(20, 50, 1), person(70, 50, 2), person(40, 90, 3, cls=2)), 0.0, SHAPE)
+    assert result["classes"] == {"person": 2, "car": 1}
+
+
+def test_zone_occupancy_uses_bottom_centre():
+    analytics = SceneAnalytics(zones={"left": LEFT_HALF})
+    result = analytics.update(frame(person(20, 50, 1), person(70, 50, 2), person(45, 90, 3, cls=2)), 0.0, SHAPE)
+    assert result["zones"]["left"]["count"] == 2
+    assert result["zones"]["left"]["classes"] == {"person": 1, "car": 1}
+
+
+def test_dwell_and_finished_visits():
+    analytics = SceneAnalytics(zones={"left": LEFT_HALF}, grace_s=1.0)
+    for t in (0.0, 1.0, 2.0, 3.0):
+        result = analytics.update(frame(person(20, 50, 7)), t, SHAPE)
+    assert result["zones"]["left"]["dwell_max_s"] == 3.0
+    assert result["zones"]["left"]["visits"] == 0
+
+    # Leaving the zone within the grace period keeps the visit open...
+    result = analytics.update(frame(person(80, 50, 7)), 3.5, SHAPE)
+    assert result["zones"]["left"]["visits"] == 0
+    # ...after it the visit is closed with its duration
+    result = analytics.update(frame(person(80, 50, 7)), 5.0, SHAPE)
+    assert result["zones"]["left"]["visits"] == 1
+    assert result["zones"]["left"]["visit_avg_s"] == 3.0
+
+
+def test_short_tracker_gap_does_not_reset_dwell():
+    analytics = SceneAnalytics(zones={"left": LEFT_HALF}, grace_s=1.0)
+    analytics.update(frame(person(20, 50, 7)), 0.0, SHAPE)
+    analytics.update(frame(), 0.5, SHAPE)
+    result = analytics.update(frame(person(20, 50, 7)), 1.2, SHAPE)
+    assert result["zones"]["left"]["dwell_max_s"] == 1.2
+    assert result["zones"]["left"]["visits"] == 0
+
+
+def test_line_crossing_directions():
+    analytics = SceneAnalytics(lines={"gate": GATE})
+    analytics.update(frame(person(70, 50, 1), person(30, 60, 2)), 0.0, SHAPE)
+    result = analytics.update(frame(person(30, 50, 1), person(70, 60, 2)), 0.1, SHAPE)
+    # Right of a downward a->b is the left half of the image
+    crossings = {c["track_id"]: c["direction"] for c in result["crossings"]}
+    assert crossings == {1: "in", 2: "out"}
+    assert result["lines"]["gate"] == {"in": 1, "out": 1}
+
+
+def test_line_not_crossed_twice_or_by_movement_beside_it():
+    analytics = SceneAnalytics(lines={"gate": [[0.5, 0.0], [0.5, 0.5]]})
+    analytics.update(frame(person(70, 90, 1)), 0.0, SHAPE)
+    result = analytics.update(frame(person(30, 90, 1)), 0.1, SHAPE)  # passes below the line's end
+    assert result["crossings"] == []
+    analytics.update(frame(person(30, 90, 1)), 0.2, SHAPE)
+    assert analytics.line_totals() == {"gate": {"in": {}, "out": {}}}
+
+
+def test_lost_track_still_crosses_within_grace():
+    analytics = SceneAnalytics(lines={"gate": GATE}, grace_s=1.0)
+    analytics.update(frame(person(70, 50, 4)), 0.0, SHAPE)
+    analytics.update(frame(), 0.5, SHAPE)
+    result = analytics.update(frame(person(30, 50, 4)), 0.9, SHAPE)
+    assert [c["direction"] for c in result["crossings"]] == ["in"]
+
+    # Once the grace period has passed the old position is forgotten
+    analytics.update(frame(), 2.5, SHAPE)
+    result = analytics.update(frame(person(70, 50, 4)), 2.6, SHAPE)
+    assert result["crossings"] == []
+
+
+def test_untracked_detections_are_counted_but_do_not_cross():
+    analytics = SceneAnalytics(zones={"left": LEFT_HALF}, lines={"gate": GATE})
+    analytics.update(frame(person(70, 50, 0)), 0.0, SHAPE)
+    result = analytics.update(frame(person(30, 50, 0)), 0.1, SHAPE)
+    assert result["zones"]["left"]["count"] == 1
+    assert result["crossings"] == []
@@ -0,0 +1,71 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import process_workers
+from process_workers import SharedFrameRing
+
+SHAPE = (4, 6, 3)
+
+
+@pytest.fixture
+def ring():
+    ring = SharedFrameRing(shape=SHAPE, slots=2, create=True)
+    yield ring
+    ring.close()
+
+
+def filled(value):
+    return np.full(SHAPE, value, np.uint8)
+
+
+def test_empty_ring_has_no_frame(ring):
+    assert ring.read_latest() is None
+    assert ring.copy_latest(np.empty(SHAPE, np.uint8)) is None
+
+
+def test_copy_latest_returns_newest_frame(ring):
+    for i in range(1, 6):
+        ring.write(filled(i), float(i))
+    out = np.empty(SHAPE, np.uint8)
+    assert ring.copy_latest(out) == (5, 5.0)
+    assert (out == 5).all()
+
+
+def test_copy_survives_the_writer_lapping_the_ring(ring):
+    ring.write(filled(1), 1.0)
+    out = np.empty(SHAPE, np.uint8)
+    ring.copy_latest(out)
+    for i in range(2, 6):
+        ring.write(filled(i), float(i))
+    assert (out == 1).all()
+
+
+def test_torn_read_is_rejected(ring, monkeypatch):
+    ring.write(filled(1), 1.0)
+    copyto = np.copyto
+    out = np.empty(SHAPE, np.uint8)
+
+    def copy_while_writer_laps(dst, src):
+        if dst is not out:
+            return copyto(dst, src)
+        copyto(dst[:2], src[:2])  # half of the slot copied...
+        monkeypatch.undo()
+        ring.write(filled(2), 2.0)
+        ring.write(filled(3), 3.0)  # ...when the writer reuses it
+        copyto(dst[2:], src[2:])
+
+    monkeypatch.setattr(process_workers.np, "copyto", copy_while_writer_laps)
+    assert ring.copy_latest(out) is None
+    assert ring.copy_latest(out) == (3, 3.0)
+
+
+def test_slot_being_written_is_not_read(ring):
+    ring.write(filled(1), 1.0)
+    ring.slot_seq[1] = -1  # writer marked the newest slot as in progress
+    assert ring.read_latest() is None
+
@@ -0,0 +1,63 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference_backends import nms
+from tiling import TilePlan, parse_roi, tile_windows
+
+
+def test_nms_keeps_best_of_overlapping_boxes():
+    boxes = np.array([[0, 0, 10, 10], [1, 0, 11, 10], [20, 20, 30, 30]], np.float32)
+    scores = np.array([0.6, 0.9, 0.5], np.float32)
+    assert nms(boxes, scores, 0.45).tolist() == [1, 2]
+
+
+def test_parse_roi_accepts_one_polygon_list_or_json():
+    poly = [[0.1, 0.1], [0.9, 0.1], [0.5, 0.9]]
+    assert len(parse_roi(poly)) == 1
+    assert len(parse_roi([poly, poly])) == 2
+    assert len(parse_roi('[[0.1, 0.1], [0.9, 0.1], [0.5, 0.9]]')) == 1
+    assert parse_roi(None) == []
+    with pytest.raises(ValueError):
+        parse_roi([[0, 0], [1, 1]])
+
+
+def test_tile_windows_cover_the_region_with_overlap():
+    windows = tile_windows(0, 0, 100, 50, rows=1, cols=2, overlap=0.2)
+    # tile width 100 / (2 - 0.2) = 55.6, second tile starts at 44.4
+    assert windows.tolist() == [[0, 0, 56, 50], [44, 0, 100, 50]]
+
+
+def test_crops_follow_the_roi_bounding_box():
+    plan = TilePlan(roi=[[0.5, 0.0], [1.0, 0.0], [1.0, 1.0], [0.5, 1.0]])
+    frame = np.zeros((100, 200, 3), np.uint8)
+    crops = plan.crops(frame)
+    assert len(crops) == 1 and crops[0].shape == (100, 100, 3)
+
+
+def test_merge_maps_tiles_back_and_removes_duplicates():
+    plan = TilePlan(rows=1, cols=2, overlap=0.2)
+    shape = (50, 100, 3)
+    # One object straddling the tile border, seen by both tiles, plus one per tile
+    left = np.array([[40, 10, 52, 30, 0.9, 0], [5, 5, 15, 15, 0.8, 0]], np.float32)
+    right = np.array([[-4, 10, 8, 30, 0.7, 0], [40, 5, 50, 15, 0.8, 2]], np.float32)
+    merged = plan.merge([left, right], shape)
+    boxes = sorted(map(tuple, merged[:, [0, 1, 2, 3, 5]].tolist()))
+    assert boxes == [(5, 5, 15, 15, 0), (40, 10, 52, 30, 0), (84, 5, 94, 15, 2)]
+
+
+def test_merge_keeps_overlapping_boxes_of_different_classes():
+    plan = TilePlan(rows=1, cols=2)
+    dets = np.array([[10, 10, 20, 20, 0.9, 0], [10, 10, 20, 20, 0.8, 1]], np.float32)
+    assert len(plan.merge([dets, np.zeros((0, 6), np.float32)], (50, 100, 3))) == 2
+
+
+def test_merge_drops_boxes_centred_outside_the_roi():
+    plan = TilePlan(roi=[[0.0, 0.0], [0.5, 0.0], [0.5, 1.0], [0.0, 1.0]])
+    dets = np.array([[10, 10, 20, 20, 0.9, 0], [45, 10, 70, 20, 0.9, 0]], np.float32)
+    merged = plan.merge([dets], (100, 100, 3))
+    assert merged[:, 0].tolist() == [10]
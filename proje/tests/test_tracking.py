@@ -0,0 +1,87 @@
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from camera_pipeline import DEFAULT_ANALYTICS_CONFIG
+from motion import downscale_gray, motion_score
+from tracking import AdaptiveStride, IoUTracker, iou_matrix
+
+
+def det(x1, y1, x2, y2, score=0.9, cls=0):
+    return [x1, y1, x2, y2, score, cls]
+
+
+def walking_person(x):
+    """640x480 gray scene with a dark 50x120 px figure at column x."""
+    frame = np.full((480, 640, 3), 120, np.uint8)
+    frame[300:420, x:x + 50] = 30
+    return frame
+
+
+def test_iou_matrix():
+    a = np.array([[0, 0, 10, 10]], np.float32)
+    b = np.array([[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]], np.float32)
+    np.testing.assert_allclose(iou_matrix(a, b), [[1.0, 50 / 150, 0.0]], rtol=1e-6)
+
+
+def test_tracker_keeps_ids_and_interpolates():
+    tracker = IoUTracker()
+    _, ids = tracker.update([det(0, 0, 10, 10)])
+    assert ids.tolist() == [1]
+    # Next keyframe two frames later, moved 2 px: velocity 1 px / frame
+    tracker.predict()
+    dets, ids = tracker.update([det(2, 0, 12, 10)])
+    assert ids.tolist() == [1]
+    dets, _ = tracker.predict()
+    np.testing.assert_allclose(dets[0, :4], [3, 0, 13, 10])
+
+
+def test_tracker_does_not_match_across_classes():
+    tracker = IoUTracker()
+    tracker.update([det(0, 0, 10, 10, cls=0)])
+    _, ids = tracker.update([det(0, 0, 10, 10, cls=2)])
+    assert ids.tolist() == [2]
+
+
+def test_lost_tracks_expire_after_max_misses():
+    tracker = IoUTracker(max_misses=1)
+    tracker.update([det(0, 0, 10, 10)])
+    dets, _ = tracker.update([])
+    assert len(dets) == 0 and len(tracker.ids) == 1
+    tracker.update([])
+    assert len(tracker.ids) == 0
+
+
+def test_stride_follows_latency():
+    stride = AdaptiveStride(target_fps=30, budget=0.5, max_stride=15)
+    stride.record(100.0)  # 100 ms per pass at 30 fps and 50% budget: every 6th frame
+    assert stride.stride(moving=True) == 6
+    assert stride.stride(moving=False) == 15
+
+
+def test_static_scene_grows_stride():
+    stride = AdaptiveStride(target_fps=30, budget=0.5, static_factor=4)
+    stride.record(10.0)
+    passes = sum(stride.should_detect(0.0) for _ in range(40))
+    assert stride.current == 4
+    assert passes == 10
+
+
+def test_walking_person_keeps_stride_one():
+    stride = AdaptiveStride(motion_threshold=DEFAULT_ANALYTICS_CONFIG["motion_threshold"])
+    stride.record(10.0)
+    prev = None
+    detected = []
+    for x in range(100, 300, 8):
+        small = downscale_gray(walking_person(x))
+        detected.append(stride.should_detect(motion_score(prev, small)))
+        prev = small
+    assert all(detected)
+    assert stride.current == 1
+
+
+def test_adaptive_is_opt_in():
+    assert DEFAULT_ANALYTICS_CONFIG["adaptive"] is False
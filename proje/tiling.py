@@ -0,0 +1,124 @@
+import json
+
+import numpy as np
+
+from inference_backends import nms
+
+
+def parse_roi(roi):
+    """
+    ROI polygons in normalized (0..1) frame coordinates: a JSON string, one
+    polygon [[x, y], ...] or a list of polygons. Returns a list of Mx2 arrays.
+    """
+    if roi in (None, "", []):
+        return []
+    if isinstance(roi, str):
+        roi = json.loads(roi)
+    if np.asarray(roi[0]).ndim == 1:
+        roi = [roi]
+    polygons = [np.asarray(poly, np.float32).reshape(-1, 2) for poly in roi]
+    for poly in polygons:
+        if len(poly) < 3:
+            raise ValueError("ROI polygons need at least 3 points")
+    return polygons
+
+
+def points_in_polygon(points, polygon):
+    """Even-odd rule for N points against one polygon, vectorized over points and edges."""
+    x, y = points[:, 0:1], points[:, 1:2]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(x1, -1), np.roll(y1, -1)
+    straddles = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cross_x = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return np.count_nonzero(straddles & (x < cross_x), axis=1) % 2 == 1
+
+
+def tile_windows(x0, y0, x1, y1, rows=1, cols=1, overlap=0.2):
+    """Kx4 int windows (x0, y0, x1, y1) covering the region with `overlap` between neighbours."""
+    width, height = x1 - x0, y1 - y0
+    tile_w = width / (cols - (cols - 1) * overlap)
+    tile_h = height / (rows - (rows - 1) * overlap)
+    xs = x0 + np.arange(cols) * tile_w * (1 - overlap)
+    ys = y0 + np.arange(rows) * tile_h * (1 - overlap)
+    gx, gy = np.meshgrid(xs, ys)
+    windows = np.stack([gx, gy, gx + tile_w, gy + tile_h], axis=-1).reshape(-1, 4)
+    windows = np.rint(windows).astype(np.int64)
+    windows[:, [0, 2]] = windows[:, [0, 2]].clip(x0, x1)
+    windows[:, [1, 3]] = windows[:, [1, 3]].clip(y0, y1)
+    return windows
+
+
+class TilePlan:
+    """
+    Where the detector looks in a camera's frames: the bounding box of the ROI
+    polygons (or the whole frame), optionally split into overlapping tiles.
+    crops() returns views to batch in one forward pass, merge() maps the
+    per-crop detections back to frame coordinates, removes duplicates across
+    tile borders with one class-aware NMS and drops boxes whose centre lies
+    outside every ROI polygon.
+    """
+
+    def __init__(self, roi=None, rows=1, cols=1, overlap=0.2, iou_thres=0.45):
+        self.polygons = parse_roi(roi)
+        self.rows = max(int(rows), 1)
+        self.cols = max(int(cols), 1)
+        self.overlap = min(max(float(overlap), 0.0), 0.9)
+        self.iou_thres = iou_thres
+        self._shape = None
+        self._windows = None
+        self._pixel_polygons = None
+
+    @property
+    def enabled(self):
+        return bool(self.polygons) or self.rows * self.cols > 1
+
+    def windows(self, shape):
+        if shape != self._shape:
+            height, width = shape[:2]
+            scale = np.array([width, height], np.float32)
+            self._pixel_polygons = [poly * scale for poly in self.polygons]
+            if self._pixel_polygons:
+                points = np.concatenate(self._pixel_polygons)
+                x0, y0 = np.floor(points.min(0)).clip(0).astype(int)
+                x1, y1 = np.ceil(points.max(0)).astype(int)
+                x1, y1 = min(x1, width), min(y1, height)
+            else:
+                x0, y0, x1, y1 = 0, 0, width, height
+            self._windows = tile_windows(x0, y0, x1, y1, self.rows, self.cols, self.overlap)
+            self._shape = shape
+        return self._windows
+
+    def crops(self, frame):
+        return [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in self.windows(frame.shape)]
+
+    def merge(self, results, shape):
+        """Per-crop Nx6 detections -> Nx6 detections in frame coordinates."""
+        windows = self.windows(shape)
+        parts = []
+        for (x0, y0, _, _), dets in zip(windows, results):
+            if len(dets):
+                dets = np.array(dets, np.float32)
+                dets[:, [0, 2]] += x0
+                dets[:, [1, 3]] += y0
+                parts.append(dets)
+        if not parts:
+            return np.zeros((0, 6), np.float32)
+        dets = np.concatenate(parts)
+        if len(windows) > 1:
+            offsets = dets[:, 5:6] * float(max(shape[:2]) + 1)
+            dets = dets[nms(dets[:, :4] + offsets, dets[:, 4], self.iou_thres)]
+        if self._pixel_polygons:
+            centers = np.column_stack([(dets[:, 0] + dets[:, 2]) / 2, (dets[:, 1] + dets[:, 3]) / 2])
+            inside = np.zeros(len(dets), bool)
+            for poly in self._pixel_polygons:
+                inside |= points_in_polygon(centers, poly)
+            dets = dets[inside]
+        return dets
+
+    def stats(self):
+        return {
+            "roi_polygons": len(self.polygons),
+            "tiles": [self.rows, self.cols],
+            "windows": self._windows.tolist() if self._windows is not None else None,
+        }
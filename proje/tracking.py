@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+
+
+def iou_matrix(a, b):
+    """IoU between every box of a (Nx4) and b (Mx4), boxes as x1,y1,x2,y2."""
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-6)
+
+
+class IoUTracker:
+    """
+    Lightweight IoU tracker used between detector keyframes.
+
+    update() matches fresh detections (Nx6: x1,y1,x2,y2,score,class) to the
+    existing tracks and measures each track's per-frame velocity; predict()
+    moves the boxes along that velocity on frames without detection.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=2):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.anchor = np.zeros((0, 4), np.float32)    # box at last keyframe
+        self.velocity = np.zeros((0, 4), np.float32)  # px per frame
+        self.scores = np.zeros(0, np.float32)
+        self.classes = np.zeros(0, np.float32)
+        self.ids = np.zeros(0, np.int64)
+        self.misses = np.zeros(0, np.int64)
+        self.next_id = 1
+        self.frames_since_update = 0
+
+    def _boxes(self):
+        return self.anchor + self.velocity * self.frames_since_update
+
+    def update(self, detections):
+        detections = np.asarray(detections, np.float32).reshape(-1, 6)
+        elapsed = self.frames_since_update + 1
+        self.frames_since_update += 1
+        current = self._boxes()
+
+        track_idx, det_idx = np.zeros(0, np.int64), np.zeros(0, np.int64)
+        if len(current) and len(detections):
+            iou = iou_matrix(current, detections[:, :4])
+            iou[self.classes[:, None] != detections[None, :, 5]] = 0
+            pairs = np.argwhere(iou >= self.iou_threshold)
+            pairs = pairs[np.argsort(-iou[pairs[:, 0], pairs[:, 1]])]
+            used_t, used_d, matched = set(), set(), []
+            for t, d in pairs:
+                if t not in used_t and d not in used_d:
+                    used_t.add(t)
+                    used_d.add(d)
+                    matched.append((t, d))
+            if matched:
+                track_idx, det_idx = np.array(matched, np.int64).T
+
+        # Matched tracks: new anchor + velocity since the previous keyframe
+        det_boxes = detections[det_idx, :4]
+        self.velocity[track_idx] = (det_boxes - self.anchor[track_idx]) / elapsed
+        self.anchor[track_idx] = det_boxes
+        self.scores[track_idx] = detections[det_idx, 4]
+        self.misses[track_idx] = 0
+
+        # Unmatched tracks keep coasting until max_misses keyframes in a row
+        unmatched = np.ones(len(self.ids), bool)
+        unmatched[track_idx] = False
+        self.anchor[unmatched] = current[unmatched]
+        self.misses[unmatched] += 1
+        keep = self.misses <= self.max_misses
+
+        new = np.ones(len(detections), bool)
+        new[det_idx] = False
+        n_new = int(new.sum())
+        self.anchor = np.concatenate([self.anchor[keep], detections[new, :4]])
+        self.velocity = np.concatenate([self.velocity[keep], np.zeros((n_new, 4), np.float32)])
+        self.scores = np.concatenate([self.scores[keep], detections[new, 4]])
+        self.classes = np.concatenate([self.classes[keep], detections[new, 5]])
+        self.misses = np.concatenate([self.misses[keep], np.zeros(n_new, np.int64)])
+        self.ids = np.concatenate([self.ids[keep], np.arange(self.next_id, self.next_id + n_new)])
+        self.next_id += n_new
+        self.frames_since_update = 0
+        return self.tracks()
+
+    def predict(self):
+        self.frames_since_update += 1
+        return self.tracks()
+
+    def tracks(self):
+        """Current (Nx6 detections, track ids) — only tracks seen on the last keyframe."""
+        visible = self.misses == 0
+        boxes = self._boxes()[visible]
+        dets = np.column_stack([boxes, self.scores[visible], self.classes[visible]]).astype(np.float32)
+        return dets, self.ids[visible]
+
+
+class AdaptiveStride:
+    """
+    Decides which frames get a full detector pass.
+
+    The stride N follows the measured inference latency: N frames of the
+    camera's target fps must cover latency / budget, so the detector is busy
+    at most `budget` of the time. Static scenes use static_factor times that
+    stride; a rising motion edge triggers detection immediately.
+    """
+
+    def __init__(self, target_fps=30, budget=0.5, max_stride=15, static_factor=4, motion_threshold=0.004):
+        self.target_fps = target_fps
+        self.budget = budget
+        self.max_stride = max_stride
+        self.static_factor = static_factor
+        self.motion_threshold = motion_threshold
+        self.latency_ms = None
+        self.frames_since = math.inf
+        self.moving = True
+        self.current = 1
+
+    def stride(self, moving):
+        latency = (self.latency_ms or 0.0) / 1000.0
+        stride = max(1, math.ceil(latency * self.target_fps / self.budget))
+        if not moving:
+            stride *= self.static_factor
+        return min(stride, self.max_stride)
+
+    def should_detect(self, motion):
+        moving = motion >= self.motion_threshold
+        rising = moving and not self.moving
+        self.moving = moving
+        self.current = self.stride(moving)
+        self.frames_since += 1
+        if rising or self.frames_since >= self.current:
+            self.frames_since = 0
+            return True
+        return False
+
+    def record(self, latency_ms):
+        if self.latency_ms is None:
+            self.latency_ms = latency_ms
+        else:
+            self.latency_ms = 0.8 * self.latency_ms + 0.2 * latency_ms
@@ -1,12 +1,70 @@
-import torch
+import os
+from collections import namedtuple
+
 import numpy as np
-import cv2
+
+from inference_backends import create_backend, letterbox, non_max_suppression, scale_boxes
+from overlay import OverlayRenderer
+
+
+class Detections(namedtuple("Detections", ["boxes", "scores", "classes", "track_ids"])):
+    """Yapılandırılmış tespitler: Nx4 kutular (x1, y1, x2, y2), N skor, N sınıf, N iz id'si."""
+
+    @classmethod
+    def from_array(cls, dets, track_ids=None):
+        dets = np.asarray(dets, np.float32).reshape(-1, 6)
+        if track_ids is None:
+            track_ids = np.zeros(len(dets), np.int64)
+        return cls(dets[:, :4], dets[:, 4], dets[:, 5].astype(np.int64), track_ids)
+
+    def count_class(self, class_id):
+        return int(np.count_nonzero(self.classes == class_id))
+
+
+def load_torchhub(model_name, cache_dir=None):
+    """
+    YOLOv5 + AutoShape from torch.hub. With cache_dir the hub repo and the
+    .pt weights are kept there; once both exist the model loads offline.
+    """
+    import torch
+    if not cache_dir:
+        return torch.hub.load('ultralytics/yolov5', model_name, pretrained=True)
+    torch.hub.set_dir(os.path.join(cache_dir, 'hub'))
+    repo = os.path.join(cache_dir, 'hub', 'ultralytics_yolov5_master')
+    weights = os.path.join(cache_dir, f'{model_name}.pt')
+    if os.path.isdir(repo):
+        return torch.hub.load(repo, 'custom', path=weights, source='local')
+    return torch.hub.load('ultralytics/yolov5', 'custom', path=weights)
+
 
 class YOLODetector:
-    def __init__(self, model_name='yolov5s', device=None):
-        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
-        self.model = torch.hub.load('ultralytics/yolov5', model_name, pretrained=True).to(self.device)
-        self.model.eval()
+    """
+    backend='torchhub' : torch.hub YOLOv5 + AutoShape (network only until cache_dir is filled)
+    backend='onnx' | 'openvino' | 'torchscript' : exported model loaded offline from `weights`
+    backend='stub' : no weights, fixed detections (tests / benchmarks)
+    """
+
+    def __init__(self, model_name='yolov5s', device=None, backend='torchhub', weights=None,
+                 img_size=640, conf_thres=0.25, iou_thres=0.45, cache_dir=None):
+        self.backend_name = backend
+        self.img_size = img_size
+        self.conf_thres = conf_thres
+        self.iou_thres = iou_thres
+        if backend == 'torchhub':
+            import torch
+            self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+            self.model = load_torchhub(model_name, cache_dir).to(self.device)
+            self.model.eval()
+            self.model.conf = conf_thres
+            self.model.iou = iou_thres
+            self.names = self.model.names
+            self.backend = None
+        else:
+            self.device = device or 'cpu'
+            kwargs = {'device': self.device} if backend == 'torchscript' else {}
+            self.backend = create_backend(backend, weights, **kwargs)
+            self.names = self.backend.names
+        self.overlay = OverlayRenderer(self.names)
 
     def detect(self, frame):
         """
@@ -14,8 +72,42 @@ class YOLODetector:
         - anotlanmış kare
         - tespit edilen kişi sayısı (class 0) döner
         """
-        results = self.model(frame)
-        annotated = results.render()[0]  # BGR annotated image
-        people = sum(1 for c in results.pred[0][:, -1] if int(c) == 0)
-        return annotated, people
+        return self.detect_batch([frame])[0]
+
+    def detect_batch(self, frames):
+        """
+        Birden fazla kareyi tek bir forward pass ile analiz eder.
+        Her kare için (anotlanmış kare, kişi sayısı) listesi döner.
+        """
+        return [
+            (self.annotate(frame, dets), self.count_people(dets))
+            for frame, dets in zip(frames, self.predict_batch(frames))
+        ]
+
+    def predict_batch(self, frames):
+        """
+        Tek forward pass, yapılandırılmış çıktı: her kare için Nx6 float32
+        dizi (x1, y1, x2, y2, skor, sınıf).
+        """
+        frames = list(frames)
+        if self.backend is None:
+            results = self.model(frames)
+            return [pred.cpu().numpy().astype(np.float32) for pred in results.pred]
+        batch, scales, pads = letterbox(frames, self.img_size)
+        raw = self.backend.infer(batch)
+        outputs = []
+        for i, frame in enumerate(frames):
+            dets = non_max_suppression(raw[i], self.conf_thres, self.iou_thres)
+            outputs.append(scale_boxes(dets, scales[i], pads[i], frame.shape))
+        return outputs
+
+    def annotate(self, frame, detections):
+        """Tespitleri (Nx6 dizi veya Detections) karenin bir kopyası üzerine çizer."""
+        if not isinstance(detections, Detections):
+            detections = Detections.from_array(detections)
+        return self.overlay.render(frame, detections)
+
+    @staticmethod
+    def count_people(detections):
+        return int(np.count_nonzero(detections[:, 5] == 0))
 2
\ No newline at end of file